@@ -0,0 +1,150 @@
+"""
+analysis_pool.py
+Bounded executor for CPU-bound request work (voice decoding / pitch analysis).
+
+Keeps the event loop free for other routes: work runs in a process pool
+(pure-Python DSP holds the GIL) or a thread pool (NumPy releases it), and
+submissions beyond `max_pending` in-flight tasks are rejected immediately so
+callers can answer 503 + Retry-After instead of queueing unboundedly.
+"""
+import asyncio
+import functools
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+from typing import Any, Callable, Dict, Optional
+
+from .config import get_settings
+from .logging_utils import log
+
+try:
+    from prometheus_client import Counter as PCounter, Gauge, Histogram
+except ImportError:  # pragma: no cover
+    PCounter = None  # type: ignore
+    Gauge = None  # type: ignore
+    Histogram = None  # type: ignore
+
+POOL_PENDING = Gauge('voice_pool_pending', 'Voice analysis tasks queued or running') if Gauge else None
+POOL_TASK_LATENCY = Histogram(
+    'voice_pool_task_seconds', 'Voice analysis task latency including queue wait',
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+) if Histogram else None
+POOL_REJECTIONS = PCounter('voice_pool_rejections_total', 'Voice analysis tasks rejected because the pool was full') if PCounter else None
+POOL_FAILURES = PCounter('voice_pool_failures_total', 'Voice analysis tasks that raised') if PCounter else None
+
+
+class PoolSaturated(Exception):
+    """Raised when the pool already holds `max_pending` tasks."""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"analysis pool saturated; retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+def _native_backend_available() -> bool:
+    try:
+        import numpy  # type: ignore  # noqa: F401
+        return True
+    except Exception:
+        return False
+
+
+class AnalysisPool:
+    def __init__(self, kind: str = "auto", max_workers: int = 2, max_pending: int = 8, retry_after: int = 2):
+        if kind == "auto":
+            kind = "thread" if _native_backend_available() else "process"
+        if kind not in ("thread", "process"):
+            raise ValueError(f"unknown pool kind: {kind}")
+        self.kind = kind
+        self.max_workers = max(1, max_workers)
+        self.max_pending = max(1, max_pending)
+        self.retry_after = max(1, retry_after)
+        self._executor: Optional[Executor] = None
+        self._pending = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+
+    def _ensure_executor(self) -> Executor:
+        if self._executor is None:
+            if self.kind == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="voice-analysis")
+        return self._executor
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    async def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """Run `fn(*args)` off the event loop; raises PoolSaturated when full."""
+        if self._pending >= self.max_pending:
+            self.rejected += 1
+            if POOL_REJECTIONS:
+                try: POOL_REJECTIONS.inc()
+                except Exception: pass
+            raise PoolSaturated(self.retry_after)
+        self._set_pending(self._pending + 1)
+        start = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            try:
+                result = await loop.run_in_executor(self._ensure_executor(), functools.partial(fn, *args))
+            except BrokenProcessPool:
+                # A worker died (OOM kill etc.): replace the pool so later requests recover
+                log("WARN", "analysis_pool broken; recreating", kind=self.kind)
+                self.shutdown(wait=False)
+                raise PoolSaturated(self.retry_after)
+            self.completed += 1
+            return result
+        except BaseException:
+            self.failed += 1
+            if POOL_FAILURES:
+                try: POOL_FAILURES.inc()
+                except Exception: pass
+            raise
+        finally:
+            self._set_pending(self._pending - 1)
+            if POOL_TASK_LATENCY:
+                try: POOL_TASK_LATENCY.observe(time.perf_counter() - start)
+                except Exception: pass
+
+    def _set_pending(self, value: int):
+        self._pending = value
+        if POOL_PENDING:
+            try: POOL_PENDING.set(value)
+            except Exception: pass
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "kind": self.kind,
+            "workers": self.max_workers,
+            "pending": self._pending,
+            "max_pending": self.max_pending,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+        }
+
+    def shutdown(self, wait: bool = True):
+        executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=True)
+
+
+@lru_cache()
+def get_analysis_pool() -> AnalysisPool:
+    settings = get_settings()
+    return AnalysisPool(
+        kind=settings.voice_pool_kind,
+        max_workers=settings.voice_pool_workers,
+        max_pending=settings.voice_pool_max_pending,
+        retry_after=settings.voice_pool_retry_after,
+    )
+
+
+def shutdown_analysis_pool():
+    if get_analysis_pool.cache_info().currsize:
+        get_analysis_pool().shutdown(wait=False)
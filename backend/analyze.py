@@ -0,0 +1,99 @@
+"""
+analyze.py
+Batch analysis endpoint: one request runs EQ score, sentiment, emotion,
+archetype, feedback and next-question selection for an answer (or a list of
+answers), replacing six round trips per answer.
+
+Each step calls the same function as its standalone endpoint, so session
+state and models update exactly as if the endpoints had been called in order.
+Answers in a batch are processed in order because later answers build on the
+candidate's history.
+"""
+from typing import Dict, List, Optional, Union
+
+from fastapi import APIRouter, Request
+from pydantic import BaseModel, Field
+
+from .archetype import assign_archetype
+from .emotion import _limiter as _emotion_limiter, analyze_emotion
+from .eq_api import calculate_eq_score
+from .feedback import FeedbackRequest, generate_feedback
+from .questions import choose_next_question
+from .sentiment import analyze_sentiment
+from .tokenizer import tokenize
+
+router = APIRouter()
+
+class AnswerRequest(BaseModel):
+    """One answer, with the inputs the individual endpoints take."""
+    text: str
+    inflection: dict = Field(default_factory=dict)  # as for /score, e.g. {"pitch": 1.3}
+    voice_features: Optional[dict] = None  # as for /feedback, e.g. {"pitch": 180, "tonality": "Neutral"}
+    candidate_id: Optional[str] = None
+    include_history: bool = False
+    # History cursors keyed by router ("sentiment", "emotion", "archetype", "feedback"),
+    # i.e. the `history_seq` map of a previous result; used with include_history
+    since: Optional[Dict[str, int]] = None
+
+class AnalyzeBatchRequest(BaseModel):
+    answers: List[AnswerRequest] = Field(min_length=1, max_length=50)
+
+async def analyze_answer(answer: AnswerRequest) -> dict:
+    # Shared (memoized) tokenization for the keyword scorers
+    doc = tokenize(answer.text)
+    eq_score = calculate_eq_score(answer.text, answer.inflection)
+    # History is only serialized when asked for, from each router's own cursor
+    since = answer.since or {}
+    include = answer.include_history
+    sentiment = await analyze_sentiment(doc.text, answer.candidate_id, doc.tokens,
+                                        since=since.get("sentiment"), include_history=include)
+    emotion = await analyze_emotion(doc.text, answer.candidate_id, doc.tokens,
+                                    since=since.get("emotion"), include_history=include)
+    archetype = await assign_archetype(eq_score, answer.candidate_id, since=since.get("archetype"), include_history=include)
+    feedback = await generate_feedback(FeedbackRequest(
+        text=answer.text,
+        sentiment=sentiment["sentiment"],
+        eq_score=eq_score,
+        emotion_scores=emotion["emotion_scores"],
+        voice_features=answer.voice_features,
+        candidate_id=answer.candidate_id,
+        since=since.get("feedback"),
+        include_history=include,
+    ))
+    result = {
+        "eq_score": eq_score,
+        "sentiment": sentiment["sentiment"],
+        "emotion_scores": emotion["emotion_scores"],
+        "archetype": archetype["archetype"],
+        "feedback": feedback["feedback"],
+        "next_question": choose_next_question(sentiment["sentiment"], eq_score, emotion["emotion_scores"]),
+    }
+    if answer.include_history:
+        result["history"] = {
+            "sentiment": sentiment["history"],
+            "emotion": emotion["history"],
+            "archetype": archetype["history"],
+            "feedback": feedback["history"],
+        }
+        result["history_seq"] = {
+            "sentiment": sentiment["history_seq"],
+            "emotion": emotion["history_seq"],
+            "archetype": archetype["history_seq"],
+            "feedback": feedback["history_seq"],
+        }
+    return result
+
+@router.post("/analyze")
+async def analyze_endpoint(req: Union[AnalyzeBatchRequest, AnswerRequest], request: Request):
+    """
+    POST /analyze
+    Body is one answer ({"text": ...}) or {"answers": [...]}; returns one combined
+    result, or {"results": [...]} in input order for a batch.
+    A batch is charged one emotion-limiter unit per answer, as the standalone
+    endpoint would be.
+    """
+    if isinstance(req, AnalyzeBatchRequest):
+        await _emotion_limiter.enforce(request, "Rate limit exceeded for analysis", cost=len(req.answers))
+        return {"results": [await analyze_answer(a) for a in req.answers]}
+    await _emotion_limiter.enforce(request, "Rate limit exceeded for analysis")
+    return await analyze_answer(req)
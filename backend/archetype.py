@@ -2,28 +2,39 @@ from fastapi import APIRouter
 from pydantic import BaseModel
 from typing import Optional
 
+from .session_store import make_session_store
+
 router = APIRouter()
 
 class ArchetypeRequest(BaseModel):
     eq_score: int
     candidate_id: Optional[str] = None
+    since: Optional[int] = None  # history cursor: only return entries after this `history_seq`
+    include_history: bool = True  # false: omit history from the response
 
-# In-memory session state for archetype history
-session_state = {}
+# Session state for archetype history (Redis when configured, bounded memory otherwise)
+session_state = make_session_store(
+    "archetype",
+    lambda: {"eq_scores": [], "archetypes": []},
+    history_fields=("eq_scores", "archetypes"),
+)
 
 @router.post("/archetype")
 async def archetype_endpoint(req: ArchetypeRequest):
+    return await assign_archetype(req.eq_score, req.candidate_id, req.since, req.include_history)
 
-    candidate_id = req.candidate_id or "default"
-    if candidate_id not in session_state:
-        session_state[candidate_id] = {"eq_scores": [], "archetypes": []}
-    state = session_state[candidate_id]
-    state["eq_scores"].append(req.eq_score)
+async def assign_archetype(eq_score: int, candidate_id: Optional[str] = None,
+                           since: Optional[int] = None, include_history: bool = True) -> dict:
+    """Record `eq_score` in the candidate's history and derive their archetype from the trend.
+    History fields are returned from cursor `since` (all retained entries when None)."""
+    candidate_id = candidate_id or "default"
+    state = await session_state.aget(candidate_id)
+    state["eq_scores"].append(eq_score)
 
     # Trend-based rules
     scores = state["eq_scores"]
     avg_score = sum(scores) / len(scores)
-    recent_scores = scores[-3:] if len(scores) >= 3 else scores
+    recent_scores = [scores[i] for i in range(max(0, len(scores) - 3), len(scores))]
     recent_avg = sum(recent_scores) / len(recent_scores)
     archetype = "Street Mage"
     # Consistently high
@@ -43,4 +54,8 @@ async def archetype_endpoint(req: ArchetypeRequest):
         archetype += " (Needs Consistency)"
 
     state["archetypes"].append(archetype)
-    return {"archetype": archetype, "history": state}
+    await session_state.asave(candidate_id, state)
+    result = {"archetype": archetype, "history_seq": state["archetypes"].seq}
+    if include_history:
+        result["history"] = {field: state[field].since(since) for field in session_state.history_fields}
+    return result
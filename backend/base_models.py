@@ -0,0 +1,94 @@
+"""
+base_models.py
+Shared pretrained sentiment/emotion models.
+
+One base model per kind is loaded at startup from SENTIMENT_BASE_MODEL /
+EMOTION_BASE_MODEL and compiled once; every candidate shares it and keeps only
+a small CandidateAdapter delta (see ml_utils.predict_blended). Missing or
+unreadable files, and models whose classes are not labels the app assigns for
+that kind, disable the base model for that kind, leaving the per-candidate
+learning as before.
+
+Train a base model from labelled JSONL ({"text": ..., "label": ...} per line):
+    python -m backend.base_models train --corpus sentiment.jsonl --out models/sentiment.nbc
+Binary output (any extension but .json) is the compact CompiledNB format, mapped
+with mmap at load so every worker shares one copy of its pages; a .json output
+keeps the raw counts instead, for models that will be trained further.
+"""
+import argparse
+import json
+from functools import lru_cache
+from typing import Optional
+
+from .config import get_settings
+from .logging_utils import log
+from .ml_utils import CompiledNB, SimpleMultinomialNB, load_model
+from .tokenizer import tokenize
+
+KINDS = ("sentiment", "emotion")
+
+
+def expected_labels(kind: str) -> frozenset:
+    """Labels the router for `kind` assigns; a base model may only predict these."""
+    # Imported here: the routers import this module
+    if kind == "sentiment":
+        from .sentiment import LABELS
+    else:
+        from .emotion import DEFAULT_KEYWORDS as LABELS
+    return frozenset(LABELS)
+
+
+@lru_cache(maxsize=None)
+def get_base_model(kind: str) -> Optional[CompiledNB]:
+    path = getattr(get_settings(), f"{kind}_base_model")
+    if not path:
+        return None
+    try:
+        compiled = load_model(path)
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        log("WARN", "base model unavailable", kind=kind, path=path, error=str(e))
+        return None
+    unknown = sorted(set(compiled.classes) - expected_labels(kind))
+    if unknown or not compiled.classes:
+        log("WARN", "base model disabled: classes do not match app labels", kind=kind, path=path,
+            classes=compiled.classes, unknown=unknown, expected=sorted(expected_labels(kind)))
+        return None
+    log("INFO", "base model loaded", kind=kind, path=path, classes=compiled.classes, vocab=len(compiled.vocab_index))
+    return compiled
+
+
+def load_base_models():
+    """Load (and cache) every configured base model; call from app startup."""
+    for kind in KINDS:
+        get_base_model(kind)
+
+
+def train(corpus_path: str) -> SimpleMultinomialNB:
+    # Same tokenization as the scorers, so base vocabulary and answer tokens line up
+    model = SimpleMultinomialNB()
+    with open(corpus_path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                row = json.loads(line)
+                model.partial_fit(tokenize(row["text"]).tokens, row["label"])
+    return model
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m backend.base_models", description="Base model tools")
+    sub = parser.add_subparsers(dest="command", required=True)
+    tr = sub.add_parser("train", help="Train a base model from labelled JSONL")
+    tr.add_argument("--corpus", required=True, help='JSONL with {"text": ..., "label": ...} per line')
+    tr.add_argument("--out", required=True, help="Output model path (.json keeps trainable counts, otherwise binary)")
+    args = parser.parse_args(argv)
+
+    model = train(args.corpus)
+    if args.out.endswith(".json"):
+        model.save(args.out)
+    else:
+        model.compile().save(args.out)
+    print(f"trained on {model.n_docs} docs, {len(model.vocab)} tokens, classes={sorted(model.class_counts)} -> {args.out}")
+
+
+if __name__ == "__main__":
+    main()
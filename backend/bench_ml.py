@@ -0,0 +1,81 @@
+"""
+bench_ml.py
+Benchmark SimpleMultinomialNB.predict against CompiledNB.predict_batch.
+
+Run: python -m backend.bench_ml [--docs 2000] [--doc-len 40] [--vocab 1000 10000 100000]
+Trains a 3-class model on a synthetic Zipf-like corpus covering the given
+vocabulary size, then scores the same documents with both implementations
+(NumPy path when installed, pure Python otherwise). Compile time is reported
+separately because it is paid once per model, not per request. Cold start
+compares loading the JSON counts (parse + compile) with mapping the binary
+CompiledNB file.
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from backend import ml_utils
+from backend.ml_utils import SimpleMultinomialNB
+
+CLASSES = ("positive", "negative", "neutral")
+
+
+def _corpus(vocab_size: int, n_docs: int, doc_len: int, seed: int = 0):
+    rng = random.Random(seed)
+    words = [f"tok{i}" for i in range(vocab_size)]
+    weights = [1.0 / (i + 1) for i in range(vocab_size)]
+    # Every word appears at least once so the vocabulary really has vocab_size entries
+    docs = [words[i:i + doc_len] for i in range(0, vocab_size, doc_len)]
+    docs += [rng.choices(words, weights, k=doc_len) for _ in range(n_docs)]
+    labels = [rng.choice(CLASSES) for _ in docs]
+    probes = [rng.choices(words, weights, k=doc_len) for _ in range(n_docs)]
+    return docs, labels, probes
+
+
+def _best(fn, repeat: int):
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark Naive Bayes batch scoring")
+    parser.add_argument("--docs", type=int, default=2000, help="Documents to score")
+    parser.add_argument("--doc-len", type=int, default=40, help="Tokens per document")
+    parser.add_argument("--vocab", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    backend = "numpy" if ml_utils._np is not None else "pure-python"
+    print(f"scoring {args.docs} docs x {args.doc_len} tokens, compiled backend: {backend}")
+    print(f"{'vocab':>8}{'predict ms':>13}{'compile ms':>13}{'batch ms':>11}{'speedup':>9}")
+    cold = []
+    tmp = tempfile.mkdtemp(prefix="bench_ml_")
+    for vocab in args.vocab:
+        docs, labels, probes = _corpus(vocab, args.docs, args.doc_len)
+        model = SimpleMultinomialNB().fit(docs, labels)
+        t_loop, expected = _best(lambda: model.predict(probes), args.repeat)
+        t_compile, compiled = _best(model.compile, 1)
+        t_batch, got = _best(lambda: compiled.predict_batch(probes), args.repeat)
+        assert got == expected, "compiled predictions diverged"
+        print(f"{vocab:>8}{t_loop * 1e3:>13.1f}{t_compile * 1e3:>13.1f}{t_batch * 1e3:>11.1f}{t_loop / t_batch:>8.1f}x")
+
+        json_path, bin_path = os.path.join(tmp, f"{vocab}.json"), os.path.join(tmp, f"{vocab}.nbc")
+        model.save(json_path)
+        compiled.save(bin_path)
+        t_json, _ = _best(lambda: SimpleMultinomialNB.load(json_path).compile(), args.repeat)
+        t_mmap, _ = _best(lambda: ml_utils.CompiledNB.load(bin_path), args.repeat)
+        cold.append((vocab, os.path.getsize(json_path), os.path.getsize(bin_path), t_json, t_mmap))
+
+    print(f"\n{'vocab':>8}{'json KB':>10}{'binary KB':>11}{'json load ms':>14}{'mmap load ms':>14}")
+    for vocab, json_size, bin_size, t_json, t_mmap in cold:
+        print(f"{vocab:>8}{json_size / 1024:>10.0f}{bin_size / 1024:>11.0f}{t_json * 1e3:>14.1f}{t_mmap * 1e3:>14.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+bench_tts.py
+Cold vs warm upstream latency for TTS cache misses against a local mock ElevenLabs.
+
+Run: python -m backend.bench_tts [--requests 50] [--latency-ms 5]
+"cold" opens a new httpx.AsyncClient per call (the old behaviour); "warm" reuses
+the shared pooled client from backend.http_client. Both go through
+send_with_retry so only connection setup differs. The mock upstream is plain
+HTTP on localhost, so real-world savings (DNS + TLS) are larger than shown.
+"""
+import argparse
+import asyncio
+import statistics
+import threading
+import time
+
+import httpx
+from fastapi import FastAPI, Response
+
+from backend.http_client import create_upstream_client, send_with_retry
+
+
+def _mock_upstream(latency_ms: float) -> FastAPI:
+    mock = FastAPI()
+    audio = b"\xff\xfb" + b"\x00" * 32_000
+
+    @mock.post("/v1/text-to-speech/{voice_id}")
+    async def synth(voice_id: str):
+        await asyncio.sleep(latency_ms / 1000.0)
+        return Response(content=audio, media_type="audio/mpeg")
+
+    return mock
+
+
+def _serve(app: FastAPI, port: int):
+    import uvicorn
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    return server
+
+
+async def _run(url: str, n: int):
+    payload = {"text": "Welcome to the interview.", "model_id": "m"}
+    cold, warm = [], []
+    for _ in range(n):
+        t0 = time.perf_counter()
+        async with httpx.AsyncClient(timeout=30) as client:
+            await send_with_retry(client, client.build_request("POST", url, json=payload))
+        cold.append(time.perf_counter() - t0)
+    client = create_upstream_client()
+    try:
+        for _ in range(n):
+            t0 = time.perf_counter()
+            await send_with_retry(client, client.build_request("POST", url, json=payload))
+            warm.append(time.perf_counter() - t0)
+    finally:
+        await client.aclose()
+    return cold, warm
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark TTS upstream client reuse")
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--latency-ms", type=float, default=5.0, help="Simulated upstream synthesis time")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args(argv)
+
+    server = _serve(_mock_upstream(args.latency_ms), args.port)
+    try:
+        cold, warm = asyncio.run(_run(f"http://127.0.0.1:{args.port}/v1/text-to-speech/bench", args.requests))
+    finally:
+        server.should_exit = True
+    print(f"{'client':<8}{'p50 ms':>10}{'p95 ms':>10}")
+    for label, xs in (("cold", cold), ("warm", warm)):
+        xs = sorted(xs)
+        p95 = xs[min(len(xs) - 1, int(0.95 * len(xs)))]
+        print(f"{label:<8}{statistics.median(xs) * 1000:>10.2f}{p95 * 1000:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
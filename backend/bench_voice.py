@@ -0,0 +1,59 @@
+"""
+bench_voice.py
+Micro-benchmark for the voice pitch estimators.
+
+Run: python -m backend.bench_voice [--seconds 2] [--repeat 3]
+Compares the reference time-domain autocorrelation against the FFT path
+(NumPy when installed, pure-Python radix-2 otherwise) at common sample rates.
+"""
+import argparse
+import math
+import random
+import time
+
+from backend import voice
+
+
+def _synth_voice(sr: int, seconds: float, f0: float, seed: int = 0) -> list:
+    rng = random.Random(seed)
+    n = int(sr * seconds)
+    return [
+        0.5 * math.sin(2 * math.pi * f0 * i / sr)
+        + 0.25 * math.sin(4 * math.pi * f0 * i / sr)
+        + rng.gauss(0, 0.03)
+        for i in range(n)
+    ]
+
+
+def _time_it(fn, samples, sr, repeat: int):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn(samples, sr)
+        best = min(best, time.perf_counter() - t0)
+    return best, result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark voice pitch estimators")
+    parser.add_argument("--seconds", type=float, default=2.0, help="Length of synthetic clip")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per estimator (best time reported)")
+    parser.add_argument("--f0", type=float, default=180.0, help="Fundamental of the synthetic voice (Hz)")
+    args = parser.parse_args(argv)
+
+    backend = "numpy" if voice._np is not None else "pure-python"
+    print(f"FFT backend: {backend}")
+    print(f"{'rate':>7} {'direct ms':>10} {'fft ms':>8} {'speedup':>8} {'pitch direct':>13} {'pitch fft':>10}")
+    for sr in (16000, 44100, 48000):
+        samples = _synth_voice(sr, args.seconds, args.f0)
+        t_direct, p_direct = _time_it(voice._estimate_pitch_autocorr_direct, samples, sr, args.repeat)
+        t_fft, p_fft = _time_it(voice._estimate_pitch_autocorr, samples, sr, args.repeat)
+        print(
+            f"{sr:>7} {t_direct * 1000:>10.1f} {t_fft * 1000:>8.1f} {t_direct / t_fft:>7.1f}x "
+            f"{p_direct or 0:>13.2f} {p_fft or 0:>10.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,285 @@
+"""
+byte_cache.py
+Caches for binary payloads (TTS audio).
+
+ByteLRUCache: in-process LRU bounded by total bytes and by entry count.
+Reads refresh recency; inserts evict least-recently-used entries until both
+bounds hold. Entries also carry a TTL: expired entries are dropped on read and
+by a background expiry task, so keys that are never read again (e.g. one
+personalized preamble per candidate name) do not linger until eviction.
+
+DiskBlobStore: content-addressed files on local disk (blobs/<sha256>.mp3,
+keys/<cache key> -> digest) so audio survives restarts and can be served
+with sendfile; identical audio under different keys is stored once.
+"""
+import asyncio
+import hashlib
+import os
+import tempfile
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from .logging_utils import log
+
+_CACHES: List[Any] = []
+_expirer: Optional[asyncio.Task] = None
+
+
+class ByteLRUCache:
+    """
+    LRU of key -> bytes. `max_bytes` / `max_entries` <= 0 disable that bound.
+    Payloads larger than `max_bytes` are not cached at all. An optional short
+    `tag` (e.g. the payload's digest) is kept with each entry.
+    """
+
+    def __init__(self, name: str, max_bytes: int, max_entries: int, ttl: float, expire_interval: float = 30.0):
+        self.name = name
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.expire_interval = expire_interval
+        self._entries: "OrderedDict[str, Tuple[float, bytes, Optional[str]]]" = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._last_expire = time.monotonic()
+        _CACHES.append(self)
+
+    def get(self, key: str) -> Optional[bytes]:
+        entry = self.get_tagged(key)
+        return entry[0] if entry else None
+
+    def get_tagged(self, key: str) -> Optional[Tuple[bytes, Optional[str]]]:
+        """(data, tag) for `key`, or None; counts and refreshes like `get`."""
+        if _expirer is None and time.monotonic() - self._last_expire > self.expire_interval:
+            self.expire()  # no background task (e.g. tests / scripts): expire inline
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires, data, tag = entry
+        if time.time() > expires:
+            self._remove(key)
+            self.expirations += 1
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return data, tag
+
+    def set(self, key: str, data: bytes, ttl: Optional[float] = None, tag: Optional[str] = None) -> bool:
+        """Insert/replace `key`; returns False if the payload exceeds the byte bound."""
+        if self.max_bytes > 0 and len(data) > self.max_bytes:
+            return False
+        self._remove(key)
+        self._entries[key] = (time.time() + (self.ttl if ttl is None else ttl), data, tag)
+        self._bytes += len(data)
+        self._evict()
+        return True
+
+    def pop(self, key: str) -> Optional[bytes]:
+        entry = self._remove(key)
+        return entry[1] if entry else None
+
+    def clear(self):
+        self._entries.clear()
+        self._bytes = 0
+
+    def _remove(self, key: str) -> Optional[Tuple[float, bytes, Optional[str]]]:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= len(entry[1])
+        return entry
+
+    def _evict(self):
+        while self._entries and (
+            (self.max_bytes > 0 and self._bytes > self.max_bytes)
+            or (self.max_entries > 0 and len(self._entries) > self.max_entries)
+        ):
+            _, (_, data, _) = self._entries.popitem(last=False)
+            self._bytes -= len(data)
+            self.evictions += 1
+
+    def expire(self, now: Optional[float] = None) -> int:
+        """Drop expired entries; returns how many were removed."""
+        now = time.time() if now is None else now
+        self._last_expire = time.monotonic()
+        stale = [k for k, (expires, _, _) in self._entries.items() if expires < now]
+        for k in stale:
+            self._remove(k)
+        self.expirations += len(stale)
+        return len(stale)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def bytes_used(self) -> int:
+        return self._bytes
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+class DiskBlobStore:
+    """
+    Key -> file path store under `root`. Writes are atomic (temp file + rename);
+    key files older than `ttl` are treated as missing and removed by `expire()`,
+    which also deletes blobs no key references any more. Methods do blocking
+    file I/O; call them via asyncio.to_thread from request handlers.
+    """
+
+    blocking = True  # expire() runs off the event loop
+
+    def __init__(self, name: str, root: str, ttl: float, suffix: str = ".mp3"):
+        self.name = name
+        self.root = root
+        self.ttl = ttl
+        self.suffix = suffix
+        self._keys_dir = os.path.join(root, "keys")
+        self._blobs_dir = os.path.join(root, "blobs")
+        os.makedirs(self._keys_dir, exist_ok=True)
+        os.makedirs(self._blobs_dir, exist_ok=True)
+        self.hits = 0
+        self.misses = 0
+        _CACHES.append(self)
+
+    def _key_path(self, key: str) -> str:
+        # Keys are hex digests; anything else is hashed so it cannot escape root
+        safe = key if key.isalnum() else hashlib.sha256(key.encode("utf-8")).hexdigest()
+        return os.path.join(self._keys_dir, safe)
+
+    def _blob_path(self, digest: str) -> str:
+        return os.path.join(self._blobs_dir, digest + self.suffix)
+
+    def _write_atomic(self, path: str, data: bytes):
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except BaseException:
+            try: os.unlink(tmp)
+            except OSError: pass
+            raise
+
+    def get_path(self, key: str) -> Optional[str]:
+        """Path of the blob for `key`, or None if missing/expired."""
+        key_path = self._key_path(key)
+        try:
+            if time.time() - os.path.getmtime(key_path) > self.ttl:
+                self.misses += 1
+                return None
+            with open(key_path, "r", encoding="ascii") as f:
+                blob = self._blob_path(f.read().strip())
+            if os.path.exists(blob):
+                self.hits += 1
+                return blob
+        except OSError:
+            pass
+        self.misses += 1
+        return None
+
+    def get(self, key: str) -> Optional[bytes]:
+        path = self.get_path(key)
+        if path is None:
+            return None
+        try:
+            with open(path, "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def digest_of(self, path: str) -> str:
+        """sha256 of the blob at `path` (blobs are named by it, so nothing is read)."""
+        return os.path.basename(path)[:-len(self.suffix)] if self.suffix else os.path.basename(path)
+
+    def set(self, key: str, data: bytes, digest: Optional[str] = None) -> str:
+        """Store `data` under `key`; pass `digest` (its sha256) if already known."""
+        digest = digest or hashlib.sha256(data).hexdigest()
+        blob = self._blob_path(digest)
+        if not os.path.exists(blob):
+            self._write_atomic(blob, data)
+        self._write_atomic(self._key_path(key), digest.encode("ascii"))
+        return blob
+
+    def expire(self, now: Optional[float] = None) -> int:
+        """Remove expired keys and unreferenced blobs; returns removed key count."""
+        now = time.time() if now is None else now
+        removed = 0
+        live = set()
+        for entry in os.scandir(self._keys_dir):
+            try:
+                if entry.name.startswith(".tmp-") or now - entry.stat().st_mtime > self.ttl:
+                    os.unlink(entry.path)
+                    removed += 1
+                    continue
+                with open(entry.path, "r", encoding="ascii") as f:
+                    live.add(f.read().strip() + self.suffix)
+            except OSError:
+                continue
+        for entry in os.scandir(self._blobs_dir):
+            # Skip blobs younger than a minute: a concurrent set() may not have written its key yet
+            try:
+                if entry.name not in live and now - entry.stat().st_mtime > 60:
+                    os.unlink(entry.path)
+            except OSError:
+                continue
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "root": self.root,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+async def _expire_loop(interval: float):
+    while True:
+        await asyncio.sleep(interval)
+        for cache in list(_CACHES):
+            try:
+                if getattr(cache, "blocking", False):
+                    await asyncio.to_thread(cache.expire)
+                else:
+                    cache.expire()
+            except Exception as e:  # pragma: no cover - defensive
+                log("WARN", "cache expiry failed", cache=cache.name, error=str(e))
+
+
+def start_expirer(interval: float = 30.0):
+    """Start the background TTL expiry task (call from app startup)."""
+    global _expirer
+    if _expirer is None or _expirer.done():
+        _expirer = asyncio.get_running_loop().create_task(_expire_loop(interval))
+
+
+async def stop_expirer():
+    global _expirer
+    task, _expirer = _expirer, None
+    if task is not None:
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
@@ -20,6 +20,58 @@ class Settings(BaseSettings):
 
     hsts_enabled: bool = True
 
+    # Per-IP limits for CPU-heavy routers (requests per window; 0 disables). Opt-in: the key is
+    # the client address, which is the proxy's unless uvicorn trusts X-Forwarded-For
+    voice_rate_max: int = 0
+    voice_rate_window_sec: int = 60
+    emotion_rate_max: int = 0
+    emotion_rate_window_sec: int = 60
+    rate_limit_sweep_sec: int = 30
+
+    # Voice analysis offload: "auto" picks threads when NumPy (GIL-releasing) is installed, else processes
+    voice_pool_kind: str = "auto"
+    voice_pool_workers: int = 2
+    voice_pool_max_pending: int = 8
+    voice_pool_retry_after: int = 2
+
+    # Upload limits: the request body is capped before multipart parsing spools it, then the
+    # WAV header's declared size/duration is checked before PCM is buffered
+    voice_max_upload_bytes: int = 50 * 1024 * 1024
+    voice_max_duration_sec: int = 600
+    # Streaming mode reads PCM in fixed chunks (constant memory); clients may also opt in per request
+    voice_streaming: bool = False
+    voice_stream_chunk_bytes: int = 64 * 1024
+    # Chunks decoded per analysis-pool call (amortizes the round trip/pickling to pool workers)
+    voice_stream_batch_chunks: int = 8
+
+    # /voice/stream WebSocket: per-pod connection cap, update cadence and per-connection CPU share
+    voice_ws_max_connections: int = 500
+    voice_ws_hop_ms: int = 100
+    voice_ws_window_ms: int = 500
+    voice_ws_cpu_share: float = 0.05
+    voice_ws_max_buffer_bytes: int = 1024 * 1024
+
+    # Per-candidate session state (emotion/sentiment/feedback/archetype): LRU + idle TTL, per-store byte budget
+    session_max_sessions: int = 10000
+    session_idle_ttl_sec: int = 3600
+    session_max_bytes: int = 64 * 1024 * 1024
+    session_history_cap: int = 200
+    # Saves between full deep size walks of a session; in between only appended history is measured
+    session_measure_every: int = 16
+    # "auto" uses Redis when REDIS_URL is reachable (shared across replicas), else process memory
+    session_backend: str = "auto"
+    # Learned sentiment/emotion keywords per candidate and label (defaults included); growth stops at the cap
+    keyword_max_per_label: int = 100
+    # Shared pretrained sentiment/emotion models (loaded once at startup; empty = per-candidate learning only)
+    sentiment_base_model: str = ""
+    emotion_base_model: str = ""
+    # Per-candidate model deltas: distinct (class, token) entries kept, and how many answers
+    # it takes for a candidate's own history to weigh as much as the base model
+    ml_adapter_max_tokens: int = 128
+    ml_adapter_strength: float = 5.0
+    # Answer texts whose normalized tokens are memoized per process (shared by all text scorers)
+    tokenizer_cache_size: int = 1024
+
     model_config = SettingsConfigDict(env_file=".env", case_sensitive=False, extra="ignore")
 
     @field_validator("app_version", "commit", "build_time", mode="before")
@@ -58,13 +110,13 @@ class Settings(BaseSettings):
             return [o.strip() for o in raw.split(",") if o.strip()]
         return v
 
-    @field_validator("hsts_enabled", mode="before")
+    @field_validator("hsts_enabled", "voice_streaming", mode="before")
     def parse_bool(cls, v):  # type: ignore[override]
         if isinstance(v, str):
             return v.lower() in ("1", "true", "yes", "on")
         return v
 
-    @field_validator("tts_rate_window_sec", "tts_rate_max", "tts_cache_ttl", mode="before")
+    @field_validator("tts_rate_window_sec", "tts_rate_max", "tts_cache_ttl", "voice_rate_max", "voice_rate_window_sec", "emotion_rate_max", "emotion_rate_window_sec", "rate_limit_sweep_sec", "voice_pool_workers", "voice_pool_max_pending", "voice_pool_retry_after", "voice_max_upload_bytes", "voice_max_duration_sec", "voice_stream_chunk_bytes", "voice_stream_batch_chunks", "voice_ws_max_connections", "voice_ws_hop_ms", "voice_ws_window_ms", "voice_ws_max_buffer_bytes", "session_max_sessions", "session_idle_ttl_sec", "session_max_bytes", "session_history_cap", "session_measure_every", "keyword_max_per_label", "ml_adapter_max_tokens", "tokenizer_cache_size", mode="before")
     def parse_ints(cls, v):  # type: ignore[override]
         if isinstance(v, str) and v.isdigit():
             return int(v)
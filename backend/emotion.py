@@ -1,81 +1,89 @@
-from fastapi import APIRouter
+from typing import Optional
+
+from fastapi import APIRouter, Depends
 from pydantic import BaseModel
-from collections import defaultdict
-from typing import List
-
-# Optional ML dependencies (disabled by default for lightweight deploys)
-try:
-    from sklearn.naive_bayes import MultinomialNB  # type: ignore
-    _ML_AVAILABLE = True
-except Exception:  # ImportError or runtime errors
-    MultinomialNB = None  # type: ignore
-    _ML_AVAILABLE = False
-from .ml_utils import SimpleMultinomialNB
+
+from .keyword_matcher import KeywordMatcher, grow_keywords, synced_matcher
+from .base_models import get_base_model
+from .ml_utils import CandidateAdapter, predict_blended
+from .session_store import SessionStore, make_session_store
+from .tokenizer import tokenize
+from .config import get_settings
+from .rate_limit import RateLimiter
+from .redis_utils import get_async_redis_client
 
 router = APIRouter()
 
 class EmotionRequest(BaseModel):
     text: str
     candidate_id: str = None  # Optional: track candidate
+    since: Optional[int] = None  # history cursor: only return entries after this `history_seq`
+    include_history: bool = True  # false: omit history from the response
+
+# Default keywords
+DEFAULT_KEYWORDS = {
+    "joy": ["happy", "excited", "love", "enjoy"],
+    "anger": ["angry", "mad", "frustrated"],
+    "sadness": ["sad", "disappointed", "upset"],
+    "fear": ["worried", "afraid", "nervous"],
+}
+
+def _new_session() -> dict:
+    return {"keywords": {e: list(words) for e, words in DEFAULT_KEYWORDS.items()}, "history": []}
 
-session_state = {}
+session_state = make_session_store("emotion", _new_session, history_fields=("history",))
 
-# --- Optional ML model for emotion learning ---
-ml_models = defaultdict(lambda: MultinomialNB()) if _ML_AVAILABLE else defaultdict(lambda: SimpleMultinomialNB())  # type: ignore
+# --- ML emotion: shared base model (optional) + small per-candidate delta ---
+# The delta (CandidateAdapter) is stored in the session state under "model", so with the
+# Redis store every replica trains and predicts with the same one.
+_settings = get_settings()
+# Compiled keyword matchers, synced with each candidate's (growing) keyword lists. Derived
+# from the session's keywords and rebuilt by `sync`, so they stay process-local.
+matchers = SessionStore("emotion_matchers", KeywordMatcher)
+
+_limiter = RateLimiter("emotion", _settings.emotion_rate_max, _settings.emotion_rate_window_sec, redis=get_async_redis_client())
 
 @router.post("/emotion")
-async def emotion_endpoint(req: EmotionRequest):
-    text = req.text.lower()
-    scores = {"joy": 0.0, "anger": 0.0, "sadness": 0.0, "fear": 0.0}
-    if any(w in text for w in ["happy", "excited", "love", "enjoy"]):
-        scores["joy"] = 0.8
-    if any(w in text for w in ["angry", "mad", "frustrated"]):
-        scores["anger"] = 0.7
-    if any(w in text for w in ["sad", "disappointed", "upset"]):
-        scores["sadness"] = 0.7
-    if any(w in text for w in ["worried", "afraid", "nervous"]):
-        scores["fear"] = 0.6
-    
-    # Default keywords
-    default_keywords = {
-        "joy": ["happy", "excited", "love", "enjoy"],
-        "anger": ["angry", "mad", "frustrated"],
-        "sadness": ["sad", "disappointed", "upset"],
-        "fear": ["worried", "afraid", "nervous"],
-    }
+async def emotion_endpoint(req: EmotionRequest, _: bool = Depends(_limiter.dependency("Rate limit exceeded for emotion analysis"))):
+    doc = tokenize(req.text)
+    return await analyze_emotion(doc.text, req.candidate_id, doc.tokens, req.since, req.include_history)
+
+async def analyze_emotion(text: str, candidate_id: str = None, tokens: list = None,
+                          since: Optional[int] = None, include_history: bool = True) -> dict:
+    """Score normalized `text` per emotion and update the candidate's session/model.
+    `tokens` lets callers share one tokenization across scorers; history is
+    returned from cursor `since` (all retained entries when None)."""
+    if tokens is None:
+        tokens = tokenize(text).tokens
 
     # Get candidate session
-    candidate_id = req.candidate_id or "default"
-    if candidate_id not in session_state:
-        session_state[candidate_id] = {"keywords": default_keywords.copy(), "history": []}
-    state = session_state[candidate_id]
-
-    # Expand keywords based on new words in text
-    for emotion, words in state["keywords"].items():
-        for word in text.split():
-            if word not in words and emotion in text:
-                state["keywords"][emotion].append(word)
-
-    # Score emotions
-    scores = {e: 0.0 for e in default_keywords}
-    for emotion, words in state["keywords"].items():
-        if any(w in text for w in words):
-            scores[emotion] = 0.7 + 0.1 * len(set(words) & set(text.split()))
+    candidate_id = candidate_id or "default"
+    state = await session_state.aget(candidate_id)
+
+    # Expand keywords based on new words in text (deduplicated, capped per label)
+    grow_keywords(state["keywords"], text, tokens, _settings.keyword_max_per_label)
+
+    # Score emotions: one pass over the text for all keyword lists
+    matcher = synced_matcher(matchers, candidate_id, state["keywords"])
+    scores = {e: 0.0 for e in DEFAULT_KEYWORDS}
+    for emotion in matcher.labels_in(text):
+        scores[emotion] = 0.7 + 0.1 * matcher.token_hits(emotion, tokens)
 
     # Save history
     state["history"].append({"text": text, "scores": scores})
 
     # --- ML model training/prediction ---
-    texts: List[str] = [h["text"] for h in state["history"]]
-    labels: List[str] = []
-    for h in state["history"]:
-        labels.append(max(h["scores"], key=lambda k: h["scores"][k]))
-    if len(texts) > 2:
-        tokenized = [t.split() for t in texts]
-        model = ml_models[candidate_id]
-        model.fit(tokenized, labels)
-        pred = model.predict([text.split()])[0]
+    # Online update with this answer only, so per-request cost is independent of session length
+    adapter = CandidateAdapter.from_dict(state.get("model"), _settings.ml_adapter_max_tokens)
+    adapter.partial_fit(tokens, max(scores, key=lambda k: scores[k]))
+    state["model"] = adapter.to_dict()
+    pred = predict_blended(get_base_model("emotion"), adapter, tokens, _settings.ml_adapter_strength)
+    if pred:
         # lift the predicted emotion score slightly
         scores[pred] = max(scores.get(pred, 0.0), 0.85)
+    await session_state.asave(candidate_id, state)
 
-    return {"emotion_scores": scores, "history": state["history"]}
+    result = {"emotion_scores": scores, "history_seq": state["history"].seq}
+    if include_history:
+        result["history"] = state["history"].since(since)
+    return result
@@ -2,10 +2,17 @@ from fastapi import APIRouter
 from pydantic import BaseModel
 from typing import Optional
 
+from .session_store import make_session_store
+
 router = APIRouter()
 
-# Global session state for feedback personalization
-session_state = {}
+# Session state for feedback personalization (Redis when configured, bounded memory otherwise)
+_HISTORY_FIELDS = ("feedbacks", "sentiments", "eq_scores", "emotions", "texts")
+session_state = make_session_store(
+    "feedback",
+    lambda: {field: [] for field in _HISTORY_FIELDS},
+    history_fields=_HISTORY_FIELDS,
+)
 
 class FeedbackRequest(BaseModel):
     text: str
@@ -14,13 +21,18 @@ class FeedbackRequest(BaseModel):
     emotion_scores: Optional[dict] = None
     voice_features: Optional[dict] = None
     candidate_id: Optional[str] = None
+    since: Optional[int] = None  # history cursor: only return entries after this `history_seq`
+    include_history: bool = True  # false: omit history from the response
 
 @router.post("/feedback")
 async def feedback_endpoint(req: FeedbackRequest):
-    candidate_id = req.candidate_id or req.text or "default"
-    if candidate_id not in session_state:
-        session_state[candidate_id] = {"feedbacks": [], "sentiments": [], "eq_scores": [], "emotions": [], "texts": []}
-    state = session_state[candidate_id]
+    return await generate_feedback(req)
+
+async def generate_feedback(req: FeedbackRequest) -> dict:
+    """Coaching text for one answer, personalized with the candidate's history."""
+    # Anonymous requests get throwaway state rather than a session keyed by their text
+    candidate_id = req.candidate_id
+    state = await session_state.aget(candidate_id) if candidate_id else session_state.new()
     state["sentiments"].append(req.sentiment)
     state["eq_scores"].append(req.eq_score)
     state["emotions"].append(req.emotion_scores)
@@ -80,7 +92,9 @@ async def feedback_endpoint(req: FeedbackRequest):
             feedback += " Your overall sentiment is more negative—focus on optimism."
 
     state["feedbacks"].append(feedback)
-    return {"feedback": feedback, "history": state}
-
-    state["feedbacks"].append(feedback)
-    return {"feedback": feedback, "history": state}
+    if candidate_id:
+        await session_state.asave(candidate_id, state)
+    result = {"feedback": feedback, "history_seq": state["feedbacks"].seq}
+    if req.include_history:
+        result["history"] = {field: state[field].since(req.since) for field in _HISTORY_FIELDS}
+    return result
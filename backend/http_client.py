@@ -0,0 +1,121 @@
+"""
+http_client.py
+Application-lifetime httpx.AsyncClient for upstream APIs (ElevenLabs).
+
+One pooled client is created at startup and reused so warm requests skip
+DNS/TCP/TLS setup; HTTP/2 is enabled when the `h2` package is installed.
+`send_with_retry` retries 429/5xx and transport errors with jittered
+exponential backoff (honoring Retry-After).
+
+Env: UPSTREAM_MAX_CONNECTIONS (20), UPSTREAM_MAX_KEEPALIVE (10),
+UPSTREAM_KEEPALIVE_EXPIRY (30s), UPSTREAM_HTTP2 (true),
+UPSTREAM_CONNECT_TIMEOUT (3s), UPSTREAM_READ_TIMEOUT (30s),
+UPSTREAM_RETRIES (2), UPSTREAM_BACKOFF_BASE (0.25s), UPSTREAM_BACKOFF_MAX (4s).
+"""
+import asyncio
+import os
+import random
+from typing import Optional
+
+import httpx
+from fastapi import Request
+
+from .logging_utils import log
+
+try:
+    import h2  # type: ignore  # noqa: F401
+    _H2_AVAILABLE = True
+except ImportError:  # pragma: no cover - optional dep
+    _H2_AVAILABLE = False
+
+_RETRY_STATUSES = {429, 500, 502, 503, 504}
+_fallback_client: Optional[httpx.AsyncClient] = None
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, str(default)))
+    except Exception:
+        return default
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    val = os.getenv(name)
+    if val is None:
+        return default
+    return val.lower() in ("1", "true", "yes", "on")
+
+
+def create_upstream_client(transport: Optional[httpx.AsyncBaseTransport] = None) -> httpx.AsyncClient:
+    """Build the shared client from env settings (`transport` is for tests/benchmarks)."""
+    limits = httpx.Limits(
+        max_connections=int(_env_float("UPSTREAM_MAX_CONNECTIONS", 20)),
+        max_keepalive_connections=int(_env_float("UPSTREAM_MAX_KEEPALIVE", 10)),
+        keepalive_expiry=_env_float("UPSTREAM_KEEPALIVE_EXPIRY", 30.0),
+    )
+    read_timeout = _env_float("UPSTREAM_READ_TIMEOUT", 30.0)
+    timeout = httpx.Timeout(
+        connect=_env_float("UPSTREAM_CONNECT_TIMEOUT", 3.0),
+        read=read_timeout,
+        write=read_timeout,
+        pool=_env_float("UPSTREAM_CONNECT_TIMEOUT", 3.0),
+    )
+    http2 = _H2_AVAILABLE and _env_bool("UPSTREAM_HTTP2", True)
+    return httpx.AsyncClient(limits=limits, timeout=timeout, http2=http2, transport=transport)
+
+
+def get_http_client(request: Request) -> httpx.AsyncClient:
+    """FastAPI dependency: the app's shared client (created lazily if startup hooks did not run)."""
+    client = getattr(request.app.state, "http_client", None)
+    if client is not None:
+        return client
+    global _fallback_client
+    if _fallback_client is None or _fallback_client.is_closed:
+        _fallback_client = create_upstream_client()
+    return _fallback_client
+
+
+def _backoff(attempt: int, retry_after: Optional[str]) -> float:
+    cap = _env_float("UPSTREAM_BACKOFF_MAX", 4.0)
+    if retry_after:
+        try:
+            return min(cap, max(0.0, float(retry_after)))
+        except ValueError:
+            pass
+    # Full jitter: uniform(0, base * 2^attempt), capped
+    return random.uniform(0, min(cap, _env_float("UPSTREAM_BACKOFF_BASE", 0.25) * (2 ** attempt)))
+
+
+async def send_with_retry(client: httpx.AsyncClient, request: httpx.Request, stream: bool = False,
+                          retries: Optional[int] = None) -> httpx.Response:
+    """
+    Send `request`, retrying 429/5xx responses and connect/read errors.
+    Returns the last response (which may still be an error status); raises the
+    last transport error if every attempt failed. With stream=True the caller
+    must close the returned response.
+    """
+    retries = int(_env_float("UPSTREAM_RETRIES", 2)) if retries is None else retries
+    attempt = 0
+    while True:
+        try:
+            response = await client.send(request, stream=stream)
+        except (httpx.ConnectError, httpx.ConnectTimeout, httpx.ReadTimeout, httpx.RemoteProtocolError) as e:
+            if attempt >= retries:
+                raise
+            delay = _backoff(attempt, None)
+            log("WARN", "upstream transport error; retrying", url=str(request.url), attempt=attempt + 1, error=str(e))
+        else:
+            if response.status_code not in _RETRY_STATUSES or attempt >= retries:
+                return response
+            delay = _backoff(attempt, response.headers.get("Retry-After"))
+            await response.aclose()
+            log("WARN", "upstream retryable status; retrying", url=str(request.url), status=response.status_code, attempt=attempt + 1)
+        attempt += 1
+        await asyncio.sleep(delay)
+
+
+async def close_fallback_client():
+    global _fallback_client
+    client, _fallback_client = _fallback_client, None
+    if client is not None:
+        await client.aclose()
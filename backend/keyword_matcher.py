@@ -0,0 +1,147 @@
+"""
+keyword_matcher.py
+Compiled keyword matching for the sentiment/emotion scorers.
+
+KeywordMatcher is an Aho-Corasick automaton over labelled keywords: one pass
+over the text finds every label with a keyword occurring as a substring (the
+same semantics as `any(w in text for w in words)`), independent of how many
+keywords a label has. Keywords are added incrementally; failure links are
+recomputed lazily on the next match after a change.
+
+Per-candidate keyword lists live in session state (possibly in Redis), so
+compiled matchers are cached in memory and synced against those lists.
+"""
+from collections import deque
+from typing import Any, Dict, Iterable, List, Set
+
+
+class KeywordMatcher:
+    """Labelled substring matcher. Use `sync(keywords)` to mirror a {label: [words]} mapping."""
+
+    def __init__(self, keywords: Dict[str, Iterable[str]] = None):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._own: List[Set[str]] = [set()]  # labels of keywords ending exactly at a state
+        self._out: List[frozenset] = [frozenset()]  # own labels plus those reachable via failure links
+        self._words: Dict[str, Set[str]] = {}
+        # Per label: how many list entries were consumed and the last one (detects replaced lists)
+        self._synced: Dict[str, tuple] = {}
+        self._dirty = False
+        if keywords:
+            self.sync(keywords)
+
+    def add(self, label: str, word: str) -> bool:
+        """Add one keyword; returns False if it was empty or already present for `label`."""
+        words = self._words.setdefault(label, set())
+        if not word or word in words:
+            return False
+        words.add(word)
+        state = 0
+        for ch in word:
+            nxt = self._goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._own.append(set())
+                self._out.append(frozenset())
+            state = nxt
+        self._own[state].add(label)
+        self._dirty = True
+        return True
+
+    def sync(self, keywords: Dict[str, List[str]]) -> "KeywordMatcher":
+        """Add entries appended to `keywords` since the last sync. Lists are expected to
+        only grow; if one was replaced (e.g. the session expired) the matcher is rebuilt."""
+        for label, words in keywords.items():
+            consumed, last = self._synced.get(label, (0, None))
+            if consumed > len(words) or (consumed and words[consumed - 1] != last):
+                self._reset()
+                return self.sync(keywords)
+            for word in words[consumed:]:
+                self.add(label, word)
+            if words:
+                self._synced[label] = (len(words), words[-1])
+        return self
+
+    def _reset(self):
+        self.__init__()
+
+    def _build(self):
+        # Breadth-first so each state's failure target is final before its children need it
+        self._out[0] = frozenset(self._own[0])
+        queue = deque()
+        for nxt in self._goto[0].values():
+            self._fail[nxt] = 0
+            self._out[nxt] = frozenset(self._own[nxt])
+            queue.append(nxt)
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                f = self._fail[state]
+                while f and ch not in self._goto[f]:
+                    f = self._fail[f]
+                self._fail[nxt] = self._goto[f].get(ch, 0)
+                self._out[nxt] = frozenset(self._own[nxt]) | self._out[self._fail[nxt]]
+                queue.append(nxt)
+        self._dirty = False
+
+    def labels_in(self, text: str) -> Set[str]:
+        """Labels with at least one keyword occurring in `text` (single pass)."""
+        if self._dirty:
+            self._build()
+        goto, fail, out = self._goto, self._fail, self._out
+        found: Set[str] = set()
+        remaining = len(self._words)
+        state = 0
+        for ch in text:
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if out[state]:
+                found |= out[state]
+                if len(found) == remaining:
+                    break  # every label already matched
+        return found
+
+    def token_hits(self, label: str, tokens: Iterable[str]) -> int:
+        """Distinct tokens that are themselves keywords of `label`."""
+        words = self._words.get(label, ())
+        return sum(1 for t in set(tokens) if t in words)
+
+    def __len__(self) -> int:
+        return sum(len(w) for w in self._words.values())
+
+
+def grow_keywords(keywords: Dict[str, List[str]], text: str, tokens: Iterable[str], cap: int) -> int:
+    """
+    Keyword learning shared by the scorers: when a label's name appears in the
+    text, the answer's tokens become keywords of that label. Deduplicated and
+    capped at `cap` words per label; returns how many were added.
+    """
+    added = 0
+    unique_tokens = list(dict.fromkeys(tokens))
+    for label, words in keywords.items():
+        if label not in text or len(words) >= cap:
+            continue
+        known = set(words)
+        for word in unique_tokens:
+            if len(words) >= cap:
+                break
+            if word not in known:
+                words.append(word)
+                known.add(word)
+                added += 1
+    return added
+
+
+def synced_matcher(store: Any, key: str, keywords: Dict[str, List[str]]) -> KeywordMatcher:
+    """Compiled matcher for `key` from a SessionStore of matchers, brought up to
+    date with `keywords`; re-saved (for memory accounting) only when it grew."""
+    matcher = store.get(key)
+    before = len(matcher)
+    matcher.sync(keywords)
+    if len(matcher) != before:
+        store.save(key, matcher)
+    return matcher
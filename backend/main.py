@@ -17,7 +17,8 @@ except ImportError:  # pragma: no cover
 	PCounter = None  # type: ignore
 	Histogram = None  # type: ignore
 
-REQUEST_COUNT = None
+REQUEST_COUNT = PCounter('http_requests_total', 'Total HTTP requests', ['method', 'path', 'status']) if PCounter else None
+REQUEST_LATENCY = Histogram('http_request_duration_seconds', 'HTTP request latency', ['method', 'path']) if Histogram else None
 
 # --- Router Imports ---
 print('Importing routers...')
@@ -28,6 +29,7 @@ from backend.emotion import router as emotion_router
 from backend.sentiment import router as sentiment_router
 from backend.archetype import router as archetype_router
 from backend.tts_preamble import router as tts_router
+from backend.analyze import router as analyze_router
 print('Routers imported')
 
 # --- Router Includes ---
@@ -39,30 +41,66 @@ app.include_router(emotion_router)
 app.include_router(sentiment_router)
 try:
 	import multipart  # type: ignore
-	from backend.voice import router as voice_router
+	from backend.voice import router as voice_router, UploadLimitMiddleware
 	app.include_router(voice_router)
+	# Reject oversized uploads before multipart parsing spools them to disk
+	app.add_middleware(UploadLimitMiddleware)
 except Exception as e:  # pragma: no cover
 	print('Skipping voice router (python-multipart not installed):', e)
 app.include_router(archetype_router)
 app.include_router(tts_router)
+app.include_router(analyze_router)
 
 # --- Lifecycle Events ---
 @app.on_event("startup")
 async def on_startup():
+    from backend.rate_limit import start_sweeper
+    from backend.byte_cache import start_expirer
+    from backend.http_client import create_upstream_client
+    from backend.tts_preamble import run_startup_warmup
+    from backend.base_models import load_base_models
+    import asyncio
+    start_sweeper(settings.rate_limit_sweep_sec)
+    start_expirer(settings.rate_limit_sweep_sec)
+    # One pooled upstream client for the app lifetime (injected into the TTS router)
+    app.state.http_client = create_upstream_client()
+    # Pre-render default preambles in the background; /ready stays 503 until it finishes
+    app.state.tts_warmup = asyncio.create_task(run_startup_warmup(app.state.http_client))
+    # Shared sentiment/emotion base models: read and compiled once, off the event loop
+    await asyncio.to_thread(load_base_models)
     log("INFO", "startup", version=settings.app_version, commit=settings.commit)
 
 @app.on_event("shutdown")
 async def on_shutdown():
+    from backend.analysis_pool import shutdown_analysis_pool
+    from backend.rate_limit import stop_sweeper
+    from backend.redis_utils import close_async_redis_client
+    from backend.byte_cache import stop_expirer
+    from backend.http_client import close_fallback_client
+    warmup = getattr(app.state, "tts_warmup", None)
+    if warmup is not None and not warmup.done():
+        warmup.cancel()
+    shutdown_analysis_pool()
+    await stop_sweeper()
+    await stop_expirer()
+    await close_async_redis_client()
+    client = getattr(app.state, "http_client", None)
+    if client is not None:
+        await client.aclose()
+    await close_fallback_client()
     log("INFO", "shutdown")
 
 # --- Readiness Endpoint ---
 @app.get("/ready")
 async def ready():
-    """Readiness probe: basic checks (cache size, env presence)."""
-    from backend.tts_preamble import _CACHE  # lightweight import
-    cache_items = len(_CACHE)
+    """Readiness probe: basic checks (cache usage, env presence); 503 while the TTS cache warms."""
+    from backend.tts_preamble import _CACHE, _DISK, _WARMUP, warmup_ready  # lightweight import
+    from backend.analysis_pool import get_analysis_pool
+    from backend.session_store import session_stats
+    if not warmup_ready():
+        return JSONResponse(status_code=503, content={"status": "warming", "tts_warmup": _WARMUP, "version": settings.app_version})
     eleven_key = bool(os.getenv('ELEVENLABS_API_KEY'))
-    return {"status": "ready", "cache_items": cache_items, "tts_enabled": eleven_key, "version": settings.app_version}
+    return {"status": "ready", "tts_warmup": _WARMUP, "cache_items": len(_CACHE), "tts_cache": {**_CACHE.stats(), "disk": _DISK.stats() if _DISK else None}, "tts_enabled": eleven_key, "voice_pool": get_analysis_pool().stats(), "sessions": session_stats(), "version": settings.app_version}
 
 # --- Uvicorn server startup ---
 if __name__ == "__main__":
@@ -78,7 +116,9 @@ async def prometheus_middleware(request: Request, call_next):
 	start = time.perf_counter()
 	response = await call_next(request)
 	duration = time.perf_counter() - start
-	path = request.url.path
+	# Label by route template ("/items/{id}"), not the raw path, to keep series bounded
+	route = request.scope.get("route")
+	path = getattr(route, "path", None) or "unmatched"
 	method = request.method
 	status = response.status_code
 	try:
@@ -1,58 +1,470 @@
 from __future__ import annotations
-from collections import defaultdict
+from array import array
+from bisect import bisect_left
+from collections import Counter, defaultdict
+import json
 import math
+import mmap
+import struct
+import sys
+
+# Optional dependency: NumPy vectorizes CompiledNB batch scoring; pure Python is used otherwise
+try:
+    import numpy as _np  # type: ignore
+except Exception:  # ImportError or broken install
+    _np = None  # type: ignore
 
 class SimpleMultinomialNB:
     """
     Tiny Multinomial Naive Bayes for text classification.
     - No numpy/scipy required.
     - Fits on token counts from pre-tokenized texts.
+    - Supports online training via partial_fit; log-probabilities are derived
+      from the counts at predict time, only for the tokens being scored.
     """
     def __init__(self):
-        self.class_log_priors = {}  # class -> log prior
-        self.feature_log_probs = {}  # class -> dict(token -> log P(token|class))
         self.vocab = set()
+        self.n_docs = 0
         self.class_counts = defaultdict(int)
         self.token_counts = defaultdict(lambda: defaultdict(int))
         self.total_tokens_per_class = defaultdict(int)
 
     def fit(self, docs: list[list[str]], y: list[str]):
-        # Count classes and tokens
-        n_docs = len(docs)
+        """Train from scratch on the given corpus (previous counts are discarded)."""
+        self.__init__()
         for tokens, cls in zip(docs, y):
-            self.class_counts[cls] += 1
-            for tok in tokens:
-                self.vocab.add(tok)
-                self.token_counts[cls][tok] += 1
-                self.total_tokens_per_class[cls] += 1
-        # Compute log priors
-        for cls, c in self.class_counts.items():
-            self.class_log_priors[cls] = math.log(c / n_docs)
-        # Compute smoothed log likelihoods
-        V = max(1, len(self.vocab))
-        for cls in self.class_counts:
-            denom = self.total_tokens_per_class[cls] + V  # Laplace smoothing
-            probs = {}
-            for tok in self.vocab:
-                num = self.token_counts[cls].get(tok, 0) + 1
-                probs[tok] = math.log(num / denom)
-            self.feature_log_probs[cls] = probs
+            self.partial_fit(tokens, cls)
         return self
 
+    def partial_fit(self, doc: list[str], label: str):
+        """Add a single labelled document; O(len(doc))."""
+        self.n_docs += 1
+        self.class_counts[label] += 1
+        counts = self.token_counts[label]
+        for tok in doc:
+            self.vocab.add(tok)
+            counts[tok] += 1
+        self.total_tokens_per_class[label] += len(doc)
+        return self
+
+    @property
+    def class_log_priors(self) -> dict:
+        return {cls: math.log(c / self.n_docs) for cls, c in self.class_counts.items()}
+
+    def to_dict(self) -> dict:
+        return {
+            "format": "nb-counts-v1",
+            "n_docs": self.n_docs,
+            "class_counts": dict(self.class_counts),
+            "token_counts": {cls: dict(counts) for cls, counts in self.token_counts.items()},
+            "total_tokens_per_class": dict(self.total_tokens_per_class),
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "SimpleMultinomialNB":
+        if data.get("format") != "nb-counts-v1":
+            raise ValueError(f"unsupported model format: {data.get('format')!r}")
+        model = cls()
+        model.n_docs = int(data["n_docs"])
+        model.class_counts.update(data["class_counts"])
+        for label, counts in data["token_counts"].items():
+            model.token_counts[label].update(counts)
+            model.vocab.update(counts)
+        model.total_tokens_per_class.update(data["total_tokens_per_class"])
+        return model
+
+    def save(self, path: str):
+        """Write the counts as JSON (counts, not log-probs, so a saved model can keep training)."""
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, separators=(",", ":"))
+
+    @classmethod
+    def load(cls, path: str) -> "SimpleMultinomialNB":
+        with open(path, encoding="utf-8") as f:
+            return cls.from_dict(json.load(f))
+
+    def compile(self) -> "CompiledNB":
+        """Freeze the current counts into a CompiledNB for fast (batch) scoring."""
+        return CompiledNB.from_model(self)
+
     def predict(self, docs: list[list[str]]):
         preds = []
+        V = max(1, len(self.vocab))
         for tokens in docs:
             scores = {}
             token_counts = defaultdict(int)
             for t in tokens:
                 token_counts[t] += 1
-            for cls in self.class_counts:
-                score = self.class_log_priors[cls]
-                flp = self.feature_log_probs[cls]
+            for cls, n_cls in self.class_counts.items():
+                score = math.log(n_cls / self.n_docs)
+                counts = self.token_counts[cls]
+                denom = self.total_tokens_per_class[cls] + V  # Laplace smoothing
                 for tok, cnt in token_counts.items():
-                    score += cnt * flp.get(tok, math.log(1 / (self.total_tokens_per_class[cls] + max(1, len(self.vocab)))))
+                    score += cnt * math.log((counts.get(tok, 0) + 1) / denom)
                 scores[cls] = score
             # pick max score class
             pred = max(scores, key=scores.get)
             preds.append(pred)
         return preds
+
+
+# Binary CompiledNB file ("NBC1"), little-endian, sections 8-byte aligned:
+#   header: magic, n_classes, n_vocab, class name bytes, vocab bytes
+#   float64 log priors[C], float64 unseen log-probs[C]
+#   uint32 class name offsets[C + 1] + UTF-8 names
+#   uint32 vocab offsets[V + 1] + UTF-8 tokens, sorted bytewise (one copy of each token)
+#   float32 log-prob table[C][V], row-major
+_NBC_MAGIC = b"NBC1"
+_NBC_HEADER = struct.Struct("<4sIIII")
+_LITTLE_ENDIAN = sys.byteorder == "little"
+
+
+def _align(n: int) -> int:
+    return (n + 7) & ~7
+
+
+def _packed(typecode: str, values) -> bytes:
+    arr = array(typecode, values)
+    if not _LITTLE_ENDIAN:
+        arr.byteswap()
+    return arr.tobytes()
+
+
+def _unpacked(buf, offset: int, typecode: str, count: int):
+    """Zero-copy typed view of `count` items at `offset` (a byte-swapped copy on big-endian hosts)."""
+    size = array(typecode).itemsize * count
+    view = memoryview(buf)[offset:offset + size]
+    if _LITTLE_ENDIAN:
+        return view.cast(typecode)
+    arr = array(typecode, view.tobytes())
+    arr.byteswap()
+    return arr
+
+
+def _pack_strings(strings: list[str]) -> tuple[bytes, bytes]:
+    encoded = [s.encode("utf-8", "surrogatepass") for s in strings]
+    offsets, pos = [0], 0
+    for b in encoded:
+        pos += len(b)
+        offsets.append(pos)
+    return _packed("I", offsets), b"".join(encoded)
+
+
+class _MappedVocab:
+    """
+    Read-only token -> column mapping over the sorted vocabulary section of a
+    mapped model file. Lookups binary-search the file's bytes, so loading costs
+    nothing per token and the pages are shared by every process mapping the file;
+    a bounded per-process memo keeps hot tokens at dict speed.
+    """
+    __slots__ = ("_buf", "_offsets", "_base", "_n", "_memo")
+    MEMO_SIZE = 65536
+
+    def __init__(self, buf, offsets, base: int):
+        self._buf, self._offsets, self._base, self._n = buf, offsets, base, len(offsets) - 1
+        self._memo: dict[str, int | None] = {}
+
+    def _token(self, i: int) -> bytes:
+        return self._buf[self._base + self._offsets[i]:self._base + self._offsets[i + 1]]
+
+    def get(self, tok: str, default=None):
+        try:
+            col = self._memo[tok]
+        except KeyError:
+            key = tok.encode("utf-8", "surrogatepass")
+            i = bisect_left(range(self._n), key, key=self._token)
+            col = i if i < self._n and self._token(i) == key else None
+            if len(self._memo) >= self.MEMO_SIZE:
+                self._memo.clear()
+            self._memo[tok] = col
+        return default if col is None else col
+
+    def __getitem__(self, tok: str) -> int:
+        col = self.get(tok)
+        if col is None:
+            raise KeyError(tok)
+        return col
+
+    def __contains__(self, tok: str) -> bool:
+        return self.get(tok) is not None
+
+    def __len__(self) -> int:
+        return self._n
+
+    def __iter__(self):
+        return (self._token(i).decode("utf-8", "surrogatepass") for i in range(self._n))
+
+
+class CompiledNB:
+    """
+    Read-only form of a trained SimpleMultinomialNB: a vocabulary index and a
+    dense class-by-token table of Laplace-smoothed log-probabilities, computed
+    once. Documents become sparse (column, count) vectors, so scoring is a
+    gather-and-sum per class instead of nested dict lookups and log calls.
+    Uses NumPy when installed (whole batch in one vectorized pass), otherwise
+    `array('d')` rows. Predictions match SimpleMultinomialNB.predict.
+    """
+    def __init__(self, classes: list[str], vocab: list[str], log_prob_rows: list, log_priors: list[float],
+                 unseen_log_prob: list[float]):
+        self.classes = list(classes)
+        self.vocab_index = {tok: i for i, tok in enumerate(vocab)}
+        self.log_priors = list(log_priors)
+        # Out-of-vocabulary tokens still count (as in the source model): log(1 / denom) per class
+        self.unseen_log_prob = list(unseen_log_prob)
+        if _np is not None:
+            self.log_prob = _np.asarray(log_prob_rows, dtype=_np.float64).reshape(len(self.classes), len(vocab))
+        else:
+            self.log_prob = [row if isinstance(row, array) else array("d", row) for row in log_prob_rows]
+
+    @classmethod
+    def from_model(cls, model: SimpleMultinomialNB) -> "CompiledNB":
+        classes = list(model.class_counts)
+        vocab = sorted(model.vocab)
+        V = max(1, len(model.vocab))
+        rows, unseen = [], []
+        for c in classes:
+            counts = model.token_counts[c]
+            denom = model.total_tokens_per_class[c] + V
+            log_denom = math.log(denom)
+            rows.append(array("d", (math.log(counts.get(tok, 0) + 1) - log_denom for tok in vocab)))
+            unseen.append(-log_denom)
+        priors = [math.log(model.class_counts[c] / model.n_docs) for c in classes]
+        return cls(classes, vocab, rows, priors, unseen)
+
+    def joint_log_likelihood(self, docs: list[list[str]]):
+        """Unnormalized per-class scores, shape (len(docs), len(classes))."""
+        index_get = self.vocab_index.get
+        if _np is not None:
+            # Whole batch as one sparse COO matrix: (doc row, vocab column) per token; -1 marks OOV
+            n_docs = len(docs)
+            cols = _np.fromiter((index_get(t, -1) for doc in docs for t in doc), dtype=_np.intp)
+            rows = _np.repeat(_np.arange(n_docs), [len(doc) for doc in docs])
+            known = cols >= 0
+            oov = _np.bincount(rows[~known], minlength=n_docs)
+            rows, cols = rows[known], cols[known]
+            out = _np.empty((n_docs, len(self.classes)))
+            for k in range(len(self.classes)):
+                out[:, k] = (self.log_priors[k] + oov * self.unseen_log_prob[k]
+                             + _np.bincount(rows, weights=self.log_prob[k, cols], minlength=n_docs))
+            return out
+        scores = []
+        for doc in docs:
+            cols = [c for c in map(index_get, doc) if c is not None]
+            oov = len(doc) - len(cols)
+            scores.append([
+                self.log_priors[k] + oov * self.unseen_log_prob[k] + sum(map(row.__getitem__, cols))
+                for k, row in enumerate(self.log_prob)
+            ])
+        return scores
+
+    def predict_log_proba(self, docs: list[list[str]]):
+        """Normalized log-probabilities per class (log-softmax of the joint scores)."""
+        jll = self.joint_log_likelihood(docs)
+        if _np is not None:
+            top = jll.max(axis=1, keepdims=True) if len(self.classes) else 0.0
+            return jll - (top + _np.log(_np.exp(jll - top).sum(axis=1, keepdims=True)))
+        out = []
+        for row in jll:
+            top = max(row)
+            norm = top + math.log(sum(math.exp(v - top) for v in row))
+            out.append([v - norm for v in row])
+        return out
+
+    def predict_batch(self, docs: list[list[str]]) -> list[str]:
+        jll = self.joint_log_likelihood(docs)
+        if _np is not None:
+            return [self.classes[i] for i in jll.argmax(axis=1)]
+        # max() keeps the first of tied classes, like SimpleMultinomialNB.predict
+        return [self.classes[max(range(len(row)), key=row.__getitem__)] for row in jll]
+
+    predict = predict_batch
+
+    def save(self, path: str):
+        """Write the compact binary form (log-probs stored as float32); read it back with `load`."""
+        vocab = sorted(self.vocab_index, key=lambda t: t.encode("utf-8", "surrogatepass"))
+        cols = [self.vocab_index[t] for t in vocab]
+        if _np is not None:
+            table = self.log_prob[:, cols].astype("<f4").tobytes() if cols else b""
+        else:
+            table = b"".join(_packed("f", map(row.__getitem__, cols)) for row in self.log_prob)
+        class_offsets, class_blob = _pack_strings(self.classes)
+        vocab_offsets, vocab_blob = _pack_strings(vocab)
+        sections = [
+            _NBC_HEADER.pack(_NBC_MAGIC, len(self.classes), len(vocab), len(class_blob), len(vocab_blob)),
+            _packed("d", self.log_priors) + _packed("d", self.unseen_log_prob),
+            class_offsets + class_blob,
+            vocab_offsets + vocab_blob,
+            table,
+        ]
+        with open(path, "wb") as f:
+            for section in sections:
+                f.write(section)
+                f.write(b"\0" * (_align(len(section)) - len(section)))
+
+    @classmethod
+    def load(cls, path: str) -> "CompiledNB":
+        """
+        Map a file written by `save`. Nothing is parsed up front beyond the class
+        names: the vocabulary and log-prob table are used in place, so load time
+        does not depend on the vocabulary size.
+        """
+        with open(path, "rb") as f:
+            buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(buf) < _NBC_HEADER.size:
+            raise ValueError(f"not a compiled model file: {path}")
+        magic, n_classes, n_vocab, class_len, vocab_len = _NBC_HEADER.unpack_from(buf)
+        if magic != _NBC_MAGIC:
+            raise ValueError(f"not a compiled model file: {path}")
+
+        def need(end: int, section: str):
+            if end > len(buf):
+                raise ValueError(f"truncated compiled model file: {path} ({section} needs {end} bytes, file has {len(buf)})")
+
+        pos = _align(_NBC_HEADER.size)
+        need(pos + 16 * n_classes, "priors")
+        priors = list(_unpacked(buf, pos, "d", n_classes))
+        unseen = list(_unpacked(buf, pos + 8 * n_classes, "d", n_classes))
+        pos = _align(pos + 16 * n_classes)
+        need(pos + 4 * (n_classes + 1), "class offsets")
+        class_offsets = _unpacked(buf, pos, "I", n_classes + 1)
+        base = pos + 4 * (n_classes + 1)
+        need(base + class_len, "class names")
+        if class_offsets[0] != 0 or class_offsets[n_classes] != class_len or any(
+                class_offsets[i] > class_offsets[i + 1] for i in range(n_classes)):
+            raise ValueError(f"corrupt compiled model file: {path} (class offsets)")
+        classes = [buf[base + class_offsets[i]:base + class_offsets[i + 1]].decode("utf-8", "surrogatepass")
+                   for i in range(n_classes)]
+        pos = _align(base + class_len)
+        need(pos + 4 * (n_vocab + 1), "vocab offsets")
+        vocab_offsets = _unpacked(buf, pos, "I", n_vocab + 1)
+        vocab_base = pos + 4 * (n_vocab + 1)
+        need(vocab_base + vocab_len, "vocab")
+        # Only the ends are checked: walking every offset would make load O(vocab)
+        if vocab_offsets[0] != 0 or vocab_offsets[n_vocab] != vocab_len:
+            raise ValueError(f"corrupt compiled model file: {path} (vocab offsets)")
+        pos = _align(vocab_base + vocab_len)
+        need(pos + 4 * n_classes * n_vocab, "log-prob table")
+
+        model = cls.__new__(cls)  # bypass __init__: nothing to copy
+        model.classes = classes
+        model.vocab_index = _MappedVocab(buf, vocab_offsets, vocab_base)
+        model.log_priors = priors
+        model.unseen_log_prob = unseen
+        if _np is not None:
+            model.log_prob = _np.frombuffer(buf, dtype="<f4", count=n_classes * n_vocab, offset=pos).reshape(n_classes, n_vocab)
+        else:
+            table = _unpacked(buf, pos, "f", n_classes * n_vocab)
+            model.log_prob = [table[k * n_vocab:(k + 1) * n_vocab] for k in range(n_classes)]
+        model._mmap = buf
+        return model
+
+
+def load_model(path: str) -> CompiledNB:
+    """Load a scoring model from either a binary CompiledNB file or SimpleMultinomialNB JSON counts."""
+    with open(path, "rb") as f:
+        magic = f.read(len(_NBC_MAGIC))
+    if magic == _NBC_MAGIC:
+        return CompiledNB.load(path)
+    return SimpleMultinomialNB.load(path).compile()
+
+
+class CandidateAdapter:
+    """
+    Per-candidate delta on top of a shared base model: the candidate's own class
+    and token counts. At most `max_tokens` distinct (class, token) entries are
+    kept, so memory stays a few KB whatever the base vocabulary size; tokens
+    beyond the cap still count toward class totals (scored as unseen).
+    """
+    __slots__ = ("n_docs", "class_counts", "token_counts", "total_tokens", "max_tokens", "_entries")
+
+    def __init__(self, max_tokens: int = 128):
+        self.n_docs = 0
+        self.class_counts: dict[str, int] = {}
+        self.token_counts: dict[str, dict[str, int]] = {}
+        self.total_tokens: dict[str, int] = {}
+        self.max_tokens = max_tokens
+        self._entries = 0
+
+    def partial_fit(self, doc: list[str], label: str):
+        self.n_docs += 1
+        self.class_counts[label] = self.class_counts.get(label, 0) + 1
+        self.total_tokens[label] = self.total_tokens.get(label, 0) + len(doc)
+        counts = self.token_counts.setdefault(label, {})
+        for tok in doc:
+            if tok in counts:
+                counts[tok] += 1
+            elif self._entries < self.max_tokens:
+                counts[tok] = 1
+                self._entries += 1
+        return self
+
+    def vocab_size(self) -> int:
+        return len(set().union(*self.token_counts.values())) if self.token_counts else 0
+
+    def to_dict(self) -> dict:
+        """JSON-serializable counts, kept in the candidate's session state (shared across replicas)."""
+        return {
+            "n_docs": self.n_docs,
+            "class_counts": dict(self.class_counts),
+            "token_counts": {cls: dict(counts) for cls, counts in self.token_counts.items()},
+            "total_tokens": dict(self.total_tokens),
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict | None, max_tokens: int = 128) -> "CandidateAdapter":
+        adapter = cls(max_tokens)
+        if data:
+            adapter.n_docs = int(data["n_docs"])
+            adapter.class_counts = dict(data["class_counts"])
+            adapter.token_counts = {label: dict(counts) for label, counts in data["token_counts"].items()}
+            adapter.total_tokens = dict(data["total_tokens"])
+            adapter._entries = sum(len(counts) for counts in adapter.token_counts.values())
+        return adapter
+
+    def predict_proba(self, doc: list[str], vocab_size: int | None = None) -> dict[str, float]:
+        """Laplace-smoothed NB posterior over the classes this candidate has seen."""
+        V = max(1, self.vocab_size() if vocab_size is None else vocab_size)
+        doc_counts = Counter(doc)
+        jll = {}
+        for cls, n_cls in self.class_counts.items():
+            counts = self.token_counts.get(cls, {})
+            denom = self.total_tokens[cls] + V
+            score = math.log(n_cls / self.n_docs)
+            for tok, cnt in doc_counts.items():
+                score += cnt * math.log((counts.get(tok, 0) + 1) / denom)
+            jll[cls] = score
+        return _softmax(jll)
+
+
+def _softmax(scores: dict[str, float]) -> dict[str, float]:
+    if not scores:
+        return {}
+    top = max(scores.values())
+    exp = {k: math.exp(v - top) for k, v in scores.items()}
+    total = sum(exp.values())
+    return {k: v / total for k, v in exp.items()}
+
+
+def predict_blended(base: CompiledNB | None, adapter: CandidateAdapter, doc: list[str],
+                    strength: float = 5.0, min_docs: int = 3) -> str | None:
+    """
+    Class for `doc` from the shared base model blended with a candidate adapter:
+    P = (1 - w) * P_base + w * P_adapter with w = n / (n + strength), so the
+    candidate's own history takes over as it grows. Without a base model the
+    adapter alone is used once it has `min_docs` documents; returns None if
+    there is nothing to predict with.
+    """
+    if base is None:
+        if adapter.n_docs < min_docs:
+            return None
+        proba = adapter.predict_proba(doc)
+        return max(proba, key=proba.get)
+    log_proba = base.predict_log_proba([doc])[0]
+    blended = {cls: math.exp(lp) for cls, lp in zip(base.classes, log_proba)}
+    if adapter.n_docs:
+        w = adapter.n_docs / (adapter.n_docs + strength)
+        # Smooth over the base vocabulary plus the candidate's own extra tokens
+        extra = len({tok for counts in adapter.token_counts.values() for tok in counts if tok not in base.vocab_index})
+        delta = adapter.predict_proba(doc, vocab_size=len(base.vocab_index) + extra)
+        blended = {cls: (1 - w) * blended.get(cls, 0.0) + w * delta.get(cls, 0.0) for cls in dict.fromkeys([*blended, *delta])}
+    return max(blended, key=blended.get) if blended else None
@@ -10,14 +10,15 @@ class NextQuestionRequest(BaseModel):
     emotion_scores: dict = None
     voice_features: dict = None
 
+def choose_next_question(sentiment: str = None, eq_score: int = None, emotion_scores: dict = None) -> str:
+    if sentiment == "Negative":
+        return "Can you share how you overcame a recent challenge?"
+    elif eq_score is not None and eq_score < 15:
+        return "How do you handle feedback or criticism?"
+    elif emotion_scores and emotion_scores.get("joy", 0) > 0.6:
+        return "What achievement are you most proud of?"
+    return "Tell me about a time you worked in a team."
+
 @router.post("/next_question")
 async def next_question_endpoint(req: NextQuestionRequest):
-    if req.sentiment == "Negative":
-        question = "Can you share how you overcame a recent challenge?"
-    elif req.eq_score is not None and req.eq_score < 15:
-        question = "How do you handle feedback or criticism?"
-    elif req.emotion_scores and req.emotion_scores.get("joy", 0) > 0.6:
-        question = "What achievement are you most proud of?"
-    else:
-        question = "Tell me about a time you worked in a team."
-    return {"next_question": question}
+    return {"next_question": choose_next_question(req.sentiment, req.eq_score, req.emotion_scores)}
@@ -0,0 +1,193 @@
+"""
+rate_limit.py
+Per-client rate limiting shared by the API routers.
+
+In memory, each key costs a fixed three-int bucket (sliding-window counter:
+the previous fixed window's count is weighted by how much of it still
+overlaps the sliding window), so checks are O(1) and memory does not grow
+with request volume. Idle keys are swept by a background task. With an
+async Redis client the exact sliding-window log runs as one atomic Lua
+script, shared by all replicas; Redis errors fall back to memory.
+"""
+import asyncio
+import math
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional
+
+from fastapi import HTTPException, Request
+
+from .logging_utils import log
+
+try:
+    from prometheus_client import Counter as PCounter
+except ImportError:  # pragma: no cover
+    PCounter = None  # type: ignore
+
+_BLOCKS = PCounter('rate_limit_blocks_total', 'Requests rejected by a rate limiter', ['limiter']) if PCounter else None
+
+# Sliding-window log in one atomic step: trim, count, conditionally add `cost` entries,
+# expire, compute reset. Returns {allowed (0/1), count, reset_seconds}. Rejected
+# requests are not recorded.
+SLIDING_WINDOW_LUA = """
+local now = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local limit = tonumber(ARGV[3])
+local cost = tonumber(ARGV[5] or 1)
+redis.call('ZREMRANGEBYSCORE', KEYS[1], 0, now - window)
+local count = redis.call('ZCARD', KEYS[1])
+local allowed = 0
+if count + cost <= limit then
+  for i = 1, cost do
+    redis.call('ZADD', KEYS[1], now, ARGV[4] .. ':' .. i)
+  end
+  count = count + cost
+  allowed = 1
+end
+redis.call('EXPIRE', KEYS[1], math.ceil(window))
+local reset = math.ceil(window)
+local earliest = redis.call('ZRANGE', KEYS[1], 0, 0, 'WITHSCORES')
+if earliest[2] then
+  reset = math.ceil(tonumber(earliest[2]) + window - now)
+end
+return {allowed, count, reset}
+"""
+
+_LIMITERS: List["RateLimiter"] = []
+_sweeper: Optional[asyncio.Task] = None
+
+
+class RateLimiter:
+    """
+    `limit` requests per `window` seconds per key (client IP by default).
+    A limit <= 0 disables the limiter. Use `dependency()` with FastAPI Depends.
+    """
+
+    def __init__(self, name: str, limit: int, window: float, redis: Any = None, sweep_interval: float = 30.0):
+        self.name = name
+        self.limit = limit
+        self.window = float(window)
+        self.sweep_interval = sweep_interval
+        # key -> [window_index, previous_window_count, current_window_count]
+        self._buckets: Dict[str, List[int]] = {}
+        self._last_sweep = time.monotonic()
+        self.set_redis(redis)
+        _LIMITERS.append(self)
+
+    def set_redis(self, redis: Any):
+        self.redis = redis
+        self._script = redis.register_script(SLIDING_WINDOW_LUA) if redis is not None else None
+
+    async def check(self, key: str, cost: int = 1) -> Dict[str, Any]:
+        """Record a request worth `cost` units for `key`; returns
+        {allowed, limit, remaining, reset, backend}."""
+        now = time.time()
+        if self.limit <= 0:
+            return {"allowed": True, "limit": 0, "remaining": 0, "reset": 0, "backend": "disabled"}
+        if self._script is not None:
+            try:
+                allowed, count, reset = await self._script(
+                    keys=[f"{self.name}:rl:{key}"],
+                    args=[now, self.window, self.limit, f"{now}:{uuid.uuid4().hex[:8]}", cost],
+                )
+                return {"allowed": bool(int(allowed)), "limit": self.limit, "remaining": max(self.limit - int(count), 0),
+                        "reset": int(reset), "backend": "redis"}
+            except Exception as e:
+                log("WARN", "rate limit redis error; using memory", limiter=self.name, error=str(e))
+        return self._check_memory(key, now, cost)
+
+    def _check_memory(self, key: str, now: float, cost: int = 1) -> Dict[str, Any]:
+        if _sweeper is None and time.monotonic() - self._last_sweep > self.sweep_interval:
+            self.sweep(now)  # no background task (e.g. tests / scripts): sweep inline
+        idx = int(now // self.window)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = [idx, 0, 0]
+        elif bucket[0] != idx:
+            bucket[1] = bucket[2] if bucket[0] == idx - 1 else 0
+            bucket[2] = 0
+            bucket[0] = idx
+        elapsed = now - idx * self.window
+        weight = 1.0 - elapsed / self.window
+        estimate = bucket[1] * weight + bucket[2]
+        if estimate + cost > self.limit:
+            return {"allowed": False, "limit": self.limit, "remaining": 0,
+                    "reset": self._reset_after(bucket, elapsed), "backend": "memory"}
+        bucket[2] += cost
+        return {"allowed": True, "limit": self.limit, "remaining": max(int(self.limit - estimate - cost), 0),
+                "reset": self._reset_after(bucket, elapsed), "backend": "memory"}
+
+    def _reset_after(self, bucket: List[int], elapsed: float) -> int:
+        """Seconds until one more request would be admitted."""
+        prev, curr = bucket[1], bucket[2]
+        if curr + 1 > self.limit or prev == 0:
+            return max(1, math.ceil(self.window - elapsed))
+        # Solve prev * (1 - t / window) + curr + 1 <= limit for t
+        t = self.window * (1.0 - (self.limit - 1 - curr) / prev)
+        return max(0, math.ceil(t - elapsed))
+
+    def sweep(self, now: Optional[float] = None) -> int:
+        """Drop keys with no requests in the current or previous window; returns count removed."""
+        now = time.time() if now is None else now
+        self._last_sweep = time.monotonic()
+        idx = int(now // self.window)
+        stale = [k for k, b in self._buckets.items() if b[0] < idx - 1]
+        for k in stale:
+            del self._buckets[k]
+        return len(stale)
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    async def enforce(self, request: Request, detail: str = "Rate limit exceeded", cost: int = 1,
+                      key_func: Optional[Callable[[Request], str]] = None) -> bool:
+        """Charge `cost` units for the request's client; raises 429 (with Retry-After)
+        and stores the result on request.state.rate_limit. For handlers whose cost
+        depends on the parsed body."""
+        key = key_func(request) if key_func else (request.client.host if request.client else "unknown")
+        result = await self.check(key, cost)
+        request.state.rate_limit = result
+        if not result["allowed"]:
+            if _BLOCKS:
+                try: _BLOCKS.labels(limiter=self.name).inc()
+                except Exception: pass
+            raise HTTPException(status_code=429, detail=detail, headers={
+                "Retry-After": str(result["reset"]),
+                "X-RateLimit-Limit": str(result["limit"]),
+                "X-RateLimit-Remaining": "0",
+            })
+        return True
+
+    def dependency(self, detail: str = "Rate limit exceeded", key_func: Optional[Callable[[Request], str]] = None):
+        """FastAPI dependency charging one unit per request (see `enforce`)."""
+        async def _dependency(request: Request) -> bool:
+            return await self.enforce(request, detail, key_func=key_func)
+        return _dependency
+
+
+async def _sweep_loop(interval: float):
+    while True:
+        await asyncio.sleep(interval)
+        for limiter in list(_LIMITERS):
+            try:
+                limiter.sweep()
+            except Exception as e:  # pragma: no cover - defensive
+                log("WARN", "rate limit sweep failed", limiter=limiter.name, error=str(e))
+
+
+def start_sweeper(interval: float = 30.0):
+    """Start the background idle-key sweeper (call from app startup)."""
+    global _sweeper
+    if _sweeper is None or _sweeper.done():
+        _sweeper = asyncio.get_running_loop().create_task(_sweep_loop(interval))
+
+
+async def stop_sweeper():
+    global _sweeper
+    task, _sweeper = _sweeper, None
+    if task is not None:
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
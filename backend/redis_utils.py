@@ -7,6 +7,18 @@ try:
 except ImportError:  # pragma: no cover - optional dep
     redis = None  # type: ignore
 
+try:
+    import redis.asyncio as aioredis  # type: ignore
+except ImportError:  # pragma: no cover - optional dep
+    aioredis = None  # type: ignore
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, str(default)))
+    except Exception:
+        return default
+
 
 @lru_cache()
 def get_redis_client() -> Optional["redis.Redis"]:
@@ -26,5 +38,40 @@ def get_redis_client() -> Optional["redis.Redis"]:
         return None
 
 
+@lru_cache()
+def get_async_redis_client() -> Optional["aioredis.Redis"]:
+    """Return a shared asyncio Redis client backed by one connection pool; None if not configured.
+
+    Only enabled when the synchronous client could ping the server at startup, so an unreachable
+    Redis degrades to the in-memory paths instead of timing out on every request.
+    Pool size and timeouts: REDIS_MAX_CONNECTIONS (50), REDIS_SOCKET_TIMEOUT (0.5s),
+    REDIS_CONNECT_TIMEOUT (0.5s).
+    """
+    url = os.getenv("REDIS_URL")
+    if not url or not aioredis or get_redis_client() is None:
+        return None
+    pool = aioredis.ConnectionPool.from_url(
+        url,
+        max_connections=int(_env_float("REDIS_MAX_CONNECTIONS", 50)),
+        socket_timeout=_env_float("REDIS_SOCKET_TIMEOUT", 0.5),
+        socket_connect_timeout=_env_float("REDIS_CONNECT_TIMEOUT", 0.5),
+        retry_on_timeout=False,
+        health_check_interval=30,
+    )
+    return aioredis.Redis(connection_pool=pool)
+
+
+async def close_async_redis_client():
+    """Release pooled connections (call from app shutdown)."""
+    if not get_async_redis_client.cache_info().currsize:
+        return
+    client = get_async_redis_client()
+    if client is None:
+        return
+    close = getattr(client, "aclose", None) or client.close
+    await close()
+    await client.connection_pool.disconnect()
+
+
 def redis_available() -> bool:
     return get_redis_client() is not None
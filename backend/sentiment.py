@@ -1,53 +1,69 @@
+from typing import Optional
+
 from fastapi import APIRouter
 from pydantic import BaseModel
-from collections import defaultdict
-from typing import List
-
-# Optional ML dependencies (disabled by default for lightweight deploys)
-try:
-    from sklearn.naive_bayes import MultinomialNB  # type: ignore
-    _ML_AVAILABLE = True
-except Exception:
-    MultinomialNB = None  # type: ignore
-    _ML_AVAILABLE = False
-from .ml_utils import SimpleMultinomialNB
+
+from .base_models import get_base_model
+from .config import get_settings
+from .keyword_matcher import KeywordMatcher, grow_keywords, synced_matcher
+from .ml_utils import CandidateAdapter, predict_blended
+from .session_store import SessionStore, make_session_store
+from .tokenizer import tokenize
 
 router = APIRouter()
 
 class SentimentRequest(BaseModel):
     text: str
     candidate_id: str = None  # Optional: track candidate
+    since: Optional[int] = None  # history cursor: only return entries after this `history_seq`
+    include_history: bool = True  # false: omit history from the response
+
+# Labels returned by /sentiment (and expected of a sentiment base model)
+LABELS = ("Positive", "Negative", "Neutral")
+
+# Default keywords
+DEFAULT_KEYWORDS = {
+    "positive": ["good", "great", "happy", "excited", "love", "enjoy", "success", "proud"],
+    "negative": ["bad", "sad", "difficult", "challenge", "problem", "fail", "stress", "tough"],
+}
 
-session_state = {}
-# --- Optional ML model for sentiment learning ---
-ml_models = defaultdict(lambda: MultinomialNB()) if _ML_AVAILABLE else defaultdict(lambda: SimpleMultinomialNB())  # type: ignore
+def _new_session() -> dict:
+    return {"keywords": {t: list(words) for t, words in DEFAULT_KEYWORDS.items()}, "history": []}
+
+_settings = get_settings()
+session_state = make_session_store("sentiment", _new_session, history_fields=("history",))
+# --- ML sentiment: shared base model (optional) + small per-candidate delta ---
+# The delta (CandidateAdapter) is stored in the session state under "model", so with the
+# Redis store every replica trains and predicts with the same one.
+# Compiled keyword matchers, synced with each candidate's (growing) keyword lists. Derived
+# from the session's keywords and rebuilt by `sync`, so they stay process-local.
+matchers = SessionStore("sentiment_matchers", KeywordMatcher)
 
 @router.post("/sentiment")
 async def sentiment_endpoint(req: SentimentRequest):
-    text = req.text.lower()
+    doc = tokenize(req.text)
+    return await analyze_sentiment(doc.text, req.candidate_id, doc.tokens, req.since, req.include_history)
 
-    # Default keywords
-    default_keywords = {
-        "positive": ["good", "great", "happy", "excited", "love", "enjoy", "success", "proud"],
-        "negative": ["bad", "sad", "difficult", "challenge", "problem", "fail", "stress", "tough"],
-    }
+async def analyze_sentiment(text: str, candidate_id: str = None, tokens: list = None,
+                            since: Optional[int] = None, include_history: bool = True) -> dict:
+    """Score normalized `text` (tokenizer.tokenize) against the candidate's keywords and
+    update their session/model. `tokens` lets callers share one tokenization across scorers;
+    history is returned from cursor `since` (all retained entries when None)."""
+    if tokens is None:
+        tokens = tokenize(text).tokens
 
     # Get candidate session
-    candidate_id = req.candidate_id or "default"
-    if candidate_id not in session_state:
-        session_state[candidate_id] = {"keywords": default_keywords.copy(), "history": []}
-    state = session_state[candidate_id]
-
-    # Expand keywords based on new words in text
-    for sentiment_type, words in state["keywords"].items():
-        for word in text.split():
-            if word not in words and sentiment_type in text:
-                state["keywords"][sentiment_type].append(word)
-
-    # Score sentiment
+    candidate_id = candidate_id or "default"
+    state = await session_state.aget(candidate_id)
+
+    # Expand keywords based on new words in text (deduplicated, capped per label)
+    grow_keywords(state["keywords"], text, tokens, _settings.keyword_max_per_label)
+
+    # Score sentiment: one pass over the text for all keyword lists
+    matched = synced_matcher(matchers, candidate_id, state["keywords"]).labels_in(text)
     score = 0
-    for sentiment_type, words in state["keywords"].items():
-        if any(w in text for w in words):
+    for sentiment_type in state["keywords"]:
+        if sentiment_type in matched:
             score += 1 if sentiment_type == "positive" else -1
 
     sentiment = "Positive" if score > 0 else "Negative" if score < 0 else "Neutral"
@@ -56,15 +72,17 @@ async def sentiment_endpoint(req: SentimentRequest):
     state["history"].append({"text": text, "sentiment": sentiment})
 
     # --- ML model training/prediction ---
-    texts: List[str] = [h["text"] for h in state["history"]]
-    labels: List[str] = [h["sentiment"] for h in state["history"]]
-    # Use a very small threshold to avoid overfitting when too little data
-    if len(texts) > 2:
-        # Tokenize
-        tokenized = [t.split() for t in texts]
-        model = ml_models[candidate_id]
-        model.fit(tokenized, labels)
-        pred = model.predict([text.split()])[0]
-        sentiment = pred
-
-    return {"sentiment": sentiment, "history": state["history"]}
+    # Online update with this answer only, so per-request cost is independent of session length
+    adapter = CandidateAdapter.from_dict(state.get("model"), _settings.ml_adapter_max_tokens)
+    adapter.partial_fit(tokens, sentiment)
+    state["model"] = adapter.to_dict()
+    await session_state.asave(candidate_id, state)
+    # Without a base model, wait for a few answers to avoid overfitting on too little data
+    predicted = predict_blended(get_base_model("sentiment"), adapter, tokens, _settings.ml_adapter_strength)
+    if predicted:
+        sentiment = predicted
+
+    result = {"sentiment": sentiment, "history_seq": state["history"].seq}
+    if include_history:
+        result["history"] = state["history"].since(since)
+    return result
@@ -0,0 +1,419 @@
+"""
+session_store.py
+Bounded per-candidate session state shared by the text-analysis routers.
+
+Each router owns a store (one namespace). The in-memory SessionStore
+evicts least-recently-used entries when it exceeds its session count or
+byte budget and drops entries after an idle TTL. RedisSessionStore keeps
+the same interface but shares state across replicas. History fields are
+capped in both, so a single long interview cannot grow without limit.
+"""
+import asyncio
+import json
+import sys
+import time
+from collections import OrderedDict, deque
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from .config import get_settings
+from .logging_utils import log
+from .redis_utils import get_async_redis_client, get_redis_client
+
+_STORES: List["SessionStore"] = []
+
+
+def _approx_size(obj: Any, _seen: Optional[set] = None) -> int:
+    """Rough deep size in bytes (containers, plain objects); good enough for budgeting."""
+    if _seen is None:
+        _seen = set()
+    if id(obj) in _seen:
+        return 0
+    _seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(_approx_size(k, _seen) + _approx_size(v, _seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset, deque)):
+        size += sum(_approx_size(v, _seen) for v in obj)
+    else:
+        if hasattr(obj, "__dict__"):
+            size += _approx_size(vars(obj), _seen)
+        # Slotted objects (e.g. CandidateAdapter) keep their fields outside __dict__
+        for cls in type(obj).__mro__:
+            slots = cls.__dict__.get("__slots__", ())
+            for name in (slots,) if isinstance(slots, str) else slots:
+                if name not in ("__dict__", "__weakref__") and hasattr(obj, name):
+                    size += _approx_size(getattr(obj, name), _seen)
+    return size
+
+
+class History(deque):
+    """
+    Capped ring buffer of history entries with sequence numbers: `seq` is the
+    number of the newest entry (1-based, never reset when old entries fall off),
+    so clients can ask for just the entries after a cursor via `since`. Also
+    counts entries appended since it was loaded (for delta writes).
+    """
+
+    def __init__(self, iterable: Iterable = (), maxlen: Optional[int] = None, seq: Optional[int] = None):
+        super().__init__(iterable, maxlen)
+        self.appended = 0
+        self.seq = len(self) if seq is None else max(seq, len(self))
+
+    def append(self, item: Any):
+        super().append(item)
+        self.appended += 1
+        self.seq += 1
+
+    def extend(self, items: Iterable):
+        for item in items:
+            self.append(item)
+
+    def _tail(self, n: int) -> List[Any]:
+        n = max(0, min(n, len(self)))
+        return [self[i] for i in range(len(self) - n, len(self))]
+
+    def since(self, cursor: Optional[int] = None) -> List[Any]:
+        """Retained entries with sequence number > `cursor` (all of them when None).
+        A cursor past `seq` comes from a session that expired or was reset, so the
+        full history is returned; the client sees `history_seq` < its cursor."""
+        if cursor is None or cursor > self.seq:
+            return list(self)
+        return self._tail(self.seq - cursor)
+
+    def take_appended(self) -> List[Any]:
+        """Entries added since load (at most maxlen) and reset the counter."""
+        items = self._tail(self.appended)
+        self.appended = 0
+        return items
+
+
+class _Entry:
+    __slots__ = ("value", "size", "touched", "saves", "lens")
+
+    def __init__(self, value: Any, size: int, touched: float):
+        self.value = value
+        self.size = size
+        self.touched = touched
+        self.saves = 0  # saves since the last full measurement
+        self.lens: Optional[tuple] = None  # history lengths at the last save; None forces a full walk
+
+
+class SessionStore:
+    """
+    LRU + idle-TTL store keyed by candidate id.
+
+    `get` returns the live state (creating it from `factory`); callers mutate
+    it and call `save` so memory accounting and eviction see the new size.
+    A full deep size walk runs only every `measure_every` saves; in between,
+    a save adds the size of the history entries appended since the last one
+    (capped histories replace entries, so a full buffer is taken as unchanged).
+    """
+
+    def __init__(
+        self,
+        name: str,
+        factory: Callable[[], Any],
+        history_fields: Iterable[str] = (),
+        max_sessions: Optional[int] = None,
+        idle_ttl: Optional[float] = None,
+        max_bytes: Optional[int] = None,
+        history_cap: Optional[int] = None,
+        measure_every: Optional[int] = None,
+    ):
+        settings = get_settings()
+        self.name = name
+        self.factory = factory
+        self.history_fields = tuple(history_fields)
+        self.max_sessions = max_sessions if max_sessions is not None else settings.session_max_sessions
+        self.idle_ttl = idle_ttl if idle_ttl is not None else settings.session_idle_ttl_sec
+        self.max_bytes = max_bytes if max_bytes is not None else settings.session_max_bytes
+        self.history_cap = history_cap if history_cap is not None else settings.session_history_cap
+        self.measure_every = max(1, measure_every if measure_every is not None else settings.session_measure_every)
+        self._data: "OrderedDict[str, _Entry]" = OrderedDict()
+        self.bytes = 0
+        self.evictions = 0
+        self.expirations = 0
+        _STORES.append(self)
+
+    def new(self) -> Any:
+        """Fresh state with history fields converted to capped deques."""
+        state = self.factory()
+        if isinstance(state, dict):
+            for field in self.history_fields:
+                state[field] = History(state.get(field, ()), maxlen=self.history_cap)
+        return state
+
+    def get(self, key: str) -> Any:
+        now = time.monotonic()
+        self._expire(now)
+        entry = self._data.get(key)
+        if entry is None:
+            state = self.new()
+            entry = _Entry(state, _approx_size(state), now)
+            self._data[key] = entry
+            self.bytes += entry.size
+            self._evict()
+        else:
+            entry.touched = now
+            self._data.move_to_end(key)
+        return entry.value
+
+    def save(self, key: str, state: Any):
+        """Record `state` (usually the object returned by `get`) and re-account its size."""
+        now = time.monotonic()
+        entry = self._data.get(key)
+        if entry is None:
+            entry = _Entry(state, 0, now)
+            self._data[key] = entry
+        lens = self._history_lens(state)
+        if entry.value is state and entry.lens is not None and entry.saves + 1 < self.measure_every:
+            size = entry.size + self._appended_size(state, entry.lens, lens)
+            entry.saves += 1
+        else:
+            size = _approx_size(state)
+            entry.saves = 0
+        self.bytes += size - entry.size
+        entry.value, entry.size, entry.touched, entry.lens = state, size, now, lens
+        self._data.move_to_end(key)
+        self._evict()
+
+    def _history_lens(self, state: Any) -> tuple:
+        if not isinstance(state, dict):
+            return ()
+        return tuple(len(state.get(field) or ()) for field in self.history_fields)
+
+    def _appended_size(self, state: Any, before: tuple, after: tuple) -> int:
+        size = 0
+        for field, old, new in zip(self.history_fields, before, after):
+            if new > old:
+                hist = state[field]
+                size += sum(_approx_size(hist[i]) for i in range(old, new))
+        return size
+
+    # Same interface as RedisSessionStore for the routes; memory access never blocks
+    async def aget(self, key: str) -> Any:
+        return self.get(key)
+
+    async def asave(self, key: str, state: Any):
+        self.save(key, state)
+
+    # Mapping-style helpers (defaultdict-like indexing creates on miss)
+    __getitem__ = get
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._data
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def pop(self, key: str, default: Any = None) -> Any:
+        entry = self._data.pop(key, None)
+        if entry is None:
+            return default
+        self.bytes -= entry.size
+        return entry.value
+
+    def clear(self):
+        self._data.clear()
+        self.bytes = 0
+
+    def _expire(self, now: float):
+        # Entries are kept in access order, so expired ones are always at the front
+        cutoff = now - self.idle_ttl
+        while self._data:
+            key, entry = next(iter(self._data.items()))
+            if entry.touched >= cutoff:
+                break
+            self._data.popitem(last=False)
+            self.bytes -= entry.size
+            self.expirations += 1
+
+    def _evict(self):
+        while self._data and (len(self._data) > self.max_sessions or self.bytes > self.max_bytes):
+            if len(self._data) == 1:
+                break  # never evict the session being served
+            _, entry = self._data.popitem(last=False)
+            self.bytes -= entry.size
+            self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "sessions": len(self._data),
+            "bytes": self.bytes,
+            "max_sessions": self.max_sessions,
+            "max_bytes": self.max_bytes,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+class RedisSessionStore:
+    """
+    Redis-backed store with the SessionStore interface, for multi-replica deployments.
+
+    Layout per session (keys share a hash tag so they live on one cluster slot):
+      sess:{ns:id}:h        hash of JSON-encoded non-history fields (+ _seq:<field> history sequence numbers)
+      sess:{ns:id}:<field>  list of JSON entries per history field, LTRIM'd to the cap
+    A load is one pipelined round trip (HGETALL + LRANGEs); a save is one pipeline
+    that appends only new history entries. All keys expire after the idle TTL.
+    On Redis errors the call falls back to an in-memory SessionStore.
+
+    Routes use `aget`/`asave` on the asyncio client so Redis I/O never blocks the
+    event loop (with only a sync client they run in a worker thread). A request
+    costs two round trips, not one: what is written is computed in Python from
+    what was read, so the write cannot be queued in the read's pipeline without
+    moving the scoring into Lua or scoring stale, locally cached state.
+    """
+
+    def __init__(self, name: str, factory: Callable[[], Dict[str, Any]], history_fields: Iterable[str] = (),
+                 client: Any = None, idle_ttl: Optional[int] = None, history_cap: Optional[int] = None,
+                 async_client: Any = None):
+        settings = get_settings()
+        self.name = name
+        self.factory = factory
+        self.history_fields = tuple(history_fields)
+        self.client = client
+        self.async_client = async_client
+        self.idle_ttl = int(idle_ttl if idle_ttl is not None else settings.session_idle_ttl_sec)
+        self.history_cap = history_cap if history_cap is not None else settings.session_history_cap
+        self.fallback = SessionStore(name + ":fallback", factory, self.history_fields, history_cap=self.history_cap)
+        self.loads = 0
+        self.saves = 0
+        self.errors = 0
+        _STORES.append(self)
+
+    def _key(self, key: str, suffix: str) -> str:
+        return f"sess:{{{self.name}:{key}}}:{suffix}"
+
+    def new(self) -> Dict[str, Any]:
+        return self.fallback.new()
+
+    # Pipeline building is shared by the sync and asyncio clients (only execute() differs)
+    def _queue_load(self, p, key: str):
+        p.hgetall(self._key(key, "h"))
+        for field in self.history_fields:
+            p.lrange(self._key(key, field), -self.history_cap, -1)
+
+    def _parse_load(self, results: List[Any]) -> Dict[str, Any]:
+        fields, *lists = results
+        self.loads += 1
+        state = self.new()
+        seqs = {}
+        for raw_field, raw_value in fields.items():
+            field = raw_field.decode() if isinstance(raw_field, bytes) else raw_field
+            if field.startswith("_seq:"):
+                seqs[field[5:]] = int(raw_value)
+            elif not field.startswith("_"):
+                state[field] = json.loads(raw_value)
+        for field, items in zip(self.history_fields, lists):
+            state[field] = History((json.loads(v) for v in items), maxlen=self.history_cap, seq=seqs.get(field))
+        return state
+
+    def _queue_save(self, p, key: str, state: Dict[str, Any]):
+        hkey = self._key(key, "h")
+        mapping = {"_touched": int(time.time())}
+        for field, value in state.items():
+            if field not in self.history_fields:
+                mapping[field] = json.dumps(value)
+        p.hset(hkey, mapping=mapping)
+        p.expire(hkey, self.idle_ttl)
+        for field in self.history_fields:
+            hist = state.get(field)
+            new_items = hist.take_appended() if isinstance(hist, History) else list(hist or ())
+            lkey = self._key(key, field)
+            if new_items:
+                p.rpush(lkey, *(json.dumps(v) for v in new_items))
+                p.ltrim(lkey, -self.history_cap, -1)
+                # Counter rather than a SET, so concurrent replicas appending to one session stay consistent
+                p.hincrby(hkey, f"_seq:{field}", len(new_items))
+            p.expire(lkey, self.idle_ttl)
+
+    def get(self, key: str) -> Dict[str, Any]:
+        try:
+            p = self.client.pipeline(transaction=False)
+            self._queue_load(p, key)
+            results = p.execute()
+        except Exception as e:
+            return self._fallback_get(key, e)
+        return self._parse_load(results)
+
+    def save(self, key: str, state: Dict[str, Any]):
+        try:
+            p = self.client.pipeline(transaction=False)
+            self._queue_save(p, key, state)
+            p.execute()
+            self.saves += 1
+        except Exception as e:
+            self._fallback_save(key, state, e)
+
+    async def aget(self, key: str) -> Dict[str, Any]:
+        if self.async_client is None:
+            return await asyncio.to_thread(self.get, key)
+        try:
+            p = self.async_client.pipeline(transaction=False)
+            self._queue_load(p, key)
+            results = await p.execute()
+        except Exception as e:
+            return self._fallback_get(key, e)
+        return self._parse_load(results)
+
+    async def asave(self, key: str, state: Dict[str, Any]):
+        if self.async_client is None:
+            return await asyncio.to_thread(self.save, key, state)
+        try:
+            p = self.async_client.pipeline(transaction=False)
+            self._queue_save(p, key, state)
+            await p.execute()
+            self.saves += 1
+        except Exception as e:
+            self._fallback_save(key, state, e)
+
+    __getitem__ = get
+
+    def __contains__(self, key: str) -> bool:
+        try:
+            return bool(self.client.exists(self._key(key, "h")))
+        except Exception:
+            return key in self.fallback
+
+    def pop(self, key: str, default: Any = None) -> Any:
+        try:
+            self.client.delete(self._key(key, "h"), *(self._key(key, f) for f in self.history_fields))
+        except Exception:
+            pass
+        return self.fallback.pop(key, default)
+
+    def _fallback_get(self, key: str, exc: Exception) -> Dict[str, Any]:
+        self.errors += 1
+        log("WARN", "session_store redis load failed; using memory fallback", store=self.name, error=str(exc))
+        return self.fallback.get(key)
+
+    def _fallback_save(self, key: str, state: Dict[str, Any], exc: Exception):
+        self.errors += 1
+        log("WARN", "session_store redis save failed; using memory fallback", store=self.name, error=str(exc))
+        self.fallback.save(key, state)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": "redis",
+            "loads": self.loads,
+            "saves": self.saves,
+            "errors": self.errors,
+            "fallback_sessions": len(self.fallback),
+        }
+
+
+def make_session_store(name: str, factory: Callable[[], Dict[str, Any]], history_fields: Iterable[str] = ()):
+    """Build the configured store for a router's JSON-serializable session state."""
+    backend = get_settings().session_backend
+    if backend in ("auto", "redis"):
+        client = get_redis_client()
+        if client is not None:
+            return RedisSessionStore(name, factory, history_fields, client=client, async_client=get_async_redis_client())
+        if backend == "redis":
+            log("WARN", "session_store redis requested but unavailable; using memory", store=name)
+    return SessionStore(name, factory, history_fields)
+
+
+def session_stats() -> Dict[str, Dict[str, Any]]:
+    return {store.name: store.stats() for store in _STORES if not store.name.endswith(":fallback")}
@@ -0,0 +1,73 @@
+import pytest
+from fastapi.testclient import TestClient
+from backend.main import app
+
+client = TestClient(app)
+
+ANSWERS = [
+    "I feel happy and excited to lead the team",
+    "It was a difficult problem and I was worried",
+    "I feel proud of the success we had together, and I love mentoring others on the team every day",
+]
+
+def _individual(text, candidate_id, inflection):
+    eq = client.post("/score", json={"response": text, "inflection": inflection}).json()["eq_score"]
+    sentiment = client.post("/sentiment", json={"text": text, "candidate_id": candidate_id}).json()["sentiment"]
+    emotions = client.post("/emotion", json={"text": text, "candidate_id": candidate_id}).json()["emotion_scores"]
+    archetype = client.post("/archetype", json={"eq_score": eq, "candidate_id": candidate_id}).json()["archetype"]
+    feedback = client.post("/feedback", json={
+        "text": text, "sentiment": sentiment, "eq_score": eq, "emotion_scores": emotions, "candidate_id": candidate_id,
+    }).json()["feedback"]
+    question = client.post("/next_question", json={"sentiment": sentiment, "eq_score": eq, "emotion_scores": emotions}).json()["next_question"]
+    return {"eq_score": eq, "sentiment": sentiment, "emotion_scores": emotions, "archetype": archetype,
+            "feedback": feedback, "next_question": question}
+
+def test_analyze_matches_individual_endpoints():
+    inflection = {"pitch": 1.3}
+    expected = [_individual(t, "analyze-ref", inflection) for t in ANSWERS]
+    got = [client.post("/analyze", json={"text": t, "candidate_id": "analyze-one", "inflection": inflection}).json()
+           for t in ANSWERS]
+    assert got == expected
+
+def test_analyze_batch_in_order_with_history():
+    expected = [_individual(t, "batch-ref", {}) for t in ANSWERS]
+    r = client.post("/analyze", json={"answers": [
+        {"text": t, "candidate_id": "batch-1", "include_history": i == len(ANSWERS) - 1} for i, t in enumerate(ANSWERS)
+    ]})
+    assert r.status_code == 200
+    results = r.json()["results"]
+    assert [{k: v for k, v in res.items() if k not in ("history", "history_seq")} for res in results] == expected
+    assert "history" not in results[0]
+    assert len(results[-1]["history"]["archetype"]["archetypes"]) == len(ANSWERS)
+    assert results[-1]["history_seq"]["sentiment"] == len(ANSWERS)
+
+def test_analyze_per_router_cursors():
+    client.post("/sentiment", json={"text": "great start", "candidate_id": "cursor-map"})
+    first = client.post("/analyze", json={"text": ANSWERS[0], "candidate_id": "cursor-map", "include_history": True}).json()
+    cursors = first["history_seq"]
+    assert cursors["sentiment"] == 2 and cursors["archetype"] == 1
+    second = client.post("/analyze", json={
+        "text": ANSWERS[1], "candidate_id": "cursor-map", "include_history": True, "since": cursors,
+    }).json()
+    # Each router returns only its own new entry, whatever the other routers' counts are
+    assert len(second["history"]["sentiment"]) == 1
+    assert len(second["history"]["emotion"]) == 1
+    assert second["history"]["archetype"]["eq_scores"] == [second["eq_score"]]
+
+def test_analyze_rejects_empty_batch():
+    assert client.post("/analyze", json={"answers": []}).status_code == 422
+
+def test_analyze_batch_charges_one_token_per_answer(monkeypatch):
+    from backend.emotion import _limiter
+    monkeypatch.setattr(_limiter, "limit", 4)
+    monkeypatch.setattr(_limiter, "_script", None)
+    _limiter._buckets.clear()
+    batch = {"answers": [{"text": t, "candidate_id": "batch-cost"} for t in ANSWERS]}
+    assert client.post("/analyze", json=batch).status_code == 200
+    # Three of four units are spent: a second batch no longer fits, a single answer does
+    assert client.post("/analyze", json=batch).status_code == 429
+    assert client.post("/analyze", json={"text": ANSWERS[0]}).status_code == 200
+    _limiter._buckets.clear()
+
+if __name__ == "__main__":
+    pytest.main()
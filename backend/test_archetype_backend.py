@@ -25,5 +25,15 @@ def test_archetype_trend_learning():
     assert len(history["eq_scores"]) == len(scores)
     assert len(history["archetypes"]) == len(scores)
 
+def test_incremental_history_cursor():
+    first = client.post("/archetype", json={"eq_score": 10, "candidate_id": "cursor"}).json()
+    assert first["history_seq"] == 1 and first["history"]["eq_scores"] == [10]
+    cursor = first["history_seq"]
+    quiet = client.post("/archetype", json={"eq_score": 20, "candidate_id": "cursor", "include_history": False}).json()
+    assert "history" not in quiet and quiet["history_seq"] == 2
+    delta = client.post("/archetype", json={"eq_score": 35, "candidate_id": "cursor", "since": cursor}).json()
+    assert delta["history_seq"] == 3
+    assert delta["history"] == {"eq_scores": [20, 35], "archetypes": [quiet["archetype"], delta["archetype"]]}
+
 if __name__ == "__main__":
     pytest.main()
@@ -0,0 +1,84 @@
+import time
+
+import os
+
+from backend.byte_cache import ByteLRUCache, DiskBlobStore
+
+
+def _cache(**kw):
+    opts = dict(max_bytes=100, max_entries=10, ttl=60)
+    opts.update(kw)
+    return ByteLRUCache("test", **opts)
+
+
+def test_evicts_least_recently_used_by_bytes():
+    cache = _cache(max_bytes=100)
+    cache.set("a", b"x" * 40)
+    cache.set("b", b"x" * 40)
+    assert cache.get("a") is not None  # a is now most recent
+    cache.set("c", b"x" * 40)
+    assert "b" not in cache and "a" in cache and "c" in cache
+    assert cache.bytes_used == 80
+    assert cache.stats()["evictions"] == 1
+
+
+def test_tag_is_kept_with_entry():
+    cache = _cache()
+    cache.set("a", b"xyz", tag="d1")
+    cache.set("b", b"xyz")
+    assert cache.get_tagged("a") == (b"xyz", "d1") and cache.get_tagged("b") == (b"xyz", None)
+    assert cache.get("a") == b"xyz" and cache.get_tagged("missing") is None
+
+
+def test_entry_bound_and_replace_accounting():
+    cache = _cache(max_entries=2)
+    cache.set("a", b"1")
+    cache.set("a", b"123")
+    cache.set("b", b"1")
+    cache.set("c", b"1")
+    assert len(cache) == 2 and "a" not in cache
+    assert cache.bytes_used == 2
+
+
+def test_oversized_payload_is_not_cached():
+    cache = _cache(max_bytes=10)
+    cache.set("small", b"123")
+    assert cache.set("big", b"x" * 11) is False
+    assert "big" not in cache and "small" in cache
+
+
+def test_expiry_and_hit_ratio():
+    cache = _cache(ttl=60)
+    cache.set("old", b"abc", ttl=-1)
+    cache.set("new", b"abc")
+    assert cache.expire() == 1
+    assert cache.get("new") == b"abc"
+    assert cache.get("old") is None
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["hit_ratio"]) == (1, 1, 0.5)
+    assert stats["bytes"] == 3 and stats["expirations"] == 1
+
+
+def test_inline_expiry_without_background_task():
+    cache = _cache(expire_interval=0)
+    cache.set("gone", b"abc", ttl=-1)
+    time.sleep(0.001)
+    cache.get("other")
+    assert len(cache) == 0 and cache.bytes_used == 0
+
+
+def test_disk_store_dedupes_content_and_expires(tmp_path):
+    store = DiskBlobStore("disk", str(tmp_path), ttl=60)
+    path_a = store.set("a" * 64, b"same audio")
+    path_b = store.set("b" * 64, b"same audio")
+    assert path_a == path_b and store.get("b" * 64) == b"same audio"
+    # Age key "a" past the TTL, and the shared blob past the in-flight grace period
+    old = os.path.getmtime(path_a) - 120
+    os.utime(store._key_path("a" * 64), (old, old))
+    os.utime(path_a, (old, old))
+    assert store.get_path("a" * 64) is None
+    assert store.expire() == 1
+    assert os.path.exists(path_a)  # still referenced by "b"
+    os.utime(store._key_path("b" * 64), (old, old))
+    store.expire()
+    assert not os.path.exists(path_a)
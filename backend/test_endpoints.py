@@ -28,5 +28,13 @@ def test_score():
     assert r.status_code == 200
     assert "eq_score" in r.json()
 
+def test_metrics_label_route_templates():
+    pytest.importorskip("prometheus_client")
+    client.get("/no-such-page-8c1f")
+    client.post("/score", json={"response": "x", "inflection": {}})
+    body = client.get("/metrics").text
+    assert "no-such-page-8c1f" not in body
+    assert 'path="unmatched"' in body and 'path="/score"' in body
+
 if __name__ == "__main__":
     pytest.main()
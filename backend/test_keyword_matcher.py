@@ -0,0 +1,51 @@
+import random
+
+import pytest
+
+from backend.keyword_matcher import KeywordMatcher, grow_keywords
+
+
+def _reference(keywords, text):
+    return {label for label, words in keywords.items() if any(w and w in text for w in words)}
+
+
+def test_matches_substring_semantics_randomized():
+    rng = random.Random(7)
+    alphabet = "abcde "
+    for _ in range(200):
+        keywords = {
+            label: ["".join(rng.choice(alphabet[:-1]) for _ in range(rng.randint(1, 4))) for _ in range(rng.randint(1, 6))]
+            for label in ("pos", "neg", "joy")
+        }
+        text = "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 40)))
+        assert KeywordMatcher(keywords).labels_in(text) == _reference(keywords, text)
+
+
+def test_incremental_sync_and_rebuild():
+    keywords = {"joy": ["happy"], "fear": ["afraid"]}
+    matcher = KeywordMatcher(keywords)
+    assert matcher.labels_in("so happy") == {"joy"}
+    keywords["fear"].append("nerv")
+    matcher.sync(keywords)
+    assert matcher.labels_in("nervous and happy") == {"joy", "fear"}
+    # A replaced (e.g. expired and recreated) list triggers a rebuild
+    matcher.sync({"joy": ["glad"], "fear": ["afraid"]})
+    assert matcher.labels_in("happy") == set() and matcher.labels_in("glad") == {"joy"}
+
+
+def test_token_hits_counts_whole_token_keywords():
+    matcher = KeywordMatcher({"joy": ["happy", "love", "enjoy"]})
+    assert matcher.token_hits("joy", ["i", "love", "love", "enjoying"]) == 1
+
+
+def test_grow_keywords_dedupes_and_caps():
+    keywords = {"joy": ["happy"], "fear": ["afraid"]}
+    text = "joy joy is the best joy"
+    added = grow_keywords(keywords, text, text.split(), cap=4)
+    assert keywords["joy"] == ["happy", "joy", "is", "the"]
+    assert keywords["fear"] == ["afraid"] and added == 3
+    assert grow_keywords(keywords, text, text.split(), cap=4) == 0
+
+
+if __name__ == "__main__":
+    pytest.main()
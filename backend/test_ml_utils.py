@@ -0,0 +1,201 @@
+import math
+import random
+import pytest
+from backend import ml_utils
+from backend.ml_utils import SimpleMultinomialNB
+
+DOCS = [
+    ("i am happy and excited".split(), "pos"),
+    ("this is bad and tough".split(), "neg"),
+    ("great proud success".split(), "pos"),
+    ("sad stress problem".split(), "neg"),
+]
+
+def test_partial_fit_matches_fit():
+    batch = SimpleMultinomialNB().fit([d for d, _ in DOCS], [y for _, y in DOCS])
+    online = SimpleMultinomialNB()
+    for doc, label in DOCS:
+        online.partial_fit(doc, label)
+    probe = ["happy", "proud", "unknown"], ["tough", "sad"]
+    assert batch.predict(list(probe)) == online.predict(list(probe)) == ["pos", "neg"]
+    assert batch.class_log_priors == online.class_log_priors
+
+def test_refit_does_not_accumulate_counts():
+    model = SimpleMultinomialNB()
+    docs, labels = [d for d, _ in DOCS], [y for _, y in DOCS]
+    model.fit(docs, labels)
+    model.fit(docs, labels)
+    assert model.n_docs == len(DOCS)
+    assert model.token_counts["pos"]["happy"] == 1
+
+def test_predict_uses_laplace_smoothed_counts():
+    model = SimpleMultinomialNB()
+    for doc, label in DOCS:
+        model.partial_fit(doc, label)
+    V = len(model.vocab)
+    expected = {}
+    for cls in ("pos", "neg"):
+        denom = model.total_tokens_per_class[cls] + V
+        expected[cls] = math.log(0.5) + math.log((model.token_counts[cls].get("happy", 0) + 1) / denom)
+    assert model.predict([["happy"]])[0] == max(expected, key=expected.get)
+
+def _random_model(seed=3, vocab=200, classes=("a", "b", "c")):
+    rng = random.Random(seed)
+    words = [f"w{i}" for i in range(vocab)]
+    model = SimpleMultinomialNB()
+    for _ in range(300):
+        model.partial_fit(rng.choices(words, k=rng.randint(1, 12)), rng.choice(classes))
+    probes = [rng.choices(words + ["oov1", "oov2"], k=rng.randint(0, 15)) for _ in range(100)]
+    return model, probes
+
+@pytest.mark.parametrize("use_numpy", [True, False])
+def test_compiled_matches_predict(monkeypatch, use_numpy):
+    if use_numpy:
+        pytest.importorskip("numpy")
+    else:
+        monkeypatch.setattr(ml_utils, "_np", None)
+    model, probes = _random_model()
+    compiled = model.compile()
+    assert compiled.predict_batch(probes) == model.predict(probes)
+    log_proba = compiled.predict_log_proba(probes)
+    for row in log_proba:
+        assert math.isclose(sum(math.exp(v) for v in row), 1.0, rel_tol=1e-9)
+    # Normalized scores differ from the hand-computed joint likelihood only by a per-doc constant
+    doc = probes[0]
+    V = len(model.vocab)
+    manual = [
+        math.log(model.class_counts[c] / model.n_docs)
+        + sum(math.log((model.token_counts[c].get(t, 0) + 1) / (model.total_tokens_per_class[c] + V)) for t in doc)
+        for c in compiled.classes
+    ]
+    diffs = [m - l for m, l in zip(manual, log_proba[0])]
+    assert max(diffs) - min(diffs) < 1e-9
+
+def test_adapter_without_base_matches_full_model():
+    model, adapter = SimpleMultinomialNB(), ml_utils.CandidateAdapter(max_tokens=1000)
+    for doc, label in DOCS:
+        model.partial_fit(doc, label)
+        adapter.partial_fit(doc, label)
+    probes = [["happy", "proud", "unknown"], ["tough", "sad"], []]
+    assert [ml_utils.predict_blended(None, adapter, p) for p in probes] == model.predict(probes)
+    assert ml_utils.predict_blended(None, ml_utils.CandidateAdapter(), ["happy"]) is None
+
+def test_adapter_caps_distinct_tokens():
+    adapter = ml_utils.CandidateAdapter(max_tokens=5)
+    for i in range(50):
+        adapter.partial_fit([f"w{i}", f"v{i}", "common"], "pos")
+    assert adapter._entries <= 5
+    assert adapter.n_docs == 50
+    assert adapter.token_counts["pos"]["common"] == 50
+
+def test_adapter_dict_roundtrip_keeps_cap():
+    import json
+    adapter = ml_utils.CandidateAdapter(max_tokens=3)
+    adapter.partial_fit(["a", "b"], "pos").partial_fit(["c", "d"], "neg")
+    restored = ml_utils.CandidateAdapter.from_dict(json.loads(json.dumps(adapter.to_dict())), max_tokens=3)
+    assert restored.to_dict() == adapter.to_dict() and restored._entries == 3
+    restored.partial_fit(["e"], "neg")  # cap already reached: counted as unseen
+    assert restored.token_counts["neg"] == {"c": 1} and restored.total_tokens["neg"] == 3
+    assert ml_utils.CandidateAdapter.from_dict(None).n_docs == 0
+
+def test_blend_shifts_toward_adapter():
+    base = SimpleMultinomialNB()
+    for _ in range(20):
+        base.partial_fit(["meeting"], "neg")
+        base.partial_fit(["great"], "pos")
+    compiled = base.compile()
+    adapter = ml_utils.CandidateAdapter()
+    assert ml_utils.predict_blended(compiled, adapter, ["meeting"]) == "neg"
+    for _ in range(30):
+        adapter.partial_fit(["meeting"], "pos")
+    assert ml_utils.predict_blended(compiled, adapter, ["meeting"], strength=5.0) == "pos"
+    assert ml_utils.predict_blended(compiled, adapter, ["meeting"], strength=1e6) == "neg"
+
+def test_base_model_save_load_roundtrip(tmp_path, monkeypatch):
+    model, probes = _random_model(classes=("Positive", "Negative", "Neutral"))
+    path = tmp_path / "sentiment.json"
+    model.save(str(path))
+    loaded = SimpleMultinomialNB.load(str(path))
+    assert loaded.predict(probes) == model.predict(probes)
+
+    from backend import base_models
+    monkeypatch.setattr(base_models, "get_settings", lambda: type("S", (), {"sentiment_base_model": str(path), "emotion_base_model": str(tmp_path / "missing.json")})())
+    base_models.get_base_model.cache_clear()
+    try:
+        assert base_models.get_base_model("sentiment").predict_batch(probes) == model.predict(probes)
+        assert base_models.get_base_model("emotion") is None
+    finally:
+        base_models.get_base_model.cache_clear()
+
+def test_base_model_with_foreign_labels_is_disabled(tmp_path, monkeypatch):
+    model, _ = _random_model()  # classes a/b/c: neither sentiment nor emotion labels
+    path = tmp_path / "model.nbc"
+    model.compile().save(str(path))
+    from backend import base_models
+    monkeypatch.setattr(base_models, "get_settings", lambda: type("S", (), {"sentiment_base_model": str(path), "emotion_base_model": str(path)})())
+    base_models.get_base_model.cache_clear()
+    try:
+        assert base_models.get_base_model("sentiment") is None
+        assert base_models.get_base_model("emotion") is None
+    finally:
+        base_models.get_base_model.cache_clear()
+
+def test_adapter_size_counts_slots():
+    from backend.session_store import _approx_size
+    adapter = ml_utils.CandidateAdapter(max_tokens=64)
+    empty = _approx_size(adapter)
+    adapter.partial_fit([f"t{i}" for i in range(64)], "joy")
+    assert _approx_size(adapter) > empty + 64 * 50
+
+@pytest.mark.parametrize("use_numpy", [True, False])
+def test_binary_roundtrip_mmap(tmp_path, monkeypatch, use_numpy):
+    if use_numpy:
+        pytest.importorskip("numpy")
+    else:
+        monkeypatch.setattr(ml_utils, "_np", None)
+    model, probes = _random_model()
+    for doc, label in [(["café", "naïve", "日本"], "a"), (["ünïcode", "z"], "b")]:
+        model.partial_fit(doc, label)
+    probes += [["café", "日本", "missing"], ["ünïcode"]]
+    compiled = model.compile()
+    path = tmp_path / "model.nbc"
+    compiled.save(str(path))
+    loaded = ml_utils.CompiledNB.load(str(path))
+    assert loaded.classes == compiled.classes
+    assert len(loaded.vocab_index) == len(compiled.vocab_index)
+    assert all(loaded.vocab_index.get(t) is not None for t in ("café", "日本", "w0", "w199"))
+    assert loaded.vocab_index.get("missing") is None and "" not in loaded.vocab_index
+    assert loaded.predict_batch(probes) == compiled.predict_batch(probes)
+    for got, want in zip(loaded.predict_log_proba(probes), compiled.predict_log_proba(probes)):
+        assert all(abs(g - w) < 1e-4 for g, w in zip(got, want))
+    # Reading back a mapped model and saving it again is byte-identical
+    again = tmp_path / "again.nbc"
+    loaded.save(str(again))
+    assert again.read_bytes() == path.read_bytes()
+
+def test_load_model_detects_format(tmp_path):
+    model, probes = _random_model()
+    model.save(str(tmp_path / "counts.json"))
+    model.compile().save(str(tmp_path / "model.nbc"))
+    for name in ("counts.json", "model.nbc"):
+        assert ml_utils.load_model(str(tmp_path / name)).predict_batch(probes) == model.predict(probes)
+    (tmp_path / "bad.nbc").write_bytes(b"NBC0" + bytes(40))
+    with pytest.raises(ValueError):
+        ml_utils.CompiledNB.load(str(tmp_path / "bad.nbc"))
+
+def test_truncated_binary_model_raises_value_error(tmp_path):
+    model, _ = _random_model()
+    path = tmp_path / "model.nbc"
+    model.compile().save(str(path))
+    data = path.read_bytes()
+    cut = tmp_path / "cut.nbc"
+    # Every section boundary region: header, priors, class offsets/names, vocab offsets/blob, table
+    for n in sorted({1, 20, 30, 40, 60, 80, 100, 200, 1000, len(data) // 2, len(data) - 1}):
+        cut.write_bytes(data[:n])
+        with pytest.raises(ValueError):
+            ml_utils.CompiledNB.load(str(cut))
+    with pytest.raises(ValueError):
+        ml_utils.load_model(str(cut))
+
+if __name__ == "__main__":
+    pytest.main()
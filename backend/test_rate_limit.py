@@ -0,0 +1,72 @@
+import asyncio
+import pytest
+from fastapi import FastAPI, Depends
+from fastapi.testclient import TestClient
+from backend.rate_limit import RateLimiter
+
+def _run(limiter, key="ip"):
+    return asyncio.run(limiter.check(key))
+
+def test_sliding_window_counter_blocks_and_recovers(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr("backend.rate_limit.time.time", lambda: clock[0])
+    limiter = RateLimiter("t1", limit=4, window=10)
+    assert [_run(limiter)["allowed"] for _ in range(5)] == [True, True, True, True, False]
+    # Halfway through the next window half of the previous count still applies
+    clock[0] = 1015.0
+    assert [_run(limiter)["allowed"] for _ in range(3)] == [True, True, False]
+    clock[0] = 1030.0
+    assert _run(limiter)["allowed"]
+
+def test_reset_hint_and_remaining(monkeypatch):
+    monkeypatch.setattr("backend.rate_limit.time.time", lambda: 2000.0)
+    limiter = RateLimiter("t2", limit=2, window=60)
+    first = _run(limiter)
+    assert first["remaining"] == 1 and first["backend"] == "memory"
+    _run(limiter)
+    blocked = _run(limiter)
+    assert not blocked["allowed"] and 0 < blocked["reset"] <= 60
+
+def test_sweep_drops_idle_keys(monkeypatch):
+    clock = [3000.0]
+    monkeypatch.setattr("backend.rate_limit.time.time", lambda: clock[0])
+    limiter = RateLimiter("t3", limit=5, window=10)
+    for ip in ("a", "b", "c"):
+        _run(limiter, ip)
+    clock[0] += 15
+    _run(limiter, "c")
+    assert limiter.sweep() == 0  # previous window still counts
+    clock[0] += 10
+    _run(limiter, "c")
+    assert limiter.sweep() == 2
+    assert len(limiter) == 1
+
+def test_dependency_returns_429_with_retry_after():
+    limiter = RateLimiter("t4", limit=1, window=60)
+    app = FastAPI()
+
+    @app.get("/limited")
+    async def limited(_: bool = Depends(limiter.dependency("slow down"))):
+        return {"ok": True}
+
+    client = TestClient(app)
+    assert client.get("/limited").status_code == 200
+    resp = client.get("/limited")
+    assert resp.status_code == 429
+    assert int(resp.headers["Retry-After"]) > 0
+
+def test_cost_charges_multiple_units(monkeypatch):
+    monkeypatch.setattr("backend.rate_limit.time.time", lambda: 3000.0)
+    limiter = RateLimiter("t6", limit=5, window=60)
+    assert asyncio.run(limiter.check("a", cost=3))["remaining"] == 2
+    assert not asyncio.run(limiter.check("a", cost=3))["allowed"]  # rejected batches are not recorded
+    assert asyncio.run(limiter.check("a", cost=2))["allowed"]
+    assert not _run(limiter, "a")["allowed"]
+
+def test_disabled_limiter_always_allows():
+    limiter = RateLimiter("t5", limit=0, window=60)
+    assert all(_run(limiter)["allowed"] for _ in range(50))
+    assert len(limiter) == 0
+
+if __name__ == "__main__":
+    pytest.main()
@@ -0,0 +1,212 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from backend import archetype
+from backend.session_store import SessionStore, RedisSessionStore
+
+def _store(**kw):
+    params = dict(max_sessions=3, idle_ttl=3600, max_bytes=10**9, history_cap=4)
+    params.update(kw)
+    return SessionStore("test", lambda: {"history": [], "name": None}, history_fields=("history",), **params)
+
+def test_lru_evicts_least_recently_used():
+    store = _store()
+    for key in ("a", "b", "c"):
+        store.get(key)
+    store.get("a")  # refresh a
+    store.get("d")
+    assert "b" not in store
+    assert all(k in store for k in ("a", "c", "d"))
+    assert store.stats()["evictions"] == 1
+
+def test_history_is_capped():
+    store = _store()
+    state = store.get("a")
+    for i in range(10):
+        state["history"].append(i)
+    store.save("a", state)
+    assert list(store.get("a")["history"]) == [6, 7, 8, 9]
+
+def test_idle_sessions_expire(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr("backend.session_store.time.monotonic", lambda: clock[0])
+    store = _store(idle_ttl=60)
+    store.get("old")
+    clock[0] += 30
+    store.get("fresh")
+    clock[0] += 45
+    store.get("other")
+    assert "old" not in store and "fresh" in store
+    assert store.stats()["expirations"] == 1
+
+def test_byte_budget_accounting():
+    store = _store(max_sessions=100, max_bytes=8000, history_cap=1000)
+    for key in ("a", "b", "c"):
+        state = store.get(key)
+        state["history"].extend(f"{key}-answer-{i}" for i in range(40))
+        store.save(key, state)
+    stats = store.stats()
+    assert stats["bytes"] <= 8000
+    assert stats["evictions"] >= 1
+    assert "c" in store
+    store.pop("c")
+    assert store.stats()["bytes"] == sum(e.size for e in store._data.values())
+
+def test_save_measures_incrementally(monkeypatch):
+    from backend import session_store
+    store = _store(history_cap=1000, measure_every=8)
+    state = store.get("a")
+    walks = []
+    real = session_store._approx_size
+
+    def counting(obj, _seen=None):
+        if obj is state:
+            walks.append(obj)
+        return real(obj, _seen)
+    monkeypatch.setattr(session_store, "_approx_size", counting)
+    for i in range(32):
+        state["history"].append(f"answer-{i}")
+        store.save("a", state)
+    assert len(walks) == 4  # first save, then every 8th
+    estimate = store._data["a"].size
+    assert abs(estimate - real(state)) <= 0.1 * real(state)
+
+class _CountingRedis:
+    """Wraps a fakeredis client and counts pipeline round trips."""
+
+    def __init__(self, client):
+        self.client = client
+        self.round_trips = 0
+
+    def pipeline(self, *args, **kwargs):
+        pipe = self.client.pipeline(*args, **kwargs)
+        original = pipe.execute
+
+        def execute(*a, **kw):
+            self.round_trips += 1
+            return original(*a, **kw)
+
+        pipe.execute = execute
+        return pipe
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+def _redis_store(client, **kw):
+    return RedisSessionStore("test", lambda: {"history": [], "name": None}, history_fields=("history",),
+                             client=client, idle_ttl=60, history_cap=3, **kw)
+
+def test_redis_store_shares_state_between_replicas():
+    fakeredis = pytest.importorskip("fakeredis")
+    server = fakeredis.FakeServer()
+    pod_a = _redis_store(fakeredis.FakeRedis(server=server))
+    pod_b = _redis_store(fakeredis.FakeRedis(server=server))
+    state = pod_a.get("cand")
+    state["name"] = "Ada"
+    state["history"].extend([1, 2])
+    pod_a.save("cand", state)
+    state = pod_b.get("cand")
+    assert state["name"] == "Ada" and list(state["history"]) == [1, 2]
+    state["history"].extend([3, 4, {"k": None}])
+    pod_b.save("cand", state)
+    assert list(pod_a.get("cand")["history"]) == [3, 4, {"k": None}]
+    assert "cand" in pod_a and "nobody" not in pod_a
+    assert 0 < pod_a.client.ttl(pod_a._key("cand", "history")) <= 60
+
+def test_history_sequence_survives_cap_and_replicas():
+    fakeredis = pytest.importorskip("fakeredis")
+    server = fakeredis.FakeServer()
+    pod_a = _redis_store(fakeredis.FakeRedis(server=server))
+    pod_b = _redis_store(fakeredis.FakeRedis(server=server))
+    state = pod_a.get("cand")
+    state["history"].extend(["a", "b"])
+    pod_a.save("cand", state)
+    state = pod_b.get("cand")
+    assert state["history"].seq == 2 and state["history"].since(1) == ["b"]
+    state["history"].extend(["c", "d", "e"])
+    pod_b.save("cand", state)
+    hist = pod_a.get("cand")["history"]
+    # Capped at 3 entries, but numbering continues: entries are 3..5
+    assert (hist.seq, list(hist)) == (5, ["c", "d", "e"])
+    assert hist.since(4) == ["e"] and hist.since(5) == [] and hist.since(0) == ["c", "d", "e"]
+    assert hist.since(None) == ["c", "d", "e"]
+    # A cursor from before a session reset gets the full history back
+    assert hist.since(9) == ["c", "d", "e"]
+
+def test_redis_store_one_round_trip_per_load_and_save():
+    fakeredis = pytest.importorskip("fakeredis")
+    client = _CountingRedis(fakeredis.FakeRedis())
+    store = _redis_store(client)
+    state = store.get("cand")
+    state["history"].append("x")
+    store.save("cand", state)
+    assert client.round_trips == 2
+
+def test_redis_store_async_client_matches_sync():
+    fakeredis = pytest.importorskip("fakeredis")
+    import asyncio
+    from fakeredis import aioredis
+    server = fakeredis.FakeServer()
+    sync_pod = _redis_store(fakeredis.FakeRedis(server=server))
+    async_pod = _redis_store(None, async_client=aioredis.FakeRedis(server=server))
+
+    async def scenario():
+        state = await async_pod.aget("cand")
+        state["name"] = "Ada"
+        state["history"].extend([1, 2])
+        await async_pod.asave("cand", state)
+        synced = sync_pod.get("cand")
+        synced["history"].append(3)
+        sync_pod.save("cand", synced)
+        return await async_pod.aget("cand")
+
+    state = asyncio.run(scenario())
+    assert state["name"] == "Ada" and list(state["history"]) == [1, 2, 3] and state["history"].seq == 3
+    assert async_pod.stats()["errors"] == 0
+
+def test_redis_store_falls_back_to_memory_on_errors():
+    class Broken:
+        def pipeline(self, *a, **kw):
+            raise ConnectionError("redis down")
+
+    store = _redis_store(Broken())
+    state = store.get("cand")
+    state["history"].append("x")
+    store.save("cand", state)
+    assert list(store.get("cand")["history"]) == ["x"]
+    assert store.stats()["errors"] == 3
+
+def test_archetype_router_on_redis_store(monkeypatch):
+    fakeredis = pytest.importorskip("fakeredis")
+    store = RedisSessionStore("archetype", lambda: {"eq_scores": [], "archetypes": []},
+                              history_fields=("eq_scores", "archetypes"), client=fakeredis.FakeRedis())
+    monkeypatch.setattr(archetype, "session_state", store)
+    app = FastAPI()
+    app.include_router(archetype.router)
+    client = TestClient(app)
+    for score in (10, 20, 35):
+        data = client.post("/archetype", json={"eq_score": score, "candidate_id": "r1"}).json()
+    assert data["history"]["eq_scores"] == [10, 20, 35]
+    assert len(data["history"]["archetypes"]) == 3
+
+@pytest.mark.parametrize("router", ["sentiment", "emotion"])
+def test_candidate_adapter_shared_between_replicas(monkeypatch, router):
+    fakeredis = pytest.importorskip("fakeredis")
+    import asyncio
+    import importlib
+    module = importlib.import_module(f"backend.{router}")
+    analyze = module.analyze_sentiment if router == "sentiment" else module.analyze_emotion
+    server = fakeredis.FakeServer()
+    pods = [RedisSessionStore(router, module._new_session, history_fields=("history",),
+                              client=fakeredis.FakeRedis(server=server)) for _ in range(2)]
+    texts = ["I am happy and excited", "this was a sad problem", "I love to enjoy success"]
+    for i, text in enumerate(texts):
+        # Requests alternate between replicas; each must train the same adapter
+        monkeypatch.setattr(module, "session_state", pods[i % 2])
+        asyncio.run(analyze(text, "shared-adapter", text.lower().split()))
+    model = pods[0].get("shared-adapter")["model"]
+    assert model["n_docs"] == len(texts)
+    assert sum(model["class_counts"].values()) == len(texts)
+
+if __name__ == "__main__":
+    pytest.main()
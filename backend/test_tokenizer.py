@@ -0,0 +1,31 @@
+from fastapi.testclient import TestClient
+
+from backend.main import app
+from backend.tokenizer import tokenize
+
+client = TestClient(app)
+
+
+def test_punctuation_and_case():
+    doc = tokenize("Great! I LOVE it, don’t you? Well-known... (really)")
+    assert doc.text == "great! i love it, don't you? well-known... (really)"
+    assert doc.tokens == ("great", "i", "love", "it", "don't", "you", "well-known", "really")
+    assert tokenize("").tokens == ()
+
+
+def test_tokens_are_interned_and_memoized():
+    first = tokenize("Happy happy " + "x" * 40)
+    assert first.tokens[0] is first.tokens[1]
+    assert tokenize("Happy happy " + "x" * 40) is first
+    other = tokenize("so " + "x" * 40 + " happy")
+    assert other.tokens[-1] is first.tokens[0]
+
+
+def test_scorers_share_one_tokenization():
+    tokenize.cache_clear()
+    text = "I'm excited and proud of this!"
+    assert client.post("/sentiment", json={"text": text, "candidate_id": "tok-1"}).json()["sentiment"] == "Positive"
+    assert client.post("/emotion", json={"text": text, "candidate_id": "tok-1"}).status_code == 200
+    assert client.post("/analyze", json={"text": text, "candidate_id": "tok-2"}).status_code == 200
+    info = tokenize.cache_info()
+    assert (info.misses, info.hits) == (1, 2)
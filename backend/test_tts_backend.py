@@ -0,0 +1,348 @@
+import asyncio
+import hashlib
+import json
+import httpx
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from backend import tts_preamble
+from backend.byte_cache import DiskBlobStore
+from backend.http_client import get_http_client
+
+app = FastAPI()
+app.include_router(tts_preamble.router)
+client = TestClient(app)
+
+@pytest.fixture(autouse=True)
+def _reset_limiter(monkeypatch):
+    monkeypatch.delenv("ELEVENLABS_API_KEY", raising=False)
+    monkeypatch.setattr(tts_preamble._limiter, "limit", 3)
+    tts_preamble._limiter._buckets.clear()
+    yield
+    tts_preamble._limiter._buckets.clear()
+    tts_preamble._limiter.set_redis(None)
+
+def test_memory_rate_limit_blocks_after_max():
+    statuses = [client.get("/tts/preamble").status_code for _ in range(4)]
+    # TTS itself is disabled without an API key (503); the limiter runs first
+    assert statuses == [503, 503, 503, 429]
+
+def test_redis_rate_limit_single_script(monkeypatch):
+    fakeredis = pytest.importorskip("fakeredis")
+    pytest.importorskip("lupa")
+    server = fakeredis.FakeServer()
+    aredis = fakeredis.aioredis.FakeRedis(server=server)
+    tts_preamble._limiter.set_redis(aredis)
+    # One event loop for the whole session, as under uvicorn (the async pool is loop-bound)
+    with TestClient(app) as loop_client:
+        responses = [loop_client.get("/tts/preamble") for _ in range(4)]
+    assert [r.status_code for r in responses] == [503, 503, 503, 429]
+    assert len(tts_preamble._limiter) == 0  # never fell back to the memory limiter
+    # Rejected requests are not recorded in the window
+    assert fakeredis.FakeRedis(server=server).zcard("tts:rl:testclient") == 3
+
+def _mock_upstream(statuses):
+    """Shared client over a MockTransport replaying `statuses` (last one repeats)."""
+    calls = []
+    def handler(request):
+        calls.append(request)
+        status = statuses[min(len(calls), len(statuses)) - 1]
+        return httpx.Response(status, content=b"ID3mp3" if status == 200 else b"", headers={"Retry-After": "0"})
+    shared = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    app.dependency_overrides[get_http_client] = lambda: shared
+    return calls
+
+@pytest.fixture
+def upstream(monkeypatch):
+    monkeypatch.setenv("ELEVENLABS_API_KEY", "k")
+    monkeypatch.setattr(tts_preamble._limiter, "limit", 100)
+    monkeypatch.setattr(tts_preamble, "_AREDIS", None)
+    tts_preamble._CACHE.clear()
+    yield _mock_upstream
+    app.dependency_overrides.clear()
+    tts_preamble._CACHE.clear()
+
+def test_shared_client_miss_then_hit(upstream):
+    calls = upstream([200])
+    first = client.get("/tts/preamble", params={"name": "Ada"})
+    second = client.get("/tts/preamble", params={"name": "Ada"})
+    assert (first.headers["X-Cache"], second.headers["X-Cache"]) == ("MISS", "HIT")
+    assert second.content == b"ID3mp3"
+    assert len(calls) == 1
+
+def test_upstream_5xx_is_retried(upstream):
+    calls = upstream([503, 200])
+    r = client.get("/tts/preamble", params={"name": "Retry"})
+    assert r.status_code == 200
+    assert len(calls) == 2
+
+def test_upstream_error_after_retries_is_502(upstream, monkeypatch):
+    monkeypatch.setenv("UPSTREAM_RETRIES", "1")
+    calls = upstream([429])
+    r = client.get("/tts/preamble", params={"name": "Busy"})
+    assert r.status_code == 502
+    assert len(calls) == 2
+
+class _Chunks(httpx.AsyncByteStream):
+    def __init__(self, chunks, fail_after=None):
+        self.chunks, self.fail_after = chunks, fail_after
+    async def __aiter__(self):
+        for i, chunk in enumerate(self.chunks):
+            if i == self.fail_after:
+                raise httpx.ReadError("upstream dropped")
+            yield chunk
+
+def _streaming_upstream(fail_after=None):
+    paths = []
+    def handler(request):
+        paths.append(request.url.path)
+        return httpx.Response(200, stream=_Chunks([b"ID3", b"frame1", b"frame2"], fail_after))
+    shared = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    app.dependency_overrides[get_http_client] = lambda: shared
+    return paths
+
+def test_streaming_tees_into_cache(upstream):
+    paths = _streaming_upstream()
+    r = client.get("/tts/preamble", params={"name": "Streamy", "stream": "true"})
+    assert r.status_code == 200 and r.headers["X-Cache"] == "MISS"
+    assert r.content == b"ID3frame1frame2"
+    assert paths == ["/v1/text-to-speech/EXAMPLE_VOICE_ID/stream"]
+    hit = client.get("/tts/preamble", params={"name": "Streamy", "stream": "true"})
+    assert hit.headers["X-Cache"] == "HIT" and hit.content == r.content
+
+def test_partial_stream_is_not_cached(upstream):
+    _streaming_upstream(fail_after=2)
+    with pytest.raises(Exception):  # ReadError surfaces wrapped in an ExceptionGroup from the task group
+        client.get("/tts/preamble", params={"name": "Partial", "stream": "true"})
+    assert len(tts_preamble._CACHE) == 0
+
+def _slow_upstream(delay=0.05):
+    calls = []
+    async def handler(request):
+        calls.append(request)
+        await asyncio.sleep(delay)
+        return httpx.Response(200, content=b"ID3mp3")
+    shared = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    app.dependency_overrides[get_http_client] = lambda: shared
+    return calls
+
+async def _concurrent_gets(n, params):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as ac:
+        return await asyncio.gather(*(ac.get("/tts/preamble", params=params) for _ in range(n)))
+
+def test_concurrent_misses_single_flight(upstream):
+    calls = _slow_upstream()
+    responses = asyncio.run(_concurrent_gets(20, {"name": "Crowd"}))
+    assert len(calls) == 1
+    assert all(r.status_code == 200 and r.content == b"ID3mp3" for r in responses)
+    caches = sorted(r.headers["X-Cache"] for r in responses)
+    assert caches.count("MISS") == 1 and caches.count("COALESCED") == 19
+    assert tts_preamble._INFLIGHT == {}
+
+def test_failed_leader_releases_followers(upstream, monkeypatch):
+    monkeypatch.setenv("UPSTREAM_RETRIES", "0")
+    calls = upstream([500])
+    responses = asyncio.run(_concurrent_gets(3, {"name": "Fails"}))
+    assert [r.status_code for r in responses] == [502, 502, 502]
+    assert len(calls) == 3  # followers fall back to their own attempt
+    assert tts_preamble._INFLIGHT == {}
+
+def test_cross_replica_lock_waits_for_shared_cache(upstream, monkeypatch):
+    fakeredis = pytest.importorskip("fakeredis")
+    pytest.importorskip("lupa")
+    calls = _slow_upstream()
+    monkeypatch.setattr(tts_preamble, "_LOCK_POLL_SEC", 0.01)
+
+    async def scenario():
+        aredis = fakeredis.aioredis.FakeRedis()
+        monkeypatch.setattr(tts_preamble, "_AREDIS", aredis)
+        # Simulate another replica that holds the lock and publishes the audio shortly after
+        original_acquire = tts_preamble._acquire_synth_lock
+        async def other_replica(key):
+            await aredis.set(f"tts:lock:{key}", "other", px=5000)
+            async def publish():
+                await asyncio.sleep(0.05)
+                await aredis.hset(f"tts:audio:{key}", mapping={"audio": b"ID3remote", "sha256": "remote"})
+            asyncio.ensure_future(publish())
+            return await original_acquire(key)
+        monkeypatch.setattr(tts_preamble, "_acquire_synth_lock", other_replica)
+        return (await _concurrent_gets(1, {"name": "Replica"}))[0]
+
+    r = asyncio.run(scenario())
+    assert r.headers["X-Cache"] == "COALESCED" and r.content == b"ID3remote"
+    assert calls == []
+
+def test_followers_wait_past_lock_ttl_for_slow_leader(upstream, monkeypatch):
+    fakeredis = pytest.importorskip("fakeredis")
+    pytest.importorskip("lupa")
+    monkeypatch.setattr(tts_preamble, "_LOCK_MS", 100)
+    monkeypatch.setattr(tts_preamble, "_LOCK_POLL_SEC", 0.01)
+    calls = _slow_upstream(delay=0.5)  # synthesis outlasts the lock TTL five times over
+
+    async def scenario():
+        aredis = fakeredis.aioredis.FakeRedis()
+        monkeypatch.setattr(tts_preamble, "_AREDIS", aredis)
+        original_acquire = tts_preamble._acquire_synth_lock
+        other = []
+        async def leader_acquire(key):
+            token, data = await original_acquire(key)
+            # Another replica asks for the same audio while this one synthesizes
+            other.append(asyncio.ensure_future(original_acquire(key)))
+            return token, data
+        monkeypatch.setattr(tts_preamble, "_acquire_synth_lock", leader_acquire)
+        local = await _concurrent_gets(3, {"name": "Slow"})
+        return local, await other[0]
+
+    local, (token, data) = asyncio.run(scenario())
+    assert len(calls) == 1
+    assert sorted(r.headers["X-Cache"] for r in local) == ["COALESCED", "COALESCED", "MISS"]
+    # The lock was renewed, so the other replica got the leader's audio instead of the lock
+    assert token is None and data == b"ID3mp3"
+    assert tts_preamble._INFLIGHT == {}
+
+def test_disk_tier_serves_file_after_restart(upstream, monkeypatch, tmp_path):
+    monkeypatch.setattr(tts_preamble, "_DISK", DiskBlobStore("tts_disk_test", str(tmp_path), ttl=60))
+    calls = upstream([200])
+    assert client.get("/tts/preamble", params={"name": "Disk"}).headers["X-Cache"] == "MISS"
+    assert len(list((tmp_path / "blobs").iterdir())) == 1
+    tts_preamble._CACHE.clear()  # simulate a restart: memory tier is gone
+    r = client.get("/tts/preamble", params={"name": "Disk"})
+    assert (r.headers["X-Cache"], r.headers["X-Cache-Tier"]) == ("HIT", "disk")
+    assert r.content == b"ID3mp3" and len(calls) == 1
+
+def test_redis_hit_is_promoted_to_memory(upstream, monkeypatch):
+    fakeredis = pytest.importorskip("fakeredis")
+    upstream([200])
+
+    async def scenario():
+        monkeypatch.setattr(tts_preamble, "_AREDIS", fakeredis.aioredis.FakeRedis())
+        await tts_preamble._store_cache("k1", b"audio")
+        tts_preamble._CACHE.clear()
+        first = await tts_preamble._lookup("k1")
+        second = await tts_preamble._lookup("k1")
+        return first[0], second[0], first[3], second[3]
+
+    digest = hashlib.sha256(b"audio").hexdigest()
+    assert asyncio.run(scenario()) == ("redis", "memory", digest, digest)
+
+def _id3(payload):
+    # ID3v2.4 header with a 4-byte tag body, then the MPEG frames
+    return b"ID3\x04\x00\x00\x00\x00\x00\x04TAGS" + payload
+
+def test_segmented_synthesizes_static_sentences_once(upstream):
+    texts = []
+    def handler(request):
+        text = json.loads(request.content)["text"]
+        texts.append(text)
+        return httpx.Response(200, content=_id3(text.encode()))
+    shared = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    app.dependency_overrides[get_http_client] = lambda: shared
+    script = "Welcome{name_part} to {product}. Answer naturally. Take a breath... then begin."
+    params = {"script": script, "segmented": "true"}
+    first = client.get("/tts/preamble", params={**params, "name": "Ada"})
+    second = client.get("/tts/preamble", params={**params, "name": "Grace"})
+    assert first.headers["X-Cache-Segments"] == "MISS,MISS"
+    assert second.headers["X-Cache-Segments"] == "MISS,HIT"
+    assert len(texts) == 3  # the static run is synthesized once
+    product = tts_preamble._get_preamble_defaults()[2]
+    assert second.content == _id3(f"Welcome Grace, to {product}.".encode()) + b"Answer naturally. Take a breath... then begin."
+
+def test_strip_id3_v1_and_v2():
+    frames = b"\xff\xfb" + b"\x00" * 200
+    tagged = _id3(frames) + b"TAG" + b"\x00" * 125
+    assert tts_preamble._strip_id3(tagged) == frames
+    assert tts_preamble._strip_id3(tagged, keep_v2=True) == _id3(frames)
+    assert tts_preamble._segment_script("A {name}. B. C? D{name_part}! E") == ["A {name}.", "B. C?", "D{name_part}!", "E"]
+
+def test_warm_cache_renders_default_and_names(upstream):
+    calls = upstream([200])
+    shared = app.dependency_overrides[get_http_client]()
+    first = asyncio.run(tts_preamble.warm_cache(shared, ["Ada", "Ada", "Grace"], concurrency=2))
+    assert first == {"rendered": 3, "cached": 0, "failed": 0}
+    again = asyncio.run(tts_preamble.warm_cache(shared, ["Ada"]))
+    assert again == {"rendered": 0, "cached": 2, "failed": 0} and len(calls) == 3
+    assert client.get("/tts/preamble", params={"name": "Grace"}).headers["X-Cache"] == "HIT"
+
+def test_ready_is_503_while_warming(monkeypatch):
+    from backend import main
+    monkeypatch.setitem(tts_preamble._WARMUP, "state", "running")
+    r = TestClient(main.app).get("/ready")
+    assert r.status_code == 503 and r.json()["status"] == "warming"
+    monkeypatch.setitem(tts_preamble._WARMUP, "state", "done")
+    assert TestClient(main.app).get("/ready").status_code == 200
+
+def test_prerender_cli_requires_persistent_tier(upstream, monkeypatch, capsys):
+    monkeypatch.setattr(tts_preamble, "_DISK", None)
+    with pytest.raises(SystemExit):
+        tts_preamble.main(["prerender", "--names", "Ada"])
+    assert "TTS_CACHE_DIR" in capsys.readouterr().err
+
+def test_etag_304_and_cache_control(upstream):
+    calls = upstream([200])
+    first = client.get("/tts/preamble")
+    etag = first.headers["ETag"]
+    assert first.headers["Cache-Control"].startswith("public, max-age=")
+    assert first.headers["Accept-Ranges"] == "bytes"
+    revalidated = client.get("/tts/preamble", headers={"If-None-Match": f'W/"x", {etag}'})
+    assert revalidated.status_code == 304 and revalidated.content == b""
+    assert revalidated.headers["ETag"] == etag
+    named = client.get("/tts/preamble", params={"name": "Ada"})
+    assert named.headers["Cache-Control"].startswith("private")
+    assert len(calls) == 2
+
+def test_etag_tracks_content_and_revalidation_skips_limiter(upstream, monkeypatch):
+    upstream([200])
+    first = client.get("/tts/preamble")
+    etag = first.headers["ETag"]
+    assert etag == '"%s"' % hashlib.sha256(b"ID3mp3").hexdigest()
+    # Revalidations are answered from the cache without spending rate-limit tokens
+    monkeypatch.setattr(tts_preamble._limiter, "limit", 1)
+    tts_preamble._limiter._buckets.clear()
+    for _ in range(3):
+        assert client.get("/tts/preamble", headers={"If-None-Match": etag}).status_code == 304
+    monkeypatch.setattr(tts_preamble._limiter, "limit", 100)
+    # A forced re-synthesis returning different audio invalidates the old validator
+    shared = httpx.AsyncClient(transport=httpx.MockTransport(lambda request: httpx.Response(200, content=b"ID3new")))
+    app.dependency_overrides[get_http_client] = lambda: shared
+    fresh = client.get("/tts/preamble", params={"force": "true"})
+    assert fresh.headers["ETag"] != etag
+    assert client.get("/tts/preamble", headers={"If-None-Match": etag}).status_code == 200
+    stale = client.get("/tts/preamble", headers={"Range": "bytes=1-3", "If-Range": etag})
+    assert stale.status_code == 200 and stale.content == b"ID3new"
+
+@pytest.mark.parametrize("segmented", [False, True])
+def test_hits_and_revalidation_reuse_stored_digest(upstream, monkeypatch, segmented):
+    upstream([200])
+    params = {"script": "Hello{name_part}. Begin when ready.", "segmented": str(segmented).lower()}
+    etag = client.get("/tts/preamble", params=params).headers["ETag"]
+    hashed = []
+    real_digest = tts_preamble._digest
+    monkeypatch.setattr(tts_preamble, "_digest", lambda data: hashed.append(len(data)) or real_digest(data))
+    hit = client.get("/tts/preamble", params=params)
+    assert hit.headers["X-Cache"] == "HIT" and hit.headers["ETag"] == etag
+    assert client.get("/tts/preamble", params=params, headers={"If-None-Match": etag}).status_code == 304
+    # Only the joined segment digests (64 hex chars each) are ever hashed, never the audio
+    assert all(n % 64 == 0 for n in hashed)
+
+@pytest.mark.parametrize("use_disk", [False, True])
+def test_byte_ranges(upstream, monkeypatch, tmp_path, use_disk):
+    if use_disk:
+        monkeypatch.setattr(tts_preamble, "_DISK", DiskBlobStore("tts_disk_range", str(tmp_path), ttl=60))
+    upstream([200])
+    client.get("/tts/preamble", params={"name": "Range"})
+    if use_disk:
+        tts_preamble._CACHE.clear()
+    params = {"name": "Range"}
+    part = client.get("/tts/preamble", params=params, headers={"Range": "bytes=1-3"})
+    assert part.status_code == 206 and part.content == b"D3m"
+    assert part.headers["Content-Range"] == "bytes 1-3/6"
+    suffix = client.get("/tts/preamble", params=params, headers={"Range": "bytes=-2"})
+    assert suffix.content == b"p3"
+    bad = client.get("/tts/preamble", params=params, headers={"Range": "bytes=10-"})
+    assert bad.status_code == 416 and bad.headers["Content-Range"] == "bytes */6"
+    stale = client.get("/tts/preamble", params=params, headers={"Range": "bytes=1-3", "If-Range": '"other"'})
+    assert stale.status_code == 200 and stale.content == b"ID3mp3"
+
+if __name__ == "__main__":
+    pytest.main()
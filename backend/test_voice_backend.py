@@ -0,0 +1,271 @@
+import io
+import math
+import wave
+import struct
+import asyncio
+import pytest
+from fastapi.testclient import TestClient
+from fastapi import FastAPI
+from backend import voice
+from backend.voice import router as voice_router
+from backend.analysis_pool import AnalysisPool, PoolSaturated
+
+app = FastAPI()
+app.include_router(voice_router)
+client = TestClient(app)
+
+def _tone(sr, seconds, f0, amp=0.5):
+    return [amp * math.sin(2 * math.pi * f0 * i / sr) + 0.2 * amp * math.sin(4 * math.pi * f0 * i / sr)
+            for i in range(int(sr * seconds))]
+
+def _wav_bytes(samples, sr, nch=1):
+    bio = io.BytesIO()
+    with wave.open(bio, 'wb') as w:
+        w.setnchannels(nch)
+        w.setsampwidth(2)
+        w.setframerate(sr)
+        frames = []
+        for s in samples:
+            frames.extend([int(s * 32767)] * nch)
+        w.writeframes(struct.pack('<' + 'h' * len(frames), *frames))
+    return bio.getvalue()
+
+def _raw_wav(samples, sr, sw, tag=1, nch=2, extensible=False):
+    # Hand-built RIFF so 24-bit, float and WAVE_FORMAT_EXTENSIBLE can be covered; channel 1 is a constant
+    frames = bytearray()
+    for s in samples:
+        for val in (s, -0.9)[:nch]:
+            if tag == 3:
+                frames += struct.pack('<f' if sw == 4 else '<d', val)
+            elif sw == 1:
+                frames += bytes([int(val * 127) + 128])
+            elif sw == 3:
+                frames += int(val * 8388607).to_bytes(3, 'little', signed=True)
+            else:
+                frames += struct.pack({2: '<h', 4: '<i'}[sw], int(val * (2 ** (8 * sw - 1) - 1)))
+    block = nch * sw
+    fmt = struct.pack('<HHIIHH', 0xFFFE if extensible else tag, nch, sr, sr * block, block, 8 * sw)
+    if extensible:
+        fmt += struct.pack('<HHI', 22, 8 * sw, 3) + struct.pack('<H', tag) + bytes(14)
+    body = b'WAVE' + b'fmt ' + struct.pack('<I', len(fmt)) + fmt + b'LIST' + struct.pack('<I', 3) + b'abc\x00'
+    body += b'data' + struct.pack('<I', len(frames)) + bytes(frames)
+    return b'RIFF' + struct.pack('<I', len(body)) + body
+
+@pytest.mark.parametrize("sw,tag,extensible", [(1, 1, False), (2, 1, False), (3, 1, False), (4, 1, False),
+                                               (4, 3, False), (8, 3, False), (3, 1, True), (4, 3, True)])
+def test_read_wav_formats_first_channel(sw, tag, extensible):
+    sr = 8000
+    samples = _tone(sr, 0.5, 200.0)
+    rate, mono = voice._read_wav_mono(_raw_wav(samples, sr, sw, tag, extensible=extensible))
+    assert rate == sr
+    assert len(mono) == len(samples)
+    assert max(abs(a - b) for a, b in zip(mono, samples)) < 0.01
+
+def test_read_wav_rejects_garbage():
+    with pytest.raises(Exception) as exc:
+        voice._read_wav_mono(b'RIFF\x00\x00\x00\x00WAVEfmt ')
+    assert getattr(exc.value, "status_code", None) == 415
+
+@pytest.mark.parametrize("f0", [95.0, 180.0, 260.0])
+def test_fft_pitch_matches_direct_pure_python(monkeypatch, f0):
+    monkeypatch.setattr(voice, "_np", None)
+    sr = 16000
+    samples = _tone(sr, 1.0, f0)
+    direct = voice._estimate_pitch_autocorr_direct(samples, sr)
+    fast = voice._estimate_pitch_autocorr(samples, sr)
+    assert direct is not None and fast is not None
+    assert abs(fast - direct) / direct < 0.02
+
+def test_fft_pitch_matches_direct_numpy():
+    pytest.importorskip("numpy")
+    sr = 16000
+    samples = _tone(sr, 1.0, 140.0)
+    assert voice._estimate_pitch_autocorr(samples, sr) == pytest.approx(voice._estimate_pitch_autocorr_direct(samples, sr), rel=0.02)
+
+def test_pitch_none_for_silence_and_short_input():
+    assert voice._estimate_pitch_autocorr([0.0] * 16000, 16000) is None
+    assert voice._estimate_pitch_autocorr([0.1] * 100, 16000) is None
+
+def test_analyze_voice_wav_upload():
+    sr = 16000
+    audio = _wav_bytes(_tone(sr, 1.0, 200.0), sr)
+    resp = client.post(
+        "/voice/analyze_voice",
+        files={"audio": ("tone.wav", io.BytesIO(audio), "audio/wav")},
+        data={"prompt_index": 1, "responses": "[]"},
+    )
+    assert resp.status_code == 200
+    feats = resp.json()["features"]
+    assert feats["pitch"] == pytest.approx(200.0, rel=0.02)
+    assert feats["tonality"] in ("Calm", "Neutral", "Energetic")
+
+def test_analysis_pool_runs_and_rejects_when_full():
+    pool = AnalysisPool(kind="thread", max_workers=1, max_pending=1, retry_after=3)
+
+    async def scenario():
+        first = asyncio.ensure_future(pool.run(sum, [1, 2, 3]))
+        await asyncio.sleep(0)
+        with pytest.raises(PoolSaturated) as exc:
+            await pool.run(sum, [4])
+        assert exc.value.retry_after == 3
+        return await first
+
+    assert asyncio.run(scenario()) == 6
+    stats = pool.stats()
+    assert stats["pending"] == 0 and stats["rejected"] == 1
+    assert stats["completed"] == 1 and stats["failed"] == 0
+    with pytest.raises(ZeroDivisionError):
+        asyncio.run(pool.run(divmod, 1, 0))
+    assert pool.stats()["completed"] == 1 and pool.stats()["failed"] == 1
+    pool.shutdown()
+
+def test_analyze_voice_returns_503_when_pool_saturated(monkeypatch):
+    busy = AnalysisPool(kind="thread", max_pending=1, retry_after=7)
+    busy._pending = 1
+    monkeypatch.setattr(voice, "get_analysis_pool", lambda: busy)
+    resp = client.post(
+        "/voice/analyze_voice",
+        files={"audio": ("tone.wav", io.BytesIO(_wav_bytes(_tone(8000, 0.5, 200.0), 8000)), "audio/wav")},
+        data={"prompt_index": 0, "responses": "[]"},
+    )
+    assert resp.status_code == 503
+    assert resp.headers["Retry-After"] == "7"
+
+def _post(audio, **extra):
+    data = {"prompt_index": 0, "responses": "[]"}
+    data.update(extra)
+    return client.post("/voice/analyze_voice", files={"audio": ("a.wav", io.BytesIO(audio), "audio/wav")}, data=data)
+
+@pytest.mark.parametrize("seconds", [0.5, 3.0])
+def test_streaming_mode_matches_buffered(seconds):
+    sr = 8000
+    audio = _raw_wav(_tone(sr, seconds, 150.0, amp=0.3), sr, 2, nch=2)
+    buffered = _post(audio, streaming="false").json()["features"]
+    streamed = _post(audio, streaming="true").json()["features"]
+    assert streamed == buffered
+
+def test_streaming_mode_open_ended_wav():
+    sr = 8000
+    audio = bytearray(_raw_wav(_tone(sr, 2.0, 220.0), sr, 2, nch=1))
+    # Writers that stream WAV leave the data size unset
+    data_pos = audio.index(b'data')
+    audio[data_pos + 4:data_pos + 8] = b'\xff\xff\xff\xff'
+    feats = _post(bytes(audio), streaming="true").json()["features"]
+    assert feats["pitch"] == pytest.approx(220.0, rel=0.02)
+
+def test_streaming_mode_truncated_upload_still_has_pitch():
+    sr = 8000
+    audio = _raw_wav(_tone(sr, 2.0, 150.0, amp=0.3), sr, 2, nch=2)
+    # Header declares 2 s, but the body stops after 0.625 s: too little of the centered window arrives
+    body_start = audio.index(b'data') + 8
+    cut = audio[:body_start + 20000]
+    buffered = _post(cut, streaming="false").json()["features"]
+    streamed = _post(cut, streaming="true").json()["features"]
+    assert buffered["pitch"] == pytest.approx(150.0, rel=0.02)
+    assert streamed["pitch"] == pytest.approx(buffered["pitch"], rel=0.02)
+    assert streamed["energy"] == pytest.approx(buffered["energy"], rel=1e-6)
+
+def test_stream_analyzer_keeps_bounded_window():
+    sr = 8000
+    fmt = voice._WavFormat(1, 1, sr, 2, 2, 44, None)
+    analyzer = voice._StreamAnalyzer(fmt)
+    for _ in range(20):
+        lo, hi = analyzer.keep_range(4000)
+        analyzer.update(1.0, 4000, voice.array("f", [0.0] * (hi - lo)))
+    assert len(analyzer.window) == sr
+    assert analyzer.frames == 80000
+
+def test_rejects_audio_over_duration_limit(monkeypatch):
+    settings = voice.get_settings().model_copy(update={"voice_max_duration_sec": 1})
+    monkeypatch.setattr(voice, "get_settings", lambda: settings)
+    audio = _raw_wav(_tone(8000, 2.0, 200.0), 8000, 2, nch=1)
+    assert _post(audio, streaming="true").status_code == 413
+    assert _post(audio, streaming="false").status_code == 413
+
+def test_upload_limit_rejects_before_parsing(monkeypatch):
+    settings = voice.get_settings().model_copy(update={"voice_max_upload_bytes": 1000})
+    monkeypatch.setattr(voice, "get_settings", lambda: settings)
+
+    async def never_called(*a, **kw):
+        raise AssertionError("body reached the handler")
+    monkeypatch.setattr(voice, "_read_wav_header", never_called)
+    limited = FastAPI()
+    limited.include_router(voice_router)
+    limited.add_middleware(voice.UploadLimitMiddleware)
+    limited_client = TestClient(limited)
+    big = bytes(200 * 1024)
+    # Declared Content-Length
+    resp = limited_client.post("/voice/analyze_voice", files={"audio": ("a.wav", io.BytesIO(big), "audio/wav")},
+                               data={"prompt_index": 0, "responses": "[]"})
+    assert resp.status_code == 413
+    # Chunked body: counted as it arrives
+    resp = limited_client.post("/voice/analyze_voice", content=iter([big[:40000]] * 5),
+                               headers={"content-type": "multipart/form-data; boundary=x"})
+    assert resp.status_code == 413
+
+def test_streaming_batches_chunks_per_pool_call(monkeypatch):
+    pool = AnalysisPool(kind="thread")
+    calls = []
+    real_run = pool.run
+
+    async def counting_run(fn, *args):
+        calls.append(fn.__name__)
+        return await real_run(fn, *args)
+    pool.run = counting_run
+    monkeypatch.setattr(voice, "get_analysis_pool", lambda: pool)
+    settings = voice.get_settings().model_copy(update={"voice_stream_chunk_bytes": 1024, "voice_stream_batch_chunks": 4})
+    monkeypatch.setattr(voice, "get_settings", lambda: settings)
+    sr = 8000
+    audio = _raw_wav(_tone(sr, 1.0, 150.0, amp=0.3), sr, 2, nch=1)  # 16000 bytes of PCM = 16 chunks
+    streamed = _post(audio, streaming="true").json()["features"]
+    assert calls.count("_batch_features") == 4 and calls.count("_estimate_pitch_autocorr") == 1
+    assert streamed == _post(audio, streaming="false").json()["features"]
+    pool.shutdown()
+
+def test_voice_stream_websocket_features_and_summary():
+    sr = 8000
+    samples = _tone(sr, 1.0, 200.0, amp=0.4)
+    pcm = struct.pack('<' + 'h' * len(samples), *[int(x * 32767) for x in samples])
+    updates = []
+    with client.websocket_connect(f"/voice/stream?sample_rate={sr}&encoding=s16le") as ws:
+        for i in range(0, len(pcm), 1600):  # 100 ms frames
+            ws.send_bytes(pcm[i:i + 1600])
+            updates.append(ws.receive_json())
+        ws.send_text('{"type": "end"}')
+        summary = ws.receive_json()
+    assert [u["seq"] for u in updates] == list(range(1, 11))
+    assert all(u["type"] == "features" for u in updates)
+    assert updates[0]["pitch"] is None and not updates[0]["throttled"]  # window shorter than 200 ms
+    assert any(u["pitch"] == pytest.approx(200.0, rel=0.02) for u in updates if u["pitch"])
+    assert summary["type"] == "summary" and summary["duration"] == 1.0
+
+def test_voice_stream_rejects_unknown_encoding():
+    from starlette.websockets import WebSocketDisconnect
+    with pytest.raises(WebSocketDisconnect) as exc:
+        with client.websocket_connect("/voice/stream?encoding=mp3") as ws:
+            ws.receive_json()
+    assert exc.value.code == 1003
+
+def test_voice_stream_summary_pitch_covers_whole_stream(monkeypatch):
+    settings = voice.get_settings().model_copy(update={"voice_ws_cpu_share": 100.0})
+    monkeypatch.setattr(voice, "get_settings", lambda: settings)
+    sr = 8000
+    samples = _tone(sr, 1.0, 150.0, amp=0.4) + _tone(sr, 1.0, 250.0, amp=0.4)
+    pcm = struct.pack('<' + 'h' * len(samples), *[int(x * 32767) for x in samples])
+    with client.websocket_connect(f"/voice/stream?sample_rate={sr}&encoding=s16le") as ws:
+        for i in range(0, len(pcm), 1600):
+            ws.send_bytes(pcm[i:i + 1600])
+            last = ws.receive_json()
+        ws.send_text('{"type": "end"}')
+        summary = ws.receive_json()
+    assert not last["throttled"] and last["pitch"] == pytest.approx(250.0, rel=0.02)
+    assert 160.0 < summary["pitch"] < 240.0
+
+def test_cpu_budget_throttles():
+    budget = voice._CpuBudget(share=0.0, burst=0.01)
+    assert budget.available()
+    budget.charge(0.02)
+    assert not budget.available()
+
+if __name__ == "__main__":
+    pytest.main()
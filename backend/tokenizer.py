@@ -0,0 +1,38 @@
+"""
+tokenizer.py
+Text normalization shared by the text scorers.
+
+`tokenize(text)` lower-cases the answer once and splits it into word tokens:
+punctuation is dropped ("great!" -> "great"), while in-word apostrophes and
+hyphens are kept ("don't", "well-known"). Tokens are interned, so the same
+word from many answers, keyword lists and model vocabularies is one string
+object. Results are memoized per process in an LRU keyed by the text (by
+content), so /sentiment, /emotion and /analyze for the same answer tokenize it
+once.
+"""
+import re
+import sys
+from functools import lru_cache
+from typing import NamedTuple, Tuple
+
+from .config import get_settings
+
+_TOKEN = re.compile(r"\w+(?:['-]\w+)*")
+# Typographic apostrophes (phone keyboards) normalize to ASCII so "don’t" == "don't"
+_APOSTROPHES = str.maketrans({"’": "'", "‘": "'"})
+
+
+class Tokenized(NamedTuple):
+    text: str  # lower-cased, normalized text (what keyword matching runs on)
+    tokens: Tuple[str, ...]
+
+
+def normalize(text: str) -> str:
+    return text.lower().translate(_APOSTROPHES)
+
+
+@lru_cache(maxsize=get_settings().tokenizer_cache_size)
+def tokenize(text: str) -> Tokenized:
+    """Normalized text and its interned tokens; cached, so treat the result as read-only."""
+    norm = normalize(text)
+    return Tokenized(norm, tuple(sys.intern(tok) for tok in _TOKEN.findall(norm)))
@@ -1,7 +1,12 @@
 import os
 import time
+import uuid
+import asyncio
+import re
 import hashlib
+from typing import AsyncIterator, Awaitable, Callable, NamedTuple
 from fastapi import APIRouter, Response, HTTPException, Depends, Request, Query
+from fastapi.responses import FileResponse, StreamingResponse
 import httpx
 from .logging_utils import log, log_exception
 try:
@@ -11,8 +16,12 @@ except ImportError:  # pragma: no cover
 
 _CACHE_HITS = PCounter('tts_cache_hits_total', 'Total TTS preamble cache hits') if PCounter else None
 _CACHE_MISSES = PCounter('tts_cache_misses_total', 'Total TTS preamble cache misses') if PCounter else None
+_COALESCED = PCounter('tts_coalesced_total', 'TTS cache misses served by another in-flight synthesis', ['scope']) if PCounter else None
 _RATE_LIMIT_BLOCKS = PCounter('tts_rate_limit_blocks_total', 'Total TTS preamble rate limit rejections') if PCounter else None
-from .redis_utils import get_redis_client
+from .redis_utils import get_redis_client, get_async_redis_client
+from .rate_limit import RateLimiter
+from .byte_cache import ByteLRUCache, DiskBlobStore
+from .http_client import get_http_client, send_with_retry
 
 router = APIRouter(prefix="/tts", tags=["tts"])
 
@@ -35,6 +44,10 @@ def _get_eleven_config() -> tuple[str | None, str, str]:
     model_id = os.getenv("ELEVENLABS_MODEL_ID", "eleven_monolingual_v1")
     return api_key, voice_id, model_id
 
+def _get_eleven_base_url() -> str:
+    # Overridable so benchmarks/staging can point at a mock upstream
+    return os.getenv("ELEVENLABS_BASE_URL", "https://api.elevenlabs.io").rstrip("/")
+
 def _get_preamble_defaults() -> tuple[str, str, str]:
     script = os.getenv(
         "PREAMBLE_SCRIPT",
@@ -57,54 +70,175 @@ def _get_voice_defaults() -> dict:
         "use_speaker_boost": _env_bool("PREAMBLE_SPEAKER_BOOST", True),
     }
 
-# Simple in-memory cache {key: (expires_at, bytes)}
-_CACHE: dict[str, tuple[float, bytes]] = {}
 _TTL_SECONDS = int(os.getenv("TTS_PREAMBLE_TTL", "21600"))  # default 6h
 _REDIS = get_redis_client()
+# Async client (shared connection pool) used from request handlers so Redis I/O never blocks the loop
+_AREDIS = get_async_redis_client()
+
+# --- Tiered audio cache: L1 memory -> L2 Redis -> L3 disk ---
+# L1: in-memory LRU bounded by bytes and entries (one entry per personalized name adds up).
+# With Redis as the shared tier, L1 keeps a short TTL so force-refreshes on other replicas propagate.
+_CACHE = ByteLRUCache(
+    "tts",
+    max_bytes=int(os.getenv("TTS_CACHE_MAX_BYTES", str(64 * 1024 * 1024))),
+    max_entries=int(os.getenv("TTS_CACHE_MAX_ENTRIES", "512")),
+    ttl=_TTL_SECONDS,
+)
+_L1_TTL = min(_TTL_SECONDS, int(os.getenv("TTS_CACHE_L1_TTL", "300"))) if _AREDIS else _TTL_SECONDS
+# L3: optional content-addressed files; hits are served with FileResponse (sendfile) and survive restarts
+_DISK: DiskBlobStore | None = None
+if os.getenv("TTS_CACHE_DIR"):
+    try:
+        _DISK = DiskBlobStore("tts_disk", os.environ["TTS_CACHE_DIR"], _TTL_SECONDS)
+    except OSError as e:
+        log("WARN", "TTS disk cache disabled", path=os.environ["TTS_CACHE_DIR"], error=str(e))
+
+# --- Single-flight: one upstream synthesis per cache key ---
+# In-process followers await the leader's future; across replicas a Redis lock
+# (SET NX PX) elects one synthesizer and the others poll the shared cache. The
+# leader renews its lock while it makes progress, so followers wait for its
+# result however long synthesis takes; `_LOCK_MS` only bounds how long a dead
+# or stalled leader can hold the key.
+_INFLIGHT: dict[str, "_Flight"] = {}
+_LOCK_MS = int(os.getenv("TTS_SINGLEFLIGHT_LOCK_MS", "15000"))
+_LOCK_POLL_SEC = 0.1
+# Only the holder may release or renew (a stalled holder's lock may have expired and been re-acquired)
+_RELEASE_LUA = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+  return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+_RENEW_LUA = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+  return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+def _count_coalesced(scope: str):
+    if _COALESCED:
+        try: _COALESCED.labels(scope=scope).inc()
+        except Exception: pass
+
+async def _await_inflight(key: str) -> bytes | None:
+    """Wait for a local leader synthesizing `key`; None if there is none, it failed,
+    or it stalled."""
+    flight = _INFLIGHT.get(key)
+    if flight is None:
+        return None
+    while True:
+        try:
+            return await asyncio.wait_for(asyncio.shield(flight.done), _LOCK_MS / 1000.0)
+        except asyncio.TimeoutError:
+            if flight.stalled:
+                # Leader stopped making progress (e.g. its stream was never consumed); let this request take over
+                if _INFLIGHT.get(key) is flight:
+                    _INFLIGHT.pop(key, None)
+                return None
+        except Exception:
+            return None
+
+async def _acquire_synth_lock(key: str) -> tuple[str | None, bytes | None]:
+    """Returns (token, None) when this replica should synthesize, or (None, audio)
+    when another replica finished first. Waits as long as another replica holds
+    (and renews) the lock; if the holder releases it without publishing audio, or
+    stops renewing it, this request takes the lock over. (None, None) means Redis
+    is unavailable; synthesize without a lock."""
+    if not _AREDIS:
+        return None, None
+    token = uuid.uuid4().hex
+    lock_key = f"tts:lock:{key}"
+    try:
+        while True:
+            if await _AREDIS.set(lock_key, token, nx=True, px=_LOCK_MS):
+                return token, None
+            await asyncio.sleep(_LOCK_POLL_SEC)
+            data, _ = await _get_cached(key)
+            if data:
+                return None, data
+    except Exception as e:
+        log("WARN", "tts single-flight lock unavailable", error=str(e))
+        return None, None
+
+async def _release_synth_lock(key: str, token: str | None):
+    if not (_AREDIS and token):
+        return
+    try:
+        await _AREDIS.eval(_RELEASE_LUA, 1, f"tts:lock:{key}", token)
+    except Exception:
+        pass
+
+class _Flight:
+    """Leader side of single-flight for one cache key. Requests arriving after
+    construction wait on `done`; `finish()` resolves them and releases the lock.
+    Once the audio is handed to a streamed response, progress is tracked per
+    chunk (`touch`): a stream nobody consumes counts as stalled after `_LOCK_MS`,
+    which stops lock renewal and lets waiting requests take over."""
 
-# --- Simple in-memory rate limiter (per IP) ---
+    def __init__(self, key: str):
+        self.key = key
+        self.token: str | None = None
+        self.done: asyncio.Future = asyncio.get_running_loop().create_future()
+        self.streaming = False
+        self.touched = time.monotonic()
+        self._renewer: asyncio.Task | None = None
+        if key not in _INFLIGHT:
+            _INFLIGHT[key] = self
+
+    def hold(self, token: str | None):
+        """Record the Redis lock token and keep the lock alive until `finish`."""
+        self.token = token
+        if token:
+            self._renewer = asyncio.get_running_loop().create_task(self._renew())
+
+    def touch(self):
+        self.touched = time.monotonic()
+
+    def start_streaming(self):
+        self.streaming = True
+        self.touch()
+
+    @property
+    def stalled(self) -> bool:
+        return self.streaming and time.monotonic() - self.touched > _LOCK_MS / 1000.0
+
+    async def _renew(self):
+        while True:
+            await asyncio.sleep(_LOCK_MS / 3000.0)
+            if self.stalled:
+                return
+            try:
+                if not await _AREDIS.eval(_RENEW_LUA, 1, f"tts:lock:{self.key}", self.token, _LOCK_MS):
+                    return  # lost the lock (expired while this loop was starved)
+            except Exception as e:
+                log("WARN", "tts single-flight lock renewal failed", error=str(e))
+                return
+
+    async def finish(self, data: bytes | None):
+        if self._renewer is not None:
+            self._renewer.cancel()
+            self._renewer = None
+        if not self.done.done():
+            self.done.set_result(data)
+        if _INFLIGHT.get(self.key) is self:
+            _INFLIGHT.pop(self.key, None)
+        await _release_synth_lock(self.key, self.token)
+
+# --- Per-IP rate limiter (fixed memory per key; shared via Redis when configured) ---
 _RL_WINDOW = int(os.getenv("TTS_RATE_WINDOW_SEC", "60"))  # sliding window seconds
 _RL_MAX = int(os.getenv("TTS_RATE_MAX", "5"))  # max requests per window
-_requests: dict[str, list[float]] = {}
-
-def _rate_limit(request: Request):
-    now = time.time()
-    ip = request.client.host if request.client else 'unknown'
-    # Redis variant
-    if _REDIS:
-        key = f"tts:rl:{ip}"
-        p = _REDIS.pipeline()
-        p.zremrangebyscore(key, 0, now - _RL_WINDOW)
-        p.zadd(key, {str(now): now})
-        p.zcard(key)
-        p.expire(key, _RL_WINDOW)
-        _, _, count, _ = p.execute()
-        if count > _RL_MAX:
-            # earliest timestamp to compute reset
-            earliest = _REDIS.zrange(key, 0, 0, withscores=True)
-            if earliest:
-                reset = int(earliest[0][1] + _RL_WINDOW - now)
-            else:
-                reset = _RL_WINDOW
-            raise HTTPException(status_code=429, detail="Rate limit exceeded for TTS preamble")
-        remaining = max(_RL_MAX - count, 0)
-        earliest = _REDIS.zrange(key, 0, 0, withscores=True)
-        reset = int(earliest[0][1] + _RL_WINDOW - now) if earliest else _RL_WINDOW
-        request.state.rate_limit = {"limit": _RL_MAX, "remaining": remaining, "reset": reset, "backend": "redis"}
-        return True
-    # In-memory fallback
-    bucket = _requests.setdefault(ip, [])
-    cutoff = now - _RL_WINDOW
-    while bucket and bucket[0] < cutoff:
-        bucket.pop(0)
-    if len(bucket) >= _RL_MAX:
-        reset = int(bucket[0] + _RL_WINDOW - now) if bucket else _RL_WINDOW
-        raise HTTPException(status_code=429, detail="Rate limit exceeded for TTS preamble")
-    bucket.append(now)
-    remaining = max(_RL_MAX - len(bucket), 0)
-    reset = int(bucket[0] + _RL_WINDOW - now) if bucket else _RL_WINDOW
-    request.state.rate_limit = {"limit": _RL_MAX, "remaining": remaining, "reset": reset, "backend": "memory"}
-    return True
+_limiter = RateLimiter("tts", _RL_MAX, _RL_WINDOW, redis=_AREDIS)
+_limit_dependency = _limiter.dependency("Rate limit exceeded for TTS preamble")
+
+async def _rate_limit(request: Request):
+    try:
+        return await _limit_dependency(request)
+    except HTTPException:
+        if _RATE_LIMIT_BLOCKS:
+            try: _RATE_LIMIT_BLOCKS.inc()
+            except Exception: pass
+        raise
 
 def _cache_key(script: str, voice_id: str, model_id: str, settings: dict | None = None) -> str:
     h = hashlib.sha256()
@@ -121,26 +255,182 @@ def _cache_key(script: str, voice_id: str, model_id: str, settings: dict | None
         h.update(repr(stable).encode("utf-8"))
     return h.hexdigest()
 
-def _get_cached(key: str) -> bytes | None:
-    if _REDIS:
-        data = _REDIS.get(f"tts:cache:{key}")
+def _digest(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+# Redis hash per cache key: the audio and its sha256, so hits never re-hash the payload
+def _redis_key(key: str) -> str:
+    return f"tts:audio:{key}"
+
+async def _lookup(key: str) -> tuple[str | None, bytes | None, str | None, str | None]:
+    """(tier, data, path, digest) from the first tier holding `key`: memory/redis
+    return bytes, disk returns a file path. `digest` is the audio's sha256, stored
+    next to it in every tier when it was cached. Redis hits are promoted into L1."""
+    entry = _CACHE.get_tagged(key)
+    if entry is not None:
+        data, digest = entry
+        return "memory", data, None, digest or _digest(data)
+    if _AREDIS:
+        try:
+            data, digest = await _AREDIS.hmget(_redis_key(key), "audio", "sha256")
+        except Exception as e:
+            log("WARN", "tts cache redis read failed", error=str(e))
+            data = digest = None
         if data:
-            return data
+            digest = digest.decode("ascii") if digest else _digest(data)
+            _CACHE.set(key, data, ttl=_L1_TTL, tag=digest)
+            return "redis", data, None, digest
+    if _DISK:
+        path = await asyncio.to_thread(_DISK.get_path, key)
+        if path:
+            return "disk", None, path, _DISK.digest_of(path)
+    return None, None, None, None
+
+async def _get_cached(key: str) -> tuple[bytes | None, str | None]:
+    """(audio, digest) for `key`, reading disk-tier files into memory."""
+    tier, data, path, digest = await _lookup(key)
+    if path:
+        data = await asyncio.to_thread(_DISK.get, key)
+    return (data, digest) if data else (None, None)
+
+async def _store_cache(key: str, data: bytes) -> str:
+    """Write `data` to every tier; returns its sha256, computed once here."""
+    digest = _digest(data)
+    _CACHE.set(key, data, ttl=_L1_TTL, tag=digest)
+    if _AREDIS:
+        try:
+            async with _AREDIS.pipeline(transaction=True) as p:
+                p.hset(_redis_key(key), mapping={"audio": data, "sha256": digest})
+                p.expire(_redis_key(key), _TTL_SECONDS)
+                await p.execute()
+        except Exception as e:
+            log("WARN", "tts cache redis write failed", error=str(e))
+    if _DISK:
+        try:
+            await asyncio.to_thread(_DISK.set, key, data, digest)
+        except OSError as e:
+            log("WARN", "tts cache disk write failed", error=str(e))
+    return digest
+
+def _response_headers(request: Request, cache_state: str, extra: dict | None = None) -> dict:
+    rl = getattr(request.state, 'rate_limit', None) or {}
+    headers = {
+        "X-Cache": cache_state,
+        "X-RateLimit-Limit": str(rl.get('limit', _RL_MAX)),
+        "X-RateLimit-Remaining": str(rl.get('remaining', _RL_MAX)),
+        "X-RateLimit-Reset": str(rl.get('reset', _RL_WINDOW)),
+        "X-RateLimit-Backend": rl.get('backend', 'memory')
+    }
+    if extra:
+        headers.update(extra)
+    return headers
+
+# --- HTTP caching: ETag / If-None-Match, Cache-Control, byte ranges ---
+def _validator_headers(private: bool) -> dict:
+    """Personalized (named) audio must not be stored by shared caches/CDNs."""
+    max_age = int(_env_float("TTS_HTTP_MAX_AGE", 86400))
+    return {
+        "Cache-Control": f"{'private' if private else 'public'}, max-age={max_age}",
+        "Accept-Ranges": "bytes",
+    }
+
+def _etag(digest: str) -> str:
+    """Strong validator for the exact audio bytes: the sha256 stored with the cached
+    audio. A re-synthesis under the same cache key yields new bytes and so a new ETag."""
+    return f'"{digest}"'
+
+def _segments_digest(digests: list[str]) -> str:
+    """Joined segmented audio is identified by its segments' digests (no re-hash of the join)."""
+    return _digest("".join(digests).encode("ascii"))
+
+def _etag_matches(header: str | None, etag: str) -> bool:
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # Weak comparison, as If-None-Match requires
+    return any(tag.strip().removeprefix("W/") == etag for tag in header.split(","))
+
+def _parse_range(header: str, size: int) -> tuple[int, int] | None:
+    """Single `bytes=` range -> inclusive (start, end). Returns None for headers we
+    ignore (other units, multiple ranges, malformed) and raises 416 if unsatisfiable."""
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
         return None
-    entry = _CACHE.get(key)
-    if not entry:
+    first, sep, last = spec.strip().partition("-")
+    if not sep:
+        return None
+    try:
+        if first:
+            start = int(first)
+            end = int(last) if last else size - 1
+        else:
+            start, end = max(0, size - int(last)), size - 1  # suffix range: last N bytes
+    except ValueError:
         return None
-    expires, data = entry
-    if time.time() > expires:
-        _CACHE.pop(key, None)
+    if start >= size or (not first and int(last) == 0):
+        raise HTTPException(status_code=416, detail="Range not satisfiable", headers={"Content-Range": f"bytes */{size}"})
+    if end < start:
         return None
-    return data
+    return start, min(end, size - 1)
 
-def _store_cache(key: str, data: bytes):
-    if _REDIS:
-        _REDIS.setex(f"tts:cache:{key}", _TTL_SECONDS, data)
-    else:
-        _CACHE[key] = (time.time() + _TTL_SECONDS, data)
+def _read_range(path: str, start: int, length: int) -> bytes:
+    with open(path, "rb") as f:
+        f.seek(start)
+        return f.read(length)
+
+async def _audio_response(request: Request, headers: dict, digest: str | None, data: bytes | None = None,
+                          path: str | None = None) -> Response:
+    """Full (200) or partial (206) audio response for cached bytes or a disk-tier file.
+    Full disk responses go through FileResponse (sendfile); ranges are sliced.
+    `digest` comes from the cache; it is only computed here for audio that was
+    never cached by this request (a coalesced follower's copy)."""
+    headers = {**headers, "ETag": _etag(digest or _digest(data))}
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and (if_range is None or if_range.strip() == headers["ETag"]):
+        size = os.path.getsize(path) if path else len(data)
+        byte_range = _parse_range(range_header, size)
+        if byte_range:
+            start, end = byte_range
+            part = await asyncio.to_thread(_read_range, path, start, end - start + 1) if path else data[start:end + 1]
+            headers = {**headers, "Content-Range": f"bytes {start}-{end}/{size}"}
+            return Response(content=part, status_code=206, media_type="audio/mpeg", headers=headers)
+    if path:
+        return FileResponse(path, media_type="audio/mpeg", headers=headers)
+    return Response(content=data, media_type="audio/mpeg", headers=headers)
+
+async def _tee_to_cache(r: httpx.Response, key: str, request_id: str | None = None,
+                        on_done: Callable[[bytes | None], Awaitable[None]] | None = None,
+                        on_chunk: Callable[[], None] | None = None) -> AsyncIterator[bytes]:
+    """Forward upstream chunks to the client while buffering them for the cache.
+    The cache write happens once, after the upstream body completed; a client
+    disconnect or upstream error discards the partial audio. `on_done` receives
+    the cached audio (or None) so single-flight followers can be released;
+    `on_chunk` reports progress to the single-flight leader."""
+    chunks: list[bytes] = []
+    complete = False
+    stored = None
+    try:
+        async for chunk in r.aiter_bytes():
+            chunks.append(chunk)
+            if on_chunk:
+                on_chunk()
+            yield chunk
+        complete = True
+    finally:
+        await r.aclose()
+        if complete:
+            data = b"".join(chunks)
+            expected = r.headers.get("Content-Length")
+            if data and (expected is None or int(expected) == r.num_bytes_downloaded):
+                await _store_cache(key, data)
+                stored = data
+                log("INFO", "tts_preamble stream cached", bytes=len(data), request_id=request_id)
+        else:
+            log("WARN", "tts_preamble stream incomplete; not cached", bytes=sum(map(len, chunks)), request_id=request_id)
+        if on_done:
+            await on_done(stored)
 
 @router.get("/preamble", response_class=Response)
 async def tts_preamble(
@@ -155,21 +445,23 @@ async def tts_preamble(
     similarity_boost: float | None = Query(default=None, ge=0.0, le=1.0),
     style: float | None = Query(default=None, ge=0.0, le=1.0),
     use_speaker_boost: bool | None = Query(default=None),
-    _: bool = Depends(_rate_limit),
+    stream: bool | None = Query(default=None, description="Stream audio as it is synthesized (default TTS_PREAMBLE_STREAM)"),
+    segmented: bool | None = Query(default=None, description="Synthesize static sentences once and only the name sentence per candidate (default TTS_PREAMBLE_SEGMENTED)"),
+    client: httpx.AsyncClient = Depends(get_http_client),
 ):
     """Return preamble narration audio (MP3) generated on-demand via ElevenLabs.
     Caches result in-memory for TTL to reduce cost/latency.
-    Query param force=true bypasses cache (for admin refresh)."""
+    Query param force=true bypasses cache (for admin refresh); stream=true forwards
+    upstream chunks as they arrive and caches the audio once the stream completes;
+    segmented=true caches the name-independent sentences separately and joins the
+    MP3 segments server-side (takes precedence over stream)."""
     api_key, v_id, m_id = _get_eleven_config()
-    if not api_key:
-        raise HTTPException(status_code=503, detail="TTS disabled")
 
     # Build effective script and voice/settings (evaluate env at request time)
     person = (name or "").strip()
-    name_part = f" {person}," if person else ""
     base_script, company, product = _get_preamble_defaults()
     base_script = (script or base_script)
-    effective_script = base_script.replace("{name}", person).replace("{name_part}", name_part).replace("{company}", company).replace("{product}", product)
+    effective_script = _render_script(base_script, person, company, product)
     # Enforce configured voice/model regardless of client params
     defaults = _get_voice_defaults()
     voice_settings = {
@@ -178,60 +470,330 @@ async def tts_preamble(
         "style": defaults["style"] if style is None else style,
         "use_speaker_boost": defaults["use_speaker_boost"] if use_speaker_boost is None else bool(use_speaker_boost),
     }
+    request_id = getattr(request.state, 'request_id', None)
+
+    if segmented is None:
+        segmented = _env_bool("TTS_PREAMBLE_SEGMENTED", False)
+    texts = [_render_script(t, person, company, product) for t in _segment_script(base_script)] if segmented else []
+    if len(texts) > 1:
+        segment_keys = [_cache_key(text, v_id, m_id, voice_settings) for text in texts]
+        # The joined audio is identified by its segments
+        cache_key = hashlib.sha256("".join(segment_keys).encode("ascii")).hexdigest()
+    else:
+        cache_key = _cache_key(effective_script, v_id, m_id, voice_settings)
+    validators = _validator_headers(private=bool(person))
+    # Revalidation is answered from the cache before the rate limiter is charged;
+    # the ETag is the digest of the cached bytes, so a re-synthesis invalidates it
+    looked_up = None
+    if_none_match = request.headers.get("if-none-match")
+    if not force and if_none_match:
+        if len(texts) > 1:
+            digests = [found[3] for found in await asyncio.gather(*(_lookup(key) for key in segment_keys))]
+            digest = _segments_digest(digests) if all(digests) else None
+        else:
+            looked_up = await _lookup(cache_key)
+            digest = looked_up[3]
+        if digest and _etag_matches(if_none_match, _etag(digest)):
+            return Response(status_code=304, headers={**validators, "ETag": _etag(digest)})
 
-    cache_key = _cache_key(effective_script, v_id, m_id, voice_settings)
+    await _rate_limit(request)
+    if not api_key:
+        raise HTTPException(status_code=503, detail="TTS disabled")
+    voice = _Voice(client, api_key, v_id, m_id, voice_settings)
+
+    if len(texts) > 1:
+        try:
+            results = await asyncio.gather(*(
+                _fetch_audio(voice, key, text, force, request_id)
+                for key, text in zip(segment_keys, texts)
+            ))
+        except HTTPException:
+            raise
+        except Exception as e:
+            log_exception("tts_preamble unexpected failure", e, request_id=request_id)
+            raise HTTPException(status_code=500, detail=f"TTS failure: {e}")
+        states = [state for _, state, _ in results]
+        headers = _response_headers(request, "HIT" if all(st == "HIT" for st in states) else "MISS", validators)
+        headers["X-Cache-Segments"] = ",".join(states)
+        digest = _segments_digest([digest or _digest(audio) for audio, _, digest in results])
+        return await _audio_response(request, headers, digest, data=_join_mp3([audio for audio, _, _ in results]))
 
     if not force:
-        cached = _get_cached(cache_key)
-        if cached:
-            log("INFO", "tts_preamble cache hit", cache="HIT", backend="redis" if _REDIS else "memory", request_id=getattr(request.state, 'request_id', None))
+        tier, cached, path, digest = looked_up or await _lookup(cache_key)
+        if cached or path:
+            log("INFO", "tts_preamble cache hit", cache="HIT", tier=tier, request_id=request_id)
             if _CACHE_HITS:
                 try: _CACHE_HITS.inc()
                 except Exception: pass
-            rl = getattr(request.state, 'rate_limit', None) or {}
-            headers = {
-                "X-Cache": "HIT",
-                "X-RateLimit-Limit": str(rl.get('limit', _RL_MAX)),
-                "X-RateLimit-Remaining": str(rl.get('remaining', _RL_MAX)),
-                "X-RateLimit-Reset": str(rl.get('reset', _RL_WINDOW)),
-                "X-RateLimit-Backend": rl.get('backend', 'memory')
-            }
-            return Response(content=cached, media_type="audio/mpeg", headers=headers)
-
-    url = f"https://api.elevenlabs.io/v1/text-to-speech/{v_id}"
+            headers = _response_headers(request, "HIT", validators)
+            headers["X-Cache-Tier"] = tier
+            return await _audio_response(request, headers, digest, data=cached, path=path)
+
+    if stream is None:
+        stream = _env_bool("TTS_PREAMBLE_STREAM", False)
+    try:
+        # A byte range needs the complete audio, so range requests are never streamed
+        if stream and "range" not in request.headers:
+            return await _stream_audio(request, voice, cache_key, effective_script, force, validators)
+        audio_bytes, state, digest = await _fetch_audio(voice, cache_key, effective_script, force, request_id, check_cache=False)
+        return await _audio_response(request, _response_headers(request, state, validators), digest, data=audio_bytes)
+    except HTTPException:
+        raise
+    except Exception as e:
+        log_exception("tts_preamble unexpected failure", e, request_id=request_id)
+        raise HTTPException(status_code=500, detail=f"TTS failure: {e}")
+
+
+def _render_script(template: str, person: str, company: str, product: str) -> str:
+    name_part = f" {person}," if person else ""
+    return template.replace("{name}", person).replace("{name_part}", name_part).replace("{company}", company).replace("{product}", product)
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+def _segment_script(template: str) -> list[str]:
+    """Split a script template at sentence boundaries into runs of name-independent
+    sentences and the individual sentences that reference {name}/{name_part}.
+    Static runs render identically for every candidate, so their audio is shared."""
+    segments: list[tuple[bool, list[str]]] = []
+    for sentence in _SENTENCE_END.split(template.strip()):
+        dynamic = "{name" in sentence
+        if segments and not dynamic and not segments[-1][0]:
+            segments[-1][1].append(sentence)
+        else:
+            segments.append((dynamic, [sentence]))
+    return [" ".join(sentences) for _, sentences in segments]
+
+def _strip_id3(data: bytes, keep_v2: bool = False) -> bytes:
+    """Drop the ID3v2 header (unless keep_v2) and ID3v1 trailer around MPEG frames."""
+    start, end = 0, len(data)
+    if not keep_v2 and data[:3] == b"ID3" and len(data) >= 10:
+        # Tag size is a 28-bit syncsafe integer excluding the 10-byte header (and optional footer)
+        size = (data[6] & 0x7F) << 21 | (data[7] & 0x7F) << 14 | (data[8] & 0x7F) << 7 | (data[9] & 0x7F)
+        start = min(end, 10 + size + (10 if data[5] & 0x10 else 0))
+    if end - start >= 128 and data[end - 128:end - 125] == b"TAG":
+        end -= 128
+    return data[start:end]
+
+def _join_mp3(parts: list[bytes]) -> bytes:
+    """Concatenate MP3 segments; only the first keeps its ID3v2 tag so players
+    do not stop at (or mis-time on) embedded tags between frames."""
+    return b"".join(_strip_id3(part, keep_v2=(i == 0)) for i, part in enumerate(parts))
+
+
+class _Voice(NamedTuple):
+    """Upstream call parameters shared by every segment of one request."""
+    client: httpx.AsyncClient
+    api_key: str
+    voice_id: str
+    model_id: str
+    settings: dict
+
+
+async def _post_upstream(voice: _Voice, text: str, stream: bool, request_id: str | None) -> httpx.Response:
+    """POST one synthesis request; raises 502 unless the upstream answered 200.
+    With stream=True the caller must close the returned response."""
+    url = f"{_get_eleven_base_url()}/v1/text-to-speech/{voice.voice_id}"
+    if stream:
+        # Upstream streaming endpoint emits MP3 frames as they are synthesized
+        url += "/stream"
     payload = {
-        "text": effective_script,
-        "model_id": m_id,
-        "voice_settings": voice_settings,
+        "text": text,
+        "model_id": voice.model_id,
+        "voice_settings": voice.settings,
     }
     headers = {
-        "xi-api-key": api_key,
+        "xi-api-key": voice.api_key,
         "Accept": "audio/mpeg",
         "Content-Type": "application/json"
     }
+    client = voice.client
+    # Shared pooled client (keep-alive / HTTP/2); 429 and 5xx are retried with jittered backoff
+    r = await send_with_retry(client, client.build_request("POST", url, json=payload, headers=headers), stream=stream)
+    if r.status_code != 200:
+        await r.aclose()
+        log("WARN", "tts_preamble upstream error", upstream_status=r.status_code, request_id=request_id)
+        raise HTTPException(status_code=502, detail=f"ElevenLabs error {r.status_code}")
+    if _CACHE_MISSES:
+        try: _CACHE_MISSES.inc()
+        except Exception: pass
+    return r
+
+
+async def _fetch_audio(voice: _Voice, cache_key: str, text: str, force: bool = False,
+                       request_id: str | None = None, check_cache: bool = True) -> tuple[bytes, str, str | None]:
+    """Cached or freshly synthesized audio for `text`, coalescing concurrent misses
+    (in-process and across replicas). Returns (audio, X-Cache state, sha256 digest
+    when known; coalesced copies carry none)."""
+    if not force:
+        if check_cache:
+            cached, digest = await _get_cached(cache_key)
+            if cached:
+                return cached, "HIT", digest
+        # Another request on this replica is already synthesizing the same audio
+        shared = await _await_inflight(cache_key)
+        if shared:
+            _count_coalesced("local")
+            log("INFO", "tts_preamble coalesced", cache="COALESCED", scope="local", request_id=request_id)
+            return shared, "COALESCED", None
+    flight = _Flight(cache_key)
+    audio_bytes = None
     try:
-        async with httpx.AsyncClient(timeout=30) as client:
-            r = await client.post(url, json=payload, headers=headers)
-        if r.status_code != 200:
-            log("WARN", "tts_preamble upstream error", upstream_status=r.status_code, request_id=getattr(request.state, 'request_id', None))
-            raise HTTPException(status_code=502, detail=f"ElevenLabs error {r.status_code}")
+        if not force:
+            token, audio_bytes = await _acquire_synth_lock(cache_key)
+            flight.hold(token)
+            if audio_bytes:
+                _count_coalesced("redis")
+                log("INFO", "tts_preamble coalesced", cache="COALESCED", scope="redis", request_id=request_id)
+                return audio_bytes, "COALESCED", None
+        r = await _post_upstream(voice, text, False, request_id)
         audio_bytes = r.content
-        _store_cache(cache_key, audio_bytes)
-        log("INFO", "tts_preamble cache miss", cache="MISS", backend="redis" if _REDIS else "memory", bytes=len(audio_bytes), request_id=getattr(request.state, 'request_id', None))
-        if _CACHE_MISSES:
-            try: _CACHE_MISSES.inc()
-            except Exception: pass
-        rl = getattr(request.state, 'rate_limit', None) or {}
-        headers = {
-            "X-Cache": "MISS",
-            "X-RateLimit-Limit": str(rl.get('limit', _RL_MAX)),
-            "X-RateLimit-Remaining": str(rl.get('remaining', _RL_MAX)),
-            "X-RateLimit-Reset": str(rl.get('reset', _RL_WINDOW)),
-            "X-RateLimit-Backend": rl.get('backend', 'memory')
-        }
-        return Response(content=audio_bytes, media_type="audio/mpeg", headers=headers)
-    except HTTPException:
-        raise
+        digest = await _store_cache(cache_key, audio_bytes)
+        log("INFO", "tts_preamble cache miss", cache="MISS", bytes=len(audio_bytes), request_id=request_id)
+        return audio_bytes, "MISS", digest
+    finally:
+        # A failed leader resolves followers with None so they retry on their own
+        await flight.finish(audio_bytes)
+
+
+async def _stream_audio(request: Request, voice: _Voice, cache_key: str, text: str, force: bool,
+                        extra_headers: dict | None = None) -> Response:
+    """Stream upstream audio to the client, teeing it into the cache; single-flight
+    followers are released when the stream completes."""
+    request_id = getattr(request.state, 'request_id', None)
+    if not force:
+        shared = await _await_inflight(cache_key)
+        if shared:
+            _count_coalesced("local")
+            return Response(content=shared, media_type="audio/mpeg", headers=_response_headers(request, "COALESCED", extra_headers))
+    flight = _Flight(cache_key)
+    handed_off = False  # once streaming starts, the body generator owns `finish`
+    try:
+        if not force:
+            token, shared = await _acquire_synth_lock(cache_key)
+            flight.hold(token)
+            if shared:
+                _count_coalesced("redis")
+                await flight.finish(shared)
+                handed_off = True
+                return Response(content=shared, media_type="audio/mpeg", headers=_response_headers(request, "COALESCED", extra_headers))
+        r = await _post_upstream(voice, text, True, request_id)
+        log("INFO", "tts_preamble cache miss", cache="MISS", streaming=True, request_id=request_id)
+        body = _tee_to_cache(r, cache_key, request_id, on_done=flight.finish, on_chunk=flight.touch)
+        flight.start_streaming()
+        handed_off = True
+        return StreamingResponse(body, media_type="audio/mpeg", headers=_response_headers(request, "MISS", extra_headers))
+    finally:
+        if not handed_off:
+            await flight.finish(None)
+
+
+# --- Cache warming (startup task and offline pre-rendering) ---
+# state: idle | running | done | failed; /ready reports not-ready while running
+_WARMUP: dict = {"state": "idle", "rendered": 0, "failed": 0}
+
+def _warmup_names() -> list[str]:
+    return [n.strip() for n in os.getenv("TTS_WARMUP_NAMES", "").split(",") if n.strip()]
+
+def _warmup_texts(names: list[str], segmented: bool) -> list[str]:
+    """Default script for the anonymous preamble and each name, as the endpoint
+    would render it (segments when segmented); duplicates removed, order kept."""
+    base_script, company, product = _get_preamble_defaults()
+    texts: list[str] = []
+    for person in [""] + names:
+        if segmented:
+            texts.extend(_render_script(t, person, company, product) for t in _segment_script(base_script))
+        else:
+            texts.append(_render_script(base_script, person, company, product))
+    return list(dict.fromkeys(texts))
+
+async def warm_cache(client: httpx.AsyncClient, names: list[str] | None = None, concurrency: int = 4,
+                     segmented: bool | None = None, force: bool = False) -> dict:
+    """Render the default preamble (configured voice settings from
+    _get_voice_defaults) plus `names` into the cache tiers, at most
+    `concurrency` upstream calls at a time. Returns {rendered, cached, failed}."""
+    api_key, v_id, m_id = _get_eleven_config()
+    if not api_key:
+        return {"rendered": 0, "cached": 0, "failed": 0, "skipped": "TTS disabled"}
+    if segmented is None:
+        segmented = _env_bool("TTS_PREAMBLE_SEGMENTED", False)
+    voice = _Voice(client, api_key, v_id, m_id, _get_voice_defaults())
+    sem = asyncio.Semaphore(max(1, concurrency))
+    counts = {"rendered": 0, "cached": 0, "failed": 0}
+
+    async def render(text: str):
+        async with sem:
+            try:
+                _, state, _ = await _fetch_audio(voice, _cache_key(text, v_id, m_id, voice.settings), text, force)
+                counts["cached" if state == "HIT" else "rendered"] += 1
+            except Exception as e:
+                counts["failed"] += 1
+                log("WARN", "tts warm-up render failed", error=str(e), chars=len(text))
+
+    await asyncio.gather(*(render(t) for t in _warmup_texts(names or [], segmented)))
+    return counts
+
+async def run_startup_warmup(client: httpx.AsyncClient):
+    """Startup task: warm the cache (TTS_WARMUP, TTS_WARMUP_NAMES, TTS_WARMUP_CONCURRENCY),
+    giving up after TTS_WARMUP_TIMEOUT_SEC so a slow upstream cannot hold readiness forever."""
+    if not _env_bool("TTS_WARMUP", True) or not _get_eleven_config()[0]:
+        _WARMUP["state"] = "done"
+        return
+    _WARMUP["state"] = "running"
+    started = time.monotonic()
+    try:
+        counts = await asyncio.wait_for(
+            warm_cache(client, _warmup_names(), int(_env_float("TTS_WARMUP_CONCURRENCY", 4))),
+            _env_float("TTS_WARMUP_TIMEOUT_SEC", 120.0),
+        )
+        _WARMUP.update(counts, state="done")
+    except asyncio.TimeoutError:
+        _WARMUP.update(state="failed", error="timeout")
     except Exception as e:
-        log_exception("tts_preamble unexpected failure", e, request_id=getattr(request.state, 'request_id', None))
-        raise HTTPException(status_code=500, detail=f"TTS failure: {e}")
+        _WARMUP.update(state="failed", error=str(e))
+    _WARMUP["seconds"] = round(time.monotonic() - started, 2)
+    log("INFO" if _WARMUP["state"] == "done" else "WARN", "tts warm-up finished", **_WARMUP)
+
+def warmup_ready() -> bool:
+    return _WARMUP["state"] != "running"
+
+
+def main(argv=None):
+    import argparse
+    from .http_client import create_upstream_client
+
+    parser = argparse.ArgumentParser(prog="python -m backend.tts_preamble", description="TTS preamble cache tools")
+    sub = parser.add_subparsers(dest="command", required=True)
+    pre = sub.add_parser("prerender", help="Render the default preamble (and names) into Redis / the disk cache")
+    pre.add_argument("--names", default="", help="Comma-separated candidate names")
+    pre.add_argument("--names-file", help="File with one name per line")
+    pre.add_argument("--concurrency", type=int, default=4)
+    pre.add_argument("--segmented", action=argparse.BooleanOptionalAction, default=None,
+                     help="Render segments (default TTS_PREAMBLE_SEGMENTED)")
+    pre.add_argument("--force", action="store_true", help="Re-render even if cached")
+    args = parser.parse_args(argv)
+
+    if not _get_eleven_config()[0]:
+        parser.error("ELEVENLABS_API_KEY is not set")
+    if not (_AREDIS or _DISK):
+        parser.error("no persistent cache tier: set REDIS_URL and/or TTS_CACHE_DIR")
+    names = [n.strip() for n in args.names.split(",") if n.strip()]
+    if args.names_file:
+        with open(args.names_file, encoding="utf-8") as f:
+            names.extend(line.strip() for line in f if line.strip())
+
+    async def run():
+        client = create_upstream_client()
+        try:
+            return await warm_cache(client, names, args.concurrency, args.segmented, args.force)
+        finally:
+            await client.aclose()
+            if _AREDIS:
+                await _AREDIS.aclose()
+
+    counts = asyncio.run(run())
+    print(f"rendered={counts['rendered']} cached={counts['cached']} failed={counts['failed']}")
+    return 1 if counts["failed"] else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
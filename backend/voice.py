@@ -1,13 +1,31 @@
-from fastapi import APIRouter, UploadFile, File, Form, HTTPException
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException, WebSocket, WebSocketDisconnect, Depends
 import json
-import io
-import wave
 import struct
+import sys
+import time
 import math
-from typing import List, Tuple, Optional
+import cmath
+from array import array
+from typing import Dict, List, NamedTuple, Sequence, Tuple, Optional
+
+# Optional dependency: NumPy accelerates the FFT pitch path; pure Python is used otherwise
+try:
+    import numpy as _np  # type: ignore
+except Exception:  # ImportError or broken install
+    _np = None  # type: ignore
+
+from starlette.responses import JSONResponse
+
+from .analysis_pool import PoolSaturated, get_analysis_pool
+from .config import get_settings
+from .rate_limit import RateLimiter
+from .redis_utils import get_async_redis_client
 
 router = APIRouter()
 
+_settings = get_settings()
+_limiter = RateLimiter("voice", _settings.voice_rate_max, _settings.voice_rate_window_sec, redis=get_async_redis_client())
+
 # Optional dependency: python-multipart is required for File/Form parsing
 try:
     import multipart  # type: ignore
@@ -15,24 +33,81 @@ try:
 except Exception:
     _MULTIPART_AVAILABLE = False
 
+# Multipart framing and the small form fields on top of the audio itself
+_MULTIPART_OVERHEAD = 64 * 1024
+
+
+class UploadLimitMiddleware:
+    """
+    Caps the request body of upload routes before anything parses or spools it.
+    A declared Content-Length over the limit is answered with 413 right away;
+    chunked bodies are counted as they arrive and fail with 413 once they pass it.
+    """
+
+    def __init__(self, app, paths: Sequence[str] = ("/voice/analyze_voice",)):
+        self.app = app
+        self.paths = frozenset(paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in self.paths:
+            return await self.app(scope, receive, send)
+        max_bytes = get_settings().voice_max_upload_bytes
+        limit = max_bytes + _MULTIPART_OVERHEAD
+        detail = f"Audio exceeds {max_bytes} bytes"
+        declared = dict(scope["headers"]).get(b"content-length")
+        if declared is not None and declared.isdigit() and int(declared) > limit:
+            return await JSONResponse({"detail": detail}, status_code=413)(scope, receive, send)
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    # Re-raised by FastAPI's body parsing and rendered as a 413 response
+                    raise HTTPException(status_code=413, detail=detail)
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+
 @router.post("/voice/analyze_voice")
-async def analyze_voice(audio: UploadFile = File(None), prompt_index: int = Form(None), responses: str = Form(None)):
+async def analyze_voice(audio: UploadFile = File(None), prompt_index: int = Form(None), responses: str = Form(None), streaming: Optional[bool] = Form(None),
+                        _: bool = Depends(_limiter.dependency("Rate limit exceeded for voice analysis"))):
     if not _MULTIPART_AVAILABLE:
         # Provide a clear message rather than crashing app start
         raise HTTPException(status_code=501, detail="Voice upload not enabled: install 'python-multipart' to enable this endpoint.")
     if audio is None or prompt_index is None or responses is None:
         raise HTTPException(status_code=400, detail="Missing form fields: audio, prompt_index, responses")
-    contents = await audio.read()
+    settings = get_settings()
+    if audio.size is not None and audio.size > settings.voice_max_upload_bytes:
+        raise HTTPException(status_code=413, detail=f"Audio exceeds {settings.voice_max_upload_bytes} bytes")
     try:
-        sr, mono = _read_wav_mono(contents)
+        # Read only the header first so limits are enforced before any PCM is buffered
+        fmt, head = await _read_wav_header(audio)
+        _check_wav_limits(fmt, settings.voice_max_duration_sec, settings.voice_max_upload_bytes)
+        pool = get_analysis_pool()
+        use_streaming = settings.voice_streaming if streaming is None else streaming
+        if use_streaming:
+            energy, pitch_hz = await _analyze_stream(audio, fmt, head, pool, settings.voice_stream_chunk_bytes,
+                                                     settings.voice_max_upload_bytes, settings.voice_max_duration_sec,
+                                                     settings.voice_stream_batch_chunks)
+        else:
+            contents = head + await audio.read()
+            _check_wav_limits(fmt, settings.voice_max_duration_sec, settings.voice_max_upload_bytes, received=len(contents))
+            # Decode + DSP are CPU-bound: run them in the bounded pool so other routes stay responsive
+            energy, pitch_hz = await pool.run(_analyze_wav, contents)
     except HTTPException:
         raise
+    except PoolSaturated as e:
+        raise HTTPException(status_code=503, detail="Voice analysis busy, please retry", headers={"Retry-After": str(e.retry_after)})
+    except ValueError as e:
+        raise HTTPException(status_code=415, detail=f"Invalid WAV: {e}")
     except Exception as e:
         raise HTTPException(status_code=415, detail=f"Unsupported or invalid audio: {e}")
 
     # Compute features
-    energy = _rms_energy(mono)
-    pitch_hz = _estimate_pitch_autocorr(mono, sr)
     tonality = _classify_tonality(energy, pitch_hz)
 
     feats = {
@@ -41,8 +116,7 @@ async def analyze_voice(audio: UploadFile = File(None), prompt_index: int = Form
         "tonality": tonality,
     }
     # Optional lightweight EQ-like score (scaled 0-30)
-    eq_score = int(min(30, max(0, (energy * 400) + (8 if pitch_hz else 0))))
-    feats["eqScore"] = eq_score
+    feats["eqScore"] = _eq_score(energy, pitch_hz)
 
     return {
         "prompt_index": prompt_index,
@@ -52,77 +126,572 @@ async def analyze_voice(audio: UploadFile = File(None), prompt_index: int = Form
     }
 
 
-def _read_wav_mono(data: bytes) -> Tuple[int, List[float]]:
+_WAVE_FORMAT_PCM = 0x0001
+_WAVE_FORMAT_IEEE_FLOAT = 0x0003
+_WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+_NATIVE_LITTLE = sys.byteorder == "little"
+
+
+class _WavFormat(NamedTuple):
+    format_tag: int  # PCM or IEEE float (EXTENSIBLE resolved to its sub-format)
+    channels: int
+    sample_rate: int
+    sample_width: int  # bytes per sample
+    block_align: int  # bytes per frame
+    data_offset: int  # byte offset of the PCM payload
+    data_size: Optional[int]  # declared payload size; None when the writer left it open (streaming)
+
+
+def _parse_wav_header(head: bytes) -> Optional[_WavFormat]:
     """
-    Read a PCM WAV from bytes and return (sample_rate, mono_float_samples[-1..1]).
-    Supports 8/16/32-bit ints. For multi-channel, uses the first channel.
+    Walk the RIFF chunks up to the start of the 'data' chunk.
+    Returns None if `head` ends before the data chunk header (caller needs more bytes).
+    Raises ValueError for files that are not WAV or use an unsupported encoding.
     """
-    bio = io.BytesIO(data)
+    if len(head) < 12:
+        return None
+    if head[0:4] != b"RIFF" or head[8:12] != b"WAVE":
+        raise ValueError("not a RIFF/WAVE file")
+    pos = 12
+    fmt = None
+    while True:
+        if len(head) < pos + 8:
+            return None
+        chunk_id = head[pos:pos + 4]
+        (chunk_size,) = struct.unpack_from("<I", head, pos + 4)
+        body = pos + 8
+        if chunk_id == b"data":
+            if fmt is None:
+                raise ValueError("data chunk before fmt chunk")
+            tag, nch, sr, block_align, bits = fmt
+            sw = (bits + 7) // 8
+            data_size = None if chunk_size in (0, 0xFFFFFFFF) else chunk_size
+            return _WavFormat(tag, nch, sr, sw, block_align, body, data_size)
+        if chunk_id == b"fmt ":
+            if len(head) < body + 16:
+                return None
+            tag, nch, sr, _byte_rate, block_align, bits = struct.unpack_from("<HHIIHH", head, body)
+            if tag == _WAVE_FORMAT_EXTENSIBLE:
+                if chunk_size < 26:
+                    raise ValueError("truncated WAVE_FORMAT_EXTENSIBLE header")
+                if len(head) < body + 26:
+                    return None
+                # Sub-format GUID starts at offset 24; its first two bytes are the real format tag
+                (tag,) = struct.unpack_from("<H", head, body + 24)
+            if tag not in (_WAVE_FORMAT_PCM, _WAVE_FORMAT_IEEE_FLOAT):
+                raise ValueError(f"unsupported format tag 0x{tag:04x}")
+            if nch < 1 or sr <= 0 or bits <= 0:
+                raise ValueError("invalid fmt chunk")
+            sw = (bits + 7) // 8
+            if tag == _WAVE_FORMAT_PCM and sw not in (1, 2, 3, 4):
+                raise ValueError(f"unsupported sample width: {sw} bytes")
+            if tag == _WAVE_FORMAT_IEEE_FLOAT and sw not in (4, 8):
+                raise ValueError(f"unsupported float width: {sw} bytes")
+            if block_align < nch * sw:
+                block_align = nch * sw
+            fmt = (tag, nch, sr, block_align, bits)
+        # Chunks are word aligned
+        pos = body + chunk_size + (chunk_size & 1)
+
+
+def _decode_channel(raw, fmt: _WavFormat, channel: int = 0) -> Sequence[float]:
+    """
+    Decode one channel of frame-aligned PCM bytes to float samples in [-1, 1].
+
+    Channel selection is a strided view over the buffer (numpy.frombuffer or
+    memoryview.cast), so the only copy made is the compact float32 output
+    (a NumPy array, or array('f') without NumPy).
+    """
+    nch = fmt.channels
+    sw = fmt.sample_width
+    usable = len(raw) - (len(raw) % fmt.block_align)
+    mv = memoryview(raw)[:usable]
+    if fmt.block_align != nch * sw:
+        # Padded frames (rare): fall back to a frame-by-frame gather
+        mv = memoryview(b"".join(mv[i:i + nch * sw] for i in range(0, usable, fmt.block_align)))
+    if fmt.format_tag == _WAVE_FORMAT_IEEE_FLOAT:
+        code, scale = ("f" if sw == 4 else "d"), 1.0
+    elif sw == 1:
+        code, scale = "B", 1.0 / 127.0
+    elif sw == 2:
+        code, scale = "h", 1.0 / 32767.0
+    elif sw == 3:
+        # 24-bit samples are widened into the top three bytes of an int32 (value << 8)
+        code, scale = "i", 1.0 / (8388607.0 * 256.0)
+    else:
+        code, scale = "i", 1.0 / 2147483647.0
+
+    if _np is not None:
+        if sw == 3:
+            b = _np.frombuffer(mv, dtype=_np.uint8).reshape(-1, nch, 3)[:, channel, :]
+            ints = (b[:, 0].astype(_np.int32) << 8) | (b[:, 1].astype(_np.int32) << 16) | (b[:, 2].astype(_np.int32) << 24)
+            return ints.astype(_np.float32) * _np.float32(scale)
+        dtype = _np.dtype(code).newbyteorder("<")
+        view = _np.frombuffer(mv, dtype=dtype)[channel::nch]
+        if code == "B":
+            return (view.astype(_np.float32) - 128.0) * _np.float32(scale)
+        return view.astype(_np.float32) * _np.float32(scale)
+
+    if sw == 3:
+        stride = 3 * nch
+        n = usable // stride
+        widened = bytearray(4 * n)
+        for k in range(3):
+            widened[k + 1::4] = mv[3 * channel + k::stride]
+        if not _NATIVE_LITTLE:
+            ints = array("i", widened)
+            ints.byteswap()
+            view = memoryview(ints)
+        else:
+            view = memoryview(widened).cast("i")
+    elif code == "B":
+        view = mv[channel::nch]
+        return array("f", ((v - 128) * scale for v in view))
+    elif _NATIVE_LITTLE:
+        view = mv.cast(code)[channel::nch]
+    else:
+        swapped = array(code, mv)
+        swapped.byteswap()
+        view = memoryview(swapped)[channel::nch]
+    if scale == 1.0:
+        return array("f", view)
+    return array("f", (v * scale for v in view))
+
+
+def _decode_wav(data: bytes) -> Tuple[int, Sequence[float]]:
+    """
+    Decode a WAV from bytes to (sample_rate, mono_float_samples[-1..1]).
+    Supports 8/16/24/32-bit PCM and 32/64-bit IEEE float (including
+    WAVE_FORMAT_EXTENSIBLE). For multi-channel, uses the first channel.
+    Raises ValueError for invalid or unsupported files.
+    """
+    fmt = _parse_wav_header(data)
+    if fmt is None:
+        raise ValueError("truncated header")
+    end = len(data) if fmt.data_size is None else min(len(data), fmt.data_offset + fmt.data_size)
+    payload = memoryview(data)[fmt.data_offset:end]
+    return fmt.sample_rate, _decode_channel(payload, fmt)
+
+
+def _read_wav_mono(data: bytes) -> Tuple[int, Sequence[float]]:
+    """Same as `_decode_wav`, raising HTTP 415 for invalid audio."""
     try:
-        with wave.open(bio, 'rb') as w:
-            nch = w.getnchannels()
-            sw = w.getsampwidth()
-            sr = w.getframerate()
-            nframes = w.getnframes()
-            frames = w.readframes(nframes)
-    except wave.Error as e:
+        return _decode_wav(data)
+    except ValueError as e:
         raise HTTPException(status_code=415, detail=f"Invalid WAV: {e}")
-    if sw not in (1, 2, 4):
-        raise HTTPException(status_code=415, detail=f"Unsupported sample width: {sw} bytes")
-    # Convert to ints and take first channel
-    if sw == 1:
-        # 8-bit PCM unsigned in WAV; convert to signed centered at 0
-        ints = list(frames)
-        maxv = 127.0
-        step = nch
-        mono = [((ints[i] - 128) / maxv) for i in range(0, len(ints), step)]
-    elif sw == 2:
-        count = len(frames) // 2
-        fmt = '<' + ('h' * count)
-        ints = list(struct.unpack(fmt, frames))
-        maxv = 32767.0
-        step = nch
-        mono = [ints[i] / maxv for i in range(0, len(ints), step)]
-    else:  # sw == 4
-        count = len(frames) // 4
-        fmt = '<' + ('i' * count)
-        ints = list(struct.unpack(fmt, frames))
-        maxv = 2147483647.0
-        step = nch
-        mono = [ints[i] / maxv for i in range(0, len(ints), step)]
-    return sr, mono
-
-
-def _rms_energy(samples: List[float]) -> float:
-    if not samples:
+
+
+def _analyze_wav(data: bytes) -> Tuple[float, Optional[float]]:
+    """
+    Decode and compute (rms_energy, pitch_hz). Module-level and free of
+    HTTP types so it can run in a worker process; raises ValueError.
+    """
+    sr, mono = _decode_wav(data)
+    return _rms_energy(mono), _estimate_pitch_autocorr(mono, sr)
+
+
+_MAX_HEADER_BYTES = 1024 * 1024
+
+
+async def _read_wav_header(audio: UploadFile, step: int = 4096) -> Tuple[_WavFormat, bytes]:
+    """Read just enough of the upload to parse the WAV header; returns (format, bytes read so far)."""
+    head = b""
+    while True:
+        chunk = await audio.read(step)
+        head += chunk
+        fmt = _parse_wav_header(head)
+        if fmt is not None:
+            return fmt, head
+        if not chunk:
+            raise ValueError("truncated header")
+        if len(head) > _MAX_HEADER_BYTES:
+            raise ValueError("header too large")
+
+
+def _check_wav_limits(fmt: _WavFormat, max_duration_sec: int, max_bytes: int, received: Optional[int] = None):
+    """Raise HTTP 413 when the declared (or received) payload exceeds the configured limits."""
+    size = received if received is not None else fmt.data_size
+    if size is None:
+        return
+    if size > max_bytes:
+        raise HTTPException(status_code=413, detail=f"Audio exceeds {max_bytes} bytes")
+    duration = size / float(fmt.block_align * fmt.sample_rate)
+    if duration > max_duration_sec:
+        raise HTTPException(status_code=413, detail=f"Audio longer than {max_duration_sec} seconds")
+
+
+def _chunk_features(raw: bytes, fmt: _WavFormat, keep_from: int, keep_to: int) -> Tuple[float, int, array]:
+    """
+    Decode one frame-aligned PCM chunk and return (sum_of_squares, frames,
+    samples[keep_from:keep_to]). Stateless and picklable so chunks can run in
+    the analysis pool; the kept slice feeds the pitch window.
+    """
+    mono = _decode_channel(raw, fmt)
+    if _np is not None and isinstance(mono, _np.ndarray):
+        x = mono.astype(_np.float64)
+        acc = float(_np.dot(x, x))
+    else:
+        acc = 0.0
+        for s in mono:
+            acc += s * s
+    return acc, len(mono), _as_float_array(mono[keep_from:keep_to])
+
+
+def _batch_features(chunks: List[Tuple[bytes, int, int]], fmt: _WavFormat) -> List[Tuple[float, int, array]]:
+    """`_chunk_features` for several (raw, keep_from, keep_to) chunks in one pool call."""
+    return [_chunk_features(raw, fmt, lo, hi) for raw, lo, hi in chunks]
+
+
+def _as_float_array(samples: Sequence[float]) -> array:
+    """Normalize decoder output (NumPy or array) to a compact, picklable array('f')."""
+    if isinstance(samples, array):
+        return samples
+    out = array("f")
+    if _np is not None and isinstance(samples, _np.ndarray):
+        out.frombytes(samples.astype(_np.float32).tobytes())
+    else:
+        out.extend(samples)
+    return out
+
+
+class _StreamAnalyzer:
+    """
+    Incremental RMS energy plus a bounded pitch window (at most one second).
+
+    With a declared data size the window is the centered second, matching
+    `_estimate_pitch_autocorr` on the whole file; with an open-ended stream it
+    is the trailing second. Memory is O(chunk + sample_rate) regardless of length.
+    `truncated` tells whether the body ended before the centered window filled.
+    """
+
+    def __init__(self, fmt: _WavFormat):
+        self.fmt = fmt
+        self.sum_sq = 0.0
+        self.frames = 0
+        sr = fmt.sample_rate
+        self.total = fmt.data_size // fmt.block_align if fmt.data_size is not None else None
+        if self.total is not None:
+            n = min(self.total, sr)
+            self.win_start = (self.total - n) // 2
+            self.win_end = self.win_start + n
+        else:
+            self.win_start = self.win_end = None
+        self.window = array("f")
+
+    def keep_range(self, nframes: int, queued: int = 0) -> Tuple[int, int]:
+        """Slice (relative to a chunk of `nframes` following `queued` not-yet-folded frames)
+        that belongs to the pitch window."""
+        if self.win_start is None:
+            return max(0, nframes - self.fmt.sample_rate), nframes
+        start = self.frames + queued
+        lo = max(self.win_start - start, 0)
+        hi = min(self.win_end - start, nframes)
+        return (lo, hi) if hi > lo else (0, 0)
+
+    def update(self, sum_sq: float, nframes: int, kept: array):
+        self.sum_sq += sum_sq
+        self.frames += nframes
+        self.window.extend(kept)
+        if self.win_start is None and len(self.window) > self.fmt.sample_rate:
+            del self.window[:len(self.window) - self.fmt.sample_rate]
+
+    @property
+    def energy(self) -> float:
+        return math.sqrt(self.sum_sq / self.frames) if self.frames else 0.0
+
+    @property
+    def truncated(self) -> bool:
+        return self.win_end is not None and self.frames < self.win_end
+
+
+def _pcm_pitch(raw: bytes, fmt: _WavFormat) -> Optional[float]:
+    """Pitch of a raw PCM span (picklable, for the analysis pool)."""
+    return _estimate_pitch_autocorr(_decode_channel(raw, fmt), fmt.sample_rate)
+
+
+async def _analyze_stream(audio: UploadFile, fmt: _WavFormat, head: bytes, pool, chunk_bytes: int,
+                          max_bytes: int, max_duration_sec: int, batch_chunks: int = 8) -> Tuple[float, Optional[float]]:
+    """
+    Consume the upload in fixed-size chunks; returns (rms_energy, pitch_hz).
+    Chunks are decoded `batch_chunks` at a time per pool call, so memory stays
+    O(chunk_bytes * batch_chunks) with one worker round trip per batch.
+    """
+    analyzer = _StreamAnalyzer(fmt)
+    # Last second of raw PCM, for bodies that end before the declared size
+    tail = bytearray() if fmt.data_size is not None else None
+    tail_bytes = fmt.sample_rate * fmt.block_align
+    batch: List[Tuple[bytes, int, int]] = []
+    queued = 0  # frames in `batch`, not yet folded into the analyzer
+
+    async def flush():
+        nonlocal batch, queued
+        for result in await pool.run(_batch_features, batch, fmt):
+            analyzer.update(*result)
+        batch, queued = [], 0
+
+    chunk_bytes = max(fmt.block_align, chunk_bytes - chunk_bytes % fmt.block_align)
+    remaining = fmt.data_size
+    pending = head[fmt.data_offset:]
+    consumed = 0
+    eof = False
+    while True:
+        while len(pending) < chunk_bytes and not eof:
+            more = await audio.read(chunk_bytes)
+            if not more:
+                eof = True
+            pending += more
+        if remaining is not None and len(pending) > remaining - consumed:
+            pending = pending[:remaining - consumed]
+            eof = True
+        take = len(pending) if eof else chunk_bytes
+        take -= take % fmt.block_align
+        if take <= 0:
+            break
+        raw, pending = pending[:take], pending[take:]
+        consumed += take
+        # Open-ended streams have no declared size, so limits are re-checked per chunk
+        _check_wav_limits(fmt, max_duration_sec, max_bytes, received=consumed)
+        nframes = take // fmt.block_align
+        lo, hi = analyzer.keep_range(nframes, queued)
+        batch.append((raw, lo, hi))
+        queued += nframes
+        if tail is not None:
+            tail += raw
+            del tail[:max(0, len(tail) - tail_bytes)]
+        if len(batch) >= batch_chunks:
+            await flush()
+    if batch:
+        await flush()
+    if not analyzer.frames:
+        return 0.0, None
+    if analyzer.truncated:
+        # The centered window never filled; use the trailing second received, as for open-ended streams
+        pitch_hz = await pool.run(_pcm_pitch, bytes(tail), fmt)
+    else:
+        pitch_hz = await pool.run(_estimate_pitch_autocorr, analyzer.window, fmt.sample_rate)
+    return analyzer.energy, pitch_hz
+
+
+# --- Real-time streaming (/voice/stream) ---
+
+_WS_ENCODINGS = {
+    "s16le": (_WAVE_FORMAT_PCM, 2),
+    "s24le": (_WAVE_FORMAT_PCM, 3),
+    "s32le": (_WAVE_FORMAT_PCM, 4),
+    "f32le": (_WAVE_FORMAT_IEEE_FLOAT, 4),
+}
+_ws_connections = 0
+
+
+class _CpuBudget:
+    """Token bucket over CPU seconds: refills `share` seconds per wall-clock second, capped at `burst`."""
+
+    def __init__(self, share: float, burst: float):
+        self.share = share
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def available(self) -> bool:
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.share)
+        self.updated = now
+        return self.tokens > 0
+
+    def charge(self, seconds: float):
+        self.tokens -= seconds
+
+
+def _timed_pitch(samples: Sequence[float], sr: int) -> Tuple[Optional[float], float]:
+    """Pitch plus the CPU time it took (measured in the worker thread/process)."""
+    t0 = time.thread_time()
+    pitch = _estimate_pitch_autocorr(samples, sr)
+    return pitch, time.thread_time() - t0
+
+
+@router.websocket("/voice/stream")
+async def voice_stream(websocket: WebSocket, sample_rate: int = 16000, channels: int = 1, encoding: str = "s16le"):
+    """
+    Real-time prosody features over raw PCM.
+
+    Query params describe the frames (encoding: s16le/s24le/s32le/f32le,
+    interleaved when channels > 1; the first channel is analyzed). Binary
+    messages carry PCM; the server replies with one JSON "features" message
+    per hop (energy of that hop, pitch over the trailing window). A text
+    message {"type": "end"} returns a "summary" (energy and mean voiced pitch
+    over the whole stream) and closes.
+
+    Pitch runs in the analysis pool under a per-connection CPU budget; when
+    the budget or pool is exhausted the last pitch is repeated with
+    "throttled": true (pitch is null without throttling until the window holds
+    200 ms). Frames are only read after the previous batch is processed and
+    sent, so slow processing pushes back on the client via TCP.
+
+    Bad parameters and the connection cap are reported by accepting and then
+    closing with 1003 / 1013, so clients see the reason rather than a bare 403.
+    """
+    global _ws_connections
+    settings = get_settings()
+    if encoding not in _WS_ENCODINGS or not 8000 <= sample_rate <= 192000 or not 1 <= channels <= 8:
+        await websocket.accept()
+        await websocket.close(code=1003)  # unsupported data
+        return
+    if _ws_connections >= settings.voice_ws_max_connections:
+        await websocket.accept()
+        await websocket.close(code=1013)  # try again later
+        return
+    _ws_connections += 1
+    try:
+        await websocket.accept()
+        tag, sw = _WS_ENCODINGS[encoding]
+        fmt = _WavFormat(tag, channels, sample_rate, sw, channels * sw, 0, None)
+        await _voice_stream_session(websocket, fmt, settings)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        _ws_connections -= 1
+
+
+async def _voice_stream_session(websocket: WebSocket, fmt: _WavFormat, settings):
+    sr = fmt.sample_rate
+    hop = max(1, sr * settings.voice_ws_hop_ms // 1000)
+    win = max(int(0.2 * sr), sr * settings.voice_ws_window_ms // 1000)
+    budget = _CpuBudget(settings.voice_ws_cpu_share, burst=max(0.05, settings.voice_ws_cpu_share * 2))
+    pool = get_analysis_pool()
+    pending = b""
+    hop_buf = array("f")
+    window = array("f")
+    seq = 0
+    sum_sq = 0.0
+    frames = 0
+    pitch_hz: Optional[float] = None
+    # Running mean of the voiced pitch estimates, for the summary
+    pitch_sum = 0.0
+    pitch_count = 0
+    while True:
+        msg = await websocket.receive()
+        if msg["type"] == "websocket.disconnect":
+            return
+        if msg.get("text") is not None:
+            try:
+                control = json.loads(msg["text"])
+            except ValueError:
+                control = {}
+            if isinstance(control, dict) and control.get("type") == "end":
+                energy = math.sqrt(sum_sq / frames) if frames else 0.0
+                mean_pitch = pitch_sum / pitch_count if pitch_count else None
+                await websocket.send_json({
+                    "type": "summary",
+                    "duration": round(frames / sr, 3),
+                    "energy": round(energy, 4),
+                    "pitch": round(mean_pitch, 1) if mean_pitch else None,
+                    "tonality": _classify_tonality(energy, mean_pitch),
+                    "eqScore": _eq_score(energy, mean_pitch),
+                })
+                await websocket.close()
+                return
+            continue
+        data = msg.get("bytes") or b""
+        if len(pending) + len(data) > settings.voice_ws_max_buffer_bytes:
+            await websocket.close(code=1009)  # message too big
+            return
+        pending += data
+        usable = len(pending) - len(pending) % fmt.block_align
+        if not usable:
+            continue
+        hop_buf.extend(_as_float_array(_decode_channel(pending[:usable], fmt)))
+        pending = pending[usable:]
+        while len(hop_buf) >= hop:
+            chunk = hop_buf[:hop]
+            del hop_buf[:hop]
+            window.extend(chunk)
+            if len(window) > win:
+                del window[:len(window) - win]
+            energy = _rms_energy(chunk)
+            for v in chunk:
+                sum_sq += v * v
+            frames += hop
+            throttled = False
+            if len(window) >= int(0.2 * sr):
+                if budget.available():
+                    try:
+                        pitch_hz, cpu = await pool.run(_timed_pitch, window, sr)
+                        budget.charge(cpu)
+                        if pitch_hz:
+                            pitch_sum += pitch_hz
+                            pitch_count += 1
+                    except PoolSaturated:
+                        throttled = True
+                else:
+                    throttled = True
+            seq += 1
+            await websocket.send_json({
+                "type": "features",
+                "seq": seq,
+                "t": round(frames / sr, 3),
+                "energy": round(energy, 4),
+                "pitch": round(pitch_hz, 1) if pitch_hz else None,
+                "tonality": _classify_tonality(energy, pitch_hz),
+                "eqScore": _eq_score(energy, pitch_hz),
+                "throttled": throttled,
+            })
+
+
+def _rms_energy(samples: Sequence[float]) -> float:
+    if samples is None or len(samples) == 0:
         return 0.0
+    if _np is not None and isinstance(samples, _np.ndarray):
+        x = samples.astype(_np.float64)
+        return float(_np.sqrt(_np.dot(x, x) / len(x)))
     acc = 0.0
     for s in samples:
         acc += s * s
     return math.sqrt(acc / len(samples))
 
 
-def _estimate_pitch_autocorr(samples: List[float], sr: int) -> Optional[float]:
+def _estimate_pitch_autocorr(samples: Sequence[float], sr: int) -> Optional[float]:
     """
-    Very small autocorrelation-based pitch estimator for voiced speech.
-    Searches 75–300 Hz range; returns None if no clear peak.
+    Autocorrelation-based pitch estimator for voiced speech (75–300 Hz).
+    Returns None if no clear peak.
+
+    Computes the autocorrelation via FFT (NumPy when installed, otherwise a
+    pure-Python radix-2 FFT). Correlation values match the direct sum up to
+    float rounding (~1e-12 relative), so the chosen lag is the same as
+    `_estimate_pitch_autocorr_direct` except for near-ties; in the worst case
+    the pitch differs by one lag step (< 2% at 16 kHz, < 0.7% at 48 kHz).
     """
-    if not samples or sr <= 0:
+    prepared = _prepare_pitch_window(samples, sr)
+    if prepared is None:
         return None
-    # Use up to 1 second from the center to reduce edges
-    N = min(len(samples), sr)
-    if N < int(0.2 * sr):  # need at least 200ms
+    window, min_lag, max_lag = prepared
+    if _np is not None:
+        ac = _autocorr_numpy(window, max_lag)
+    else:
+        ac = _autocorr_fft_py(window, max_lag)
+    energy0 = ac[0]
+    if energy0 <= 1e-9:
         return None
-    start = (len(samples) - N) // 2
-    window = samples[start:start + N]
-    # Remove DC
-    mean = sum(window) / len(window)
-    window = [x - mean for x in window]
-    # Lag search range for 75–300 Hz
-    min_lag = max(1, int(sr / 300))
-    max_lag = min(len(window) - 1, int(sr / 75))
-    if max_lag <= min_lag:
+    best_lag = None
+    best_val = -1e9
+    for lag in range(min_lag, max_lag + 1):
+        val = ac[lag] / energy0
+        if val > best_val:
+            best_val = val
+            best_lag = lag
+    if best_lag is None or best_val < 0.1:
         return None
+    return float(sr) / float(best_lag)
+
+
+def _estimate_pitch_autocorr_direct(samples: Sequence[float], sr: int) -> Optional[float]:
+    """
+    Reference O(N * lags) time-domain estimator. Kept for benchmarking and as
+    the ground truth for the FFT path; not used by the endpoints.
+    """
+    prepared = _prepare_pitch_window(samples, sr)
+    if prepared is None:
+        return None
+    window, min_lag, max_lag = prepared
     best_lag = None
     best_val = -1e9
     # Precompute energy for normalization
@@ -143,9 +712,108 @@ def _estimate_pitch_autocorr(samples: List[float], sr: int) -> Optional[float]:
     return float(sr) / float(best_lag)
 
 
+def _prepare_pitch_window(samples: Sequence[float], sr: int) -> Optional[Tuple[List[float], int, int]]:
+    """Select the centered analysis window (<= 1s), remove DC and compute the lag range."""
+    if samples is None or len(samples) == 0 or sr <= 0:
+        return None
+    # Use up to 1 second from the center to reduce edges
+    N = min(len(samples), sr)
+    if N < int(0.2 * sr):  # need at least 200ms
+        return None
+    start = (len(samples) - N) // 2
+    window = [float(x) for x in samples[start:start + N]]
+    # Remove DC
+    mean = sum(window) / len(window)
+    window = [x - mean for x in window]
+    # Lag search range for 75–300 Hz
+    min_lag = max(1, int(sr / 300))
+    max_lag = min(len(window) - 1, int(sr / 75))
+    if max_lag <= min_lag:
+        return None
+    return window, min_lag, max_lag
+
+
+def _fft_size(n: int, max_lag: int) -> int:
+    # Zero-pad past n + max_lag so circular wrap-around never reaches the lags we read
+    size = 1
+    while size < n + max_lag:
+        size <<= 1
+    return size
+
+
+def _autocorr_numpy(window: List[float], max_lag: int) -> List[float]:
+    x = _np.asarray(window, dtype=_np.float64)
+    nfft = _fft_size(len(x), max_lag)
+    spec = _np.fft.rfft(x, nfft)
+    ac = _np.fft.irfft(spec.real * spec.real + spec.imag * spec.imag, nfft)
+    return ac[:max_lag + 1].tolist()
+
+
+_TWIDDLES: Dict[int, List[complex]] = {}
+
+
+def _twiddles(n: int) -> List[complex]:
+    tw = _TWIDDLES.get(n)
+    if tw is None:
+        tw = [cmath.exp(-2j * math.pi * k / n) for k in range(n // 2)]
+        _TWIDDLES[n] = tw
+    return tw
+
+
+def _fft_py(x: List[complex]) -> List[complex]:
+    """Recursive radix-2 decimation-in-time FFT; len(x) must be a power of two."""
+    n = len(x)
+    if n == 1:
+        return list(x)
+    if n == 2:
+        a, b = x
+        return [a + b, a - b]
+    even = _fft_py(x[0::2])
+    odd = _fft_py(x[1::2])
+    t = [o * w for o, w in zip(odd, _twiddles(n))]
+    return [e + v for e, v in zip(even, t)] + [e - v for e, v in zip(even, t)]
+
+
+def _rfft_py(x: List[float]) -> List[complex]:
+    """
+    FFT of a real sequence (power-of-two length n), returning bins 0..n/2.
+    Packs even/odd samples into one complex sequence of length n/2, so the
+    work is a single half-size complex FFT plus an O(n) untangling pass.
+    """
+    n = len(x)
+    m = n // 2
+    z = _fft_py([complex(a, b) for a, b in zip(x[0::2], x[1::2])])
+    tw = _twiddles(n)
+    out = []
+    for k in range(m + 1):
+        zk = z[k % m]
+        zc = z[(m - k) % m].conjugate()
+        even = (zk + zc) * 0.5
+        odd = (zk - zc) * -0.5j
+        out.append(even + (tw[k] if k < m else -1) * odd)
+    return out
+
+
+def _autocorr_fft_py(window: List[float], max_lag: int) -> List[float]:
+    nfft = _fft_size(len(window), max_lag)
+    padded = list(window)
+    padded.extend([0.0] * (nfft - len(window)))
+    half = _rfft_py(padded)
+    power = [c.real * c.real + c.imag * c.imag for c in half]
+    # Power spectrum is real and even: mirror it, and its forward FFT equals n * inverse FFT
+    full = power + power[-2:0:-1]
+    ac = _rfft_py(full)
+    return [ac[lag].real / nfft for lag in range(max_lag + 1)]
+
+
 def _classify_tonality(energy: float, pitch_hz: Optional[float]) -> str:
     if energy < 0.02:
         return "Calm"
     if energy > 0.08 and pitch_hz:
         return "Energetic"
     return "Neutral"
+
+
+def _eq_score(energy: float, pitch_hz: Optional[float]) -> int:
+    """Lightweight EQ-like score (scaled 0-30)."""
+    return int(min(30, max(0, (energy * 400) + (8 if pitch_hz else 0))))
@@ -105,3 +105,28 @@ export async function fetchEQScore(response: string, inflection: any): Promise<n
   const data = await res.json();
   return data.eq_score;
 }
+
+export interface AnswerAnalysis {
+  eq_score: number;
+  sentiment: string;
+  emotion_scores: Record<string, number>;
+  archetype: string;
+  feedback: string;
+  next_question: string;
+}
+
+// One round trip for score/sentiment/emotion/archetype/feedback/next_question
+export async function fetchAnalysis(params: {
+  text: string;
+  inflection?: Record<string, any>;
+  voice_features?: Record<string, any>;
+  candidate_id?: string;
+}): Promise<AnswerAnalysis> {
+  const res = await fetch(`${API_URL}/analyze`, {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify(params)
+  });
+  if (!res.ok) throw new Error('Analyze API error');
+  return res.json();
+}